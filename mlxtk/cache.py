@@ -0,0 +1,338 @@
+"""Content-addressed artifact cache.
+
+This module implements a persistent store for the results of expensive tasks
+(e.g. ``final.wfn`` and ``propagate.h5`` of a propagation or the output of an
+analysis). Entries are addressed by a hash of the contents of all input files
+and of the task parameters, so identical computations in different simulations
+or scan points are only performed once. Cached files are reflinked (or copied
+if that is not possible) into the task directory.
+
+The cache is disabled unless a directory is configured, either through the
+``MLXTK_ARTIFACT_CACHE`` environment variable or the ``artifact_cache`` entry in
+the ``paths`` section of a ``mlxtkrc`` file. The maximum size can be set using
+``MLXTK_ARTIFACT_CACHE_SIZE`` or the ``artifact_cache_size`` settings entry
+(e.g. ``50G``). When the size is exceeded the least recently used entries are
+evicted.
+"""
+
+import errno
+import fcntl
+import hashlib
+import os
+import pickle
+import shutil
+import sqlite3
+import stat
+import time
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Sequence, Union
+
+from mlxtk.hashing import hash_file
+from mlxtk.log import get_logger
+from mlxtk.settings import load_settings
+from mlxtk.util import format_size, make_path, parse_size
+
+LOGGER = get_logger(__name__)
+
+ENV_CACHE_PATH = "MLXTK_ARTIFACT_CACHE"
+ENV_CACHE_SIZE = "MLXTK_ARTIFACT_CACHE_SIZE"
+
+# ioctl request to clone a file on copy-on-write file systems (btrfs, xfs)
+FICLONE = 0x40049409
+
+def compute_cache_key(
+    kind: str,
+    files: Sequence[Union[str, Path]],
+    parameters: Any = None,
+) -> str:
+    """Compute the cache key of a computation.
+
+    Args:
+        kind: type of the computation (e.g. ``"propagate"``)
+        files: input files whose contents determine the result
+        parameters: picklable object describing all further parameters
+
+    Returns:
+        Hex digest identifying the computation.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(kind.encode())
+    for path in files:
+        hasher.update(b"\0file\0")
+        hasher.update(hash_file(path, "sha256sum").encode())
+    hasher.update(b"\0parameters\0")
+    hasher.update(pickle.dumps(parameters, protocol=3))
+    return hasher.hexdigest()
+
+
+def _reflink_file(src: Path, dst: Path):
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+def clone_file(src: Path, dst: Path):
+    """Copy ``src`` to ``dst`` without sharing the inode.
+
+    A reflink is attempted first, then a regular copy. An existing ``dst`` is
+    replaced.
+    """
+    if dst.exists() or dst.is_symlink():
+        dst.unlink()
+
+    try:
+        _reflink_file(src, dst)
+        shutil.copystat(src, dst)
+        return
+    except OSError:
+        if dst.exists():
+            dst.unlink()
+
+    shutil.copy2(src, dst)
+
+
+class ArtifactCache:
+    """Persistent content-addressed store for task outputs.
+
+    Each entry is a directory ``objects/<key[:2]>/<key>`` containing the cached
+    files. Sizes, access times and hit counts are kept in an SQLite index so
+    that the cache can be shared between concurrently running tasks.
+
+    Args:
+        path: directory of the cache
+        max_size: maximum size of the cache in bytes (unbounded if ``None``)
+    """
+
+    def __init__(self, path: Union[str, Path], max_size: Optional[int] = None):
+        self.logger = get_logger(__name__ + ".ArtifactCache")
+        self.path = make_path(path).resolve()
+        self.path_objects = self.path / "objects"
+        self.path_tmp = self.path / "tmp"
+        self.path_index = self.path / "index.sqlite"
+        self.max_size = max_size
+
+        self.path_objects.mkdir(parents=True, exist_ok=True)
+        self.path_tmp.mkdir(parents=True, exist_ok=True)
+
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, "
+                "kind TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "created REAL NOT NULL, "
+                "accessed REAL NOT NULL, "
+                "hits INTEGER NOT NULL DEFAULT 0)",
+            )
+            con.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)",
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path_index), timeout=60.0)
+
+    def get_entry_path(self, key: str) -> Path:
+        return self.path_objects / key[:2] / key
+
+    def lookup(self, key: str, files: Mapping[str, Union[str, Path]]) -> bool:
+        """Clone the files of a cached entry to their destinations.
+
+        The destinations do not share their inode with the cache (see
+        :func:`clone_file`), so they can be modified like any other task output.
+
+        Args:
+            key: key of the entry
+            files: mapping of the names of the cached files to their destination
+
+        Returns:
+            ``True`` on a cache hit, ``False`` otherwise.
+        """
+        path_entry = self.get_entry_path(key)
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT key FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return False
+
+        if not all((path_entry / name).exists() for name in files):
+            self.logger.warning("incomplete cache entry %s, discard it", key)
+            self.remove(key)
+            return False
+
+        for name, destination in files.items():
+            destination = make_path(destination)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            clone_file(path_entry / name, destination)
+            # the cached files are read-only, the task outputs are not
+            destination.chmod(
+                stat.S_IMODE(destination.stat().st_mode) | stat.S_IWUSR,
+            )
+            # make the result newer than the inputs of the task
+            os.utime(destination)
+
+        with self._connect() as con:
+            con.execute(
+                "UPDATE entries SET accessed = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key),
+            )
+
+        self.logger.info("cache hit: %s", key)
+        return True
+
+    def store(self, key: str, kind: str, files: Mapping[str, Union[str, Path]]):
+        """Add the outputs of a computation to the cache.
+
+        The files are cloned into the cache (see :func:`clone_file`) and stored
+        read-only to protect the cached contents. The task outputs themselves
+        do not share their inode with the cache and stay writable.
+
+        Args:
+            key: key of the entry
+            kind: type of the computation
+            files: mapping of the names under which the files are cached to
+                their current location
+        """
+        path_entry = self.get_entry_path(key)
+        if path_entry.exists():
+            return
+
+        path_tmp = self.path_tmp / f"{key}.{os.getpid()}"
+        if path_tmp.exists():
+            shutil.rmtree(path_tmp)
+        path_tmp.mkdir()
+
+        size = 0
+        try:
+            for name, source in files.items():
+                clone_file(make_path(source).resolve(), path_tmp / name)
+                mode = (path_tmp / name).stat().st_mode
+                os.chmod(
+                    path_tmp / name,
+                    mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH),
+                )
+                size += (path_tmp / name).stat().st_size
+
+            path_entry.parent.mkdir(exist_ok=True)
+            os.rename(path_tmp, path_entry)
+        except OSError:
+            # another process might have stored the same entry in the meantime
+            shutil.rmtree(path_tmp, ignore_errors=True)
+            if not path_entry.exists():
+                raise
+            return
+
+        now = time.time()
+        with self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, kind, size, created, accessed, hits) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, kind, size, now, now),
+            )
+        self.logger.info("stored cache entry %s (%s)", key, format_size(size))
+
+        if self.max_size is not None:
+            self.gc(self.max_size)
+
+    def remove(self, key: str):
+        shutil.rmtree(self.get_entry_path(key), ignore_errors=True)
+        with self._connect() as con:
+            con.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def gc(self, max_size: Optional[int] = None) -> int:
+        """Evict the least recently used entries until the cache fits.
+
+        Entries whose directory is missing are dropped from the index and
+        leftovers of interrupted store operations are deleted.
+
+        Args:
+            max_size: maximum size in bytes (defaults to the size of the cache)
+
+        Returns:
+            Number of evicted entries.
+        """
+        if max_size is None:
+            max_size = self.max_size
+
+        with self._connect() as con:
+            rows = con.execute(
+                "SELECT key, size FROM entries ORDER BY accessed ASC",
+            ).fetchall()
+
+        evicted = 0
+        total_size = 0
+        entries = []
+        for key, size in rows:
+            if not self.get_entry_path(key).exists():
+                self.remove(key)
+                continue
+            entries.append((key, size))
+            total_size += size
+
+        if max_size is not None:
+            for key, size in entries:
+                if total_size <= max_size:
+                    break
+                self.logger.info("evict cache entry %s", key)
+                self.remove(key)
+                total_size -= size
+                evicted += 1
+
+        now = time.time()
+        for path in self.path_tmp.iterdir():
+            if now - path.stat().st_mtime > 24 * 3600:
+                shutil.rmtree(path, ignore_errors=True)
+
+        return evicted
+
+    def clear(self):
+        with self._connect() as con:
+            keys = [row[0] for row in con.execute("SELECT key FROM entries")]
+        for key in keys:
+            self.remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Collect statistics about the cache contents."""
+        with self._connect() as con:
+            entries, size, hits = con.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) "
+                "FROM entries",
+            ).fetchone()
+            kinds = {
+                kind: (count, kind_size)
+                for kind, count, kind_size in con.execute(
+                    "SELECT kind, COUNT(*), SUM(size) FROM entries GROUP BY kind",
+                )
+            }
+
+        return {
+            "path": self.path,
+            "entries": entries,
+            "size": size,
+            "max_size": self.max_size,
+            "hits": hits,
+            "kinds": kinds,
+        }
+
+
+def get_cache_path() -> Optional[Path]:
+    if ENV_CACHE_PATH in os.environ:
+        return make_path(os.environ[ENV_CACHE_PATH])
+
+    return load_settings(Path.cwd())["paths"].get("artifact_cache", None)
+
+
+def get_cache_size() -> Optional[int]:
+    size = os.environ.get(ENV_CACHE_SIZE, None)
+    if size is None:
+        size = load_settings(Path.cwd()).get("artifact_cache_size", None)
+    return None if size is None else parse_size(size)
+
+
+def get_default_cache() -> Optional[ArtifactCache]:
+    """Get the configured artifact cache, ``None`` if caching is disabled."""
+    path = get_cache_path()
+    if path is None:
+        return None
+    return ArtifactCache(path, get_cache_size())
@@ -1,4 +1,5 @@
 from mlxtk.doit_analyses import (
+    aggregate,
     collect,
     expval,
     fixed_ns,
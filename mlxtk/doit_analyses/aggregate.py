@@ -0,0 +1,321 @@
+"""Aggregate HDF5 results of a parameter scan.
+
+The datasets of one HDF5 file of each simulation (e.g. ``propagate.h5``) are
+collected into a single HDF5 file. Each dataset becomes a chunked cube with one
+axis per variable parameter of the scan followed by the axes of the dataset
+itself (e.g. ``(g, N, time)`` for the energy of a propagation). Datasets of
+different length (e.g. propagations that stopped early) are padded with
+``NaN``.
+
+Layout of the output file:
+
+* ``axes/<name>``: values of each variable parameter
+* ``index``: scan index for each point of the parameter grid (``-1`` if absent)
+* ``sources``: size and modification time of the input file of each scan index
+* ``data/<path>``: cube for each collected dataset
+
+The sources are used to update the output incrementally: only the simulations
+whose input file changed are read again. The points of simulations whose input
+file disappeared are reset to the fill value.
+"""
+
+from multiprocessing import cpu_count
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import h5py
+import numpy
+
+from mlxtk.executor import AnalysisExecutor
+from mlxtk.log import get_logger
+from mlxtk.parameter_selection import ParameterSelection, load_scan
+from mlxtk.util import make_path
+
+LOGGER = get_logger(__name__)
+
+
+def _read_datasets(
+    args: Tuple[str, Sequence[str]],
+) -> Optional[Dict[str, numpy.ndarray]]:
+    path, names = args
+    result = {}  # type: Dict[str, numpy.ndarray]
+
+    def visit(name: str, obj: Any):
+        if isinstance(obj, h5py.Dataset):
+            result[name] = obj[()]
+
+    try:
+        with h5py.File(path, "r") as fptr:
+            for name in names:
+                obj = fptr[name]
+                if isinstance(obj, h5py.Dataset):
+                    result[name] = obj[()]
+                else:
+                    obj.visititems(
+                        lambda child, item, base=name: visit(f"{base}/{child}", item),
+                    )
+    except (OSError, KeyError) as e:
+        LOGGER.warning("cannot read datasets from %s: %s", path, e)
+        return None
+
+    return result
+
+
+def _sort_values(values: List[Any]) -> List[Any]:
+    try:
+        return sorted(values)
+    except TypeError:
+        return values
+
+
+def get_parameter_grid(
+    selection: ParameterSelection,
+) -> Tuple[List[str], List[numpy.ndarray], Dict[int, Tuple[int, ...]]]:
+    """Arrange the points of a scan on a grid spanned by its variables.
+
+    Returns:
+        The names of the variables, the values along each axis and the grid
+        position of each scan index.
+    """
+    variables = selection.get_variable_names() if selection.parameters else []
+    axes = [_sort_values(selection.get_values(name)) for name in variables]
+    positions = [{value: i for i, value in enumerate(axis)} for axis in axes]
+    columns = [selection.get_column(name).tolist() for name in variables]
+
+    grid = {}  # type: Dict[int, Tuple[int, ...]]
+    for point, (index, _) in enumerate(selection.parameters):
+        grid[index] = tuple(
+            position[column[point]] for column, position in zip(columns, positions)
+        )
+
+    return variables, [_to_array(axis) for axis in axes], grid
+
+
+def _to_array(values: List[Any]) -> numpy.ndarray:
+    array = numpy.array(values)
+    if array.dtype.kind in "UO":
+        return numpy.array([str(value) for value in values], dtype=h5py.string_dtype())
+    return array
+
+
+def _read_array(dset: h5py.Dataset) -> numpy.ndarray:
+    if h5py.check_string_dtype(dset.dtype) is not None:
+        return dset.asstr()[()].astype(object)
+    return dset[()]
+
+
+def _get_fill_value(dtype: numpy.dtype) -> Any:
+    if dtype.kind in "fc":
+        return numpy.nan
+    return 0
+
+
+def _write_point(
+    group: h5py.Group,
+    name: str,
+    grid_shape: Tuple[int, ...],
+    position: Tuple[int, ...],
+    value: numpy.ndarray,
+):
+    value = numpy.asarray(value)
+    if name not in group:
+        group.create_dataset(
+            name,
+            shape=grid_shape + value.shape,
+            maxshape=grid_shape + (None,) * value.ndim,
+            chunks=(1,) * len(grid_shape) + tuple(max(n, 1) for n in value.shape),
+            dtype=value.dtype,
+            fillvalue=_get_fill_value(value.dtype),
+        )
+
+    dset = group[name]
+    point_shape = dset.shape[len(grid_shape) :]
+    if len(point_shape) != value.ndim:
+        raise RuntimeError(f'dataset "{name}" changed its number of dimensions')
+
+    new_shape = tuple(max(a, b) for a, b in zip(point_shape, value.shape))
+    if new_shape != point_shape:
+        dset.resize(grid_shape + new_shape)
+
+    # clear previous values of this point before writing the new ones
+    dset[position] = numpy.full(new_shape, dset.fillvalue, dtype=dset.dtype)
+    dset[position + tuple(slice(0, n) for n in value.shape)] = value
+
+
+def _clear_point(
+    group: h5py.Group,
+    grid_shape: Tuple[int, ...],
+    position: Tuple[int, ...],
+):
+    def visit(name: str, obj: Any):
+        del name
+        if isinstance(obj, h5py.Dataset):
+            obj[position] = numpy.full(
+                obj.shape[len(grid_shape) :],
+                obj.fillvalue,
+                dtype=obj.dtype,
+            )
+
+    group.visititems(visit)
+
+
+def aggregate_hdf5(
+    scan_dir: Union[Path, str],
+    data_file: Union[Path, str],
+    datasets: Sequence[str],
+    output_file: Union[Path, str],
+    processes: int = cpu_count(),
+) -> int:
+    """Collect datasets of all simulations of a scan into one HDF5 file.
+
+    Args:
+        scan_dir: directory of the parameter scan
+        data_file: HDF5 file relative to each simulation directory
+        datasets: paths of datasets or groups inside the HDF5 file; groups are
+            collected recursively
+        output_file: path of the output file
+        processes: number of processes used to read the input files
+
+    Returns:
+        The number of simulations that were (re)read or removed.
+    """
+    scan_dir = make_path(scan_dir)
+    output_file = make_path(output_file)
+
+    selection = load_scan(scan_dir)
+    variables, axes, grid = get_parameter_grid(selection)
+    grid_shape = tuple(len(axis) for axis in axes)
+
+    index_grid = numpy.full(grid_shape, -1, dtype=numpy.int64)
+    for index, position in grid.items():
+        index_grid[position] = index
+
+    num_indices = max(grid.keys()) + 1 if grid else 0
+    sources = numpy.zeros((num_indices, 2), dtype=numpy.int64)
+    paths = {}  # type: Dict[int, Path]
+    for index in grid:
+        path = scan_dir / "by_index" / str(index) / data_file
+        paths[index] = path
+        if path.exists():
+            stat = path.stat()
+            sources[index] = (stat.st_size, stat.st_mtime_ns)
+
+    # check whether the previous result can be updated
+    previous = None
+    if output_file.exists():
+        with h5py.File(output_file, "r") as fptr:
+            if (
+                (list(fptr["axes"].keys()) == sorted(variables))
+                and all(
+                    numpy.array_equal(_read_array(fptr["axes"][name]), axis)
+                    for name, axis in zip(variables, axes)
+                )
+                and numpy.array_equal(fptr["index"][()], index_grid)
+                and (list(fptr.attrs.get("datasets", [])) == list(datasets))
+                and (fptr["sources"].shape == sources.shape)
+            ):
+                previous = fptr["sources"][()]
+
+    if previous is None:
+        LOGGER.info("create aggregation file %s", output_file)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        with h5py.File(output_file, "w") as fptr:
+            group = fptr.create_group("axes")
+            for name, axis in zip(variables, axes):
+                group.create_dataset(name, data=axis)
+            fptr.create_dataset("index", data=index_grid)
+            fptr.create_dataset("sources", data=numpy.zeros_like(sources))
+            fptr.create_group("data")
+            fptr.attrs["variables"] = variables
+            fptr.attrs["datasets"] = list(datasets)
+        previous = numpy.zeros_like(sources)
+
+    changed = [
+        index
+        for index in sorted(grid)
+        if sources[index, 0] and (not numpy.array_equal(sources[index], previous[index]))
+    ]
+    removed = [
+        index
+        for index in sorted(grid)
+        if (not sources[index, 0]) and previous[index, 0]
+    ]
+    LOGGER.info(
+        "read %d and remove %d of %d simulation(s)",
+        len(changed),
+        len(removed),
+        len(grid),
+    )
+    if not (changed or removed):
+        return 0
+
+    work = [(str(paths[index]), list(datasets)) for index in changed]
+    with AnalysisExecutor(max(1, min(processes, len(work)))) as executor:
+        results = executor.imap_unordered(_read_datasets, work)
+        with h5py.File(output_file, "r+") as fptr:
+            group = fptr["data"]
+            for index in removed:
+                _clear_point(group, grid_shape, grid[index])
+                fptr["sources"][index] = sources[index]
+
+            for position, result in results:
+                if result is None:
+                    continue
+
+                index = changed[position]
+                for name, value in result.items():
+                    _write_point(group, name, grid_shape, grid[index], value)
+                fptr["sources"][index] = sources[index]
+
+    return len(changed) + len(removed)
+
+
+def aggregate_scan(
+    scan_dir: Union[Path, str],
+    data_file: Union[Path, str],
+    datasets: Sequence[str],
+    output_file: Union[Path, str] = None,
+    processes: int = cpu_count(),
+):
+    """Create a doit task that aggregates the HDF5 results of a scan.
+
+    See :func:`aggregate_hdf5` for the description of the arguments. By
+    default the output is written to ``data/aggregate/<scan>_<file>.h5``.
+    """
+    scan_dir = make_path(scan_dir)
+    data_file = make_path(data_file)
+
+    if output_file is None:
+        output_file = (
+            Path("data")
+            / "aggregate"
+            / (
+                scan_dir.name.replace("=", "_")
+                + "_"
+                + str(data_file.with_suffix("")).replace("/", "_")
+                + ".h5"
+            )
+        )
+    output_file = make_path(output_file)
+
+    selection = load_scan(scan_dir)
+    file_deps = [
+        scan_dir / "by_index" / str(i) / data_file for i, _ in selection.parameters
+    ]
+    file_deps = [path for path in file_deps if path.exists()]
+
+    def action_aggregate(targets):
+        aggregate_hdf5(scan_dir, data_file, datasets, targets[0], processes)
+
+    yield {
+        "name": "{}:aggregate:{}".format(
+            str(scan_dir.name),
+            str(output_file.with_suffix("")),
+        )
+        .replace("=", "_")
+        .replace("/", "_"),
+        "targets": [str(output_file)],
+        "file_dep": file_deps,
+        "clean": True,
+        "actions": [action_aggregate],
+    }
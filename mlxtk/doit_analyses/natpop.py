@@ -1,7 +1,8 @@
 import itertools
 import pickle
+from multiprocessing import cpu_count
 from pathlib import Path
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Tuple, Union
 
 import h5py
 import matplotlib.pyplot as plt
@@ -10,6 +11,7 @@ import numpy
 from mlxtk.doit_analyses.collect import collect_values
 from mlxtk.doit_analyses.plot import direct_plot, doit_plot_individual
 from mlxtk.doit_analyses.video import create_slideshow
+from mlxtk.executor import AnalysisExecutor
 from mlxtk.inout.natpop import read_natpop, read_natpop_hdf5
 from mlxtk.parameter_selection import load_scan
 from mlxtk.plot import PlotArgs2D, plot_entropy, plot_natpop
@@ -101,6 +103,13 @@ def scan_plot_entropy(
     )
 
 
+def _compute_natpop_maxima(args: Tuple[Path, int, int]) -> Tuple[float, float, float]:
+    input_file, node, dof = args
+    _, data = read_natpop_hdf5(input_file, "natpop", node=node, dof=dof)
+    entropy = compute_entropy(data)
+    return (1 - data[:, 0]).max(), entropy.max(), data[:, -1].max()
+
+
 class DefaultNatpopAnalysis:
     def __init__(
         self,
@@ -110,12 +119,14 @@ class DefaultNatpopAnalysis:
         dof: int = 1,
         missing_ok: bool = True,
         output_file: Union[Path, str] = None,
+        processes: int = cpu_count(),
     ):
         self.scan_dir = make_path(scan_dir)
         self.propagation = propagation
         self.node = node
         self.dof = dof
         self.missing_ok = missing_ok
+        self.processes = processes
 
         if output_file is None:
             self.output_file = (
@@ -138,25 +149,19 @@ class DefaultNatpopAnalysis:
         def action(scan_dir, input_files, targets):
             variables, values = load_scan(scan_dir).get_variable_values()
 
-            with h5py.File(targets[0], "w") as fptr:
-                max_depletion = []
-                max_entropy = []
-                max_last_orbital = []
-
-                for input_file in input_files:
-                    time, data = read_natpop_hdf5(
-                        input_file,
-                        "natpop",
-                        node=self.node,
-                        dof=self.dof,
-                    )
-                    del time
-
-                    entropy = compute_entropy(data)
+            with AnalysisExecutor(
+                max(1, min(self.processes, len(input_files))),
+            ) as executor:
+                maxima = executor.map(
+                    _compute_natpop_maxima,
+                    [(input_file, self.node, self.dof) for input_file in input_files],
+                    progress=False,
+                )
 
-                    max_depletion.append((1 - data[:, 0]).max())
-                    max_entropy.append(entropy.max())
-                    max_last_orbital.append(data[:, -1].max())
+            with h5py.File(targets[0], "w") as fptr:
+                max_depletion = [entry[0] for entry in maxima]
+                max_entropy = [entry[1] for entry in maxima]
+                max_last_orbital = [entry[2] for entry in maxima]
 
                 dset = fptr.create_dataset(
                     "max_depletion",
@@ -2,11 +2,31 @@
 
 This module provides various helper functions and classes to use the
 `DoIt <http://pydoit.org/>`_ library in a way that is adequate for mlxtk.
+
+Besides the run times of the Python code, :class:`DoitAction` records the
+resources used by the child processes (e.g. ``qdtk_propagate.x``) that an
+action launches: the CPU times obtained from
+``resource.getrusage(RUSAGE_CHILDREN)`` and, for processes started with
+:func:`run_process`, the peak resident set size and the number of bytes read
+and written (from ``/proc/<pid>/io``). The values are stored next to the
+timings in the doit database.
+
+The peak resident set size reported by ``wait4`` includes the memory of the
+Python process at the time of the fork, so it is only used if it exceeds the
+peak of the Python process. Otherwise the ``VmHWM`` of the child is sampled
+from ``/proc/<pid>/status`` while it runs. The peak virtual memory ``VmPeak``,
+which is what SGE limits with ``h_vmem``, is sampled as well.
 """
 
 import json
+import os
+import resource
 import sqlite3
-from typing import Any, Dict, List, Tuple
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import doit
 from doit.cmd_base import TaskLoader
@@ -16,6 +36,7 @@ from tabulate import tabulate
 
 from mlxtk.log import get_logger
 from mlxtk.timing import Timer
+from mlxtk.util import format_size
 
 LOGGER = get_logger(__name__)
 
@@ -44,41 +65,216 @@ def run_doit(task_generators, arguments=None) -> int:
     return DoitMain(CustomTaskLoader(task_generators)).run(arguments)
 
 
+# ru_maxrss is given in kilobytes on Linux and in bytes on macOS
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+RESOURCE_KEYS = [
+    "children_user_time",
+    "children_system_time",
+    "children_max_rss",
+    "children_max_vm",
+    "children_read_bytes",
+    "children_write_bytes",
+]
+
+# longest interval between two samples of the peak memory of a child process
+MAX_SAMPLE_INTERVAL = 1.0
+
+_CHILD_RECORDS = []  # type: List[List[Dict[str, Any]]]
+_CHILD_RECORDS_LOCK = threading.Lock()
+
+
+def _read_proc_io(pid: int) -> Optional[Dict[str, int]]:
+    try:
+        with open(f"/proc/{pid}/io") as fptr:
+            return {
+                key.strip(): int(value)
+                for key, value in (line.split(":", 1) for line in fptr if ":" in line)
+            }
+    except (OSError, ValueError):
+        return None
+
+
+def _read_proc_peaks(pid: int) -> Dict[str, int]:
+    peaks = {}  # type: Dict[str, int]
+    try:
+        with open(f"/proc/{pid}/status") as fptr:
+            for line in fptr:
+                if line.startswith(("VmHWM:", "VmPeak:")):
+                    peaks[line.split(":", 1)[0]] = int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return peaks
+
+
+def _get_self_max_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+
+
+def _wait_process(process: subprocess.Popen) -> Dict[str, Any]:
+    record = {"pid": process.pid, "max_rss": None, "max_vm": None, "io": None}
+    self_max_rss = _get_self_max_rss()
+    sampled_max_rss = None  # type: Optional[int]
+
+    # poll without reaping the child, so that /proc/<pid>/status and
+    # /proc/<pid>/io can still be read
+    if hasattr(os, "waitid") and os.path.exists(f"/proc/{process.pid}"):
+        interval = 0.001
+        try:
+            while (
+                os.waitid(
+                    os.P_PID,
+                    process.pid,
+                    os.WEXITED | os.WNOWAIT | os.WNOHANG,
+                )
+                is None
+            ):
+                peaks = _read_proc_peaks(process.pid)
+                if "VmHWM" in peaks:
+                    sampled_max_rss = max(sampled_max_rss or 0, peaks["VmHWM"])
+                if "VmPeak" in peaks:
+                    record["max_vm"] = max(record["max_vm"] or 0, peaks["VmPeak"])
+                time.sleep(interval)
+                interval = min(1.5 * interval, MAX_SAMPLE_INTERVAL)
+            record["io"] = _read_proc_io(process.pid)
+        except ChildProcessError:
+            pass
+
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        process.wait()
+        return record
+
+    process.returncode = os.waitstatus_to_exitcode(status)
+    max_rss = usage.ru_maxrss * RSS_UNIT
+    record["max_rss"] = max_rss if max_rss > self_max_rss else sampled_max_rss
+    record["user_time"] = usage.ru_utime
+    record["system_time"] = usage.ru_stime
+    return record
+
+
+def run_process(args: Sequence[str], **kwargs) -> subprocess.CompletedProcess:
+    """Run a child process and account for the resources it uses.
+
+    This is a replacement for :func:`subprocess.run` (without support for
+    ``input``, ``capture_output`` and ``timeout``). The peak resident and
+    virtual memory and the I/O of the process are attributed to the
+    :class:`DoitAction` that is currently executed.
+
+    Args:
+        args: command to run
+        check: raise :class:`subprocess.CalledProcessError` if the process
+            fails
+        kwargs: further arguments passed to :class:`subprocess.Popen`
+    """
+    check = kwargs.pop("check", False)
+    with subprocess.Popen(args, **kwargs) as process:
+        try:
+            record = _wait_process(process)
+        except BaseException:
+            process.kill()
+            raise
+
+    with _CHILD_RECORDS_LOCK:
+        if _CHILD_RECORDS:
+            _CHILD_RECORDS[-1].append(record)
+
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, args)
+    return subprocess.CompletedProcess(args, process.returncode)
+
+
+def _get_child_resources(
+    usage_before: resource.struct_rusage,
+    usage_after: resource.struct_rusage,
+    records: List[Dict[str, Any]],
+    self_max_rss: int = 0,
+) -> Dict[str, Any]:
+    resources = {
+        "children": len(records),
+        "children_user_time": usage_after.ru_utime - usage_before.ru_utime,
+        "children_system_time": usage_after.ru_stime - usage_before.ru_stime,
+        "children_max_rss": None,
+        "children_max_vm": None,
+        # block I/O in units of 512 bytes, used if /proc/<pid>/io is missing
+        "children_read_bytes": (usage_after.ru_inblock - usage_before.ru_inblock)
+        * 512,
+        "children_write_bytes": (usage_after.ru_oublock - usage_before.ru_oublock)
+        * 512,
+    }  # type: Dict[str, Any]
+
+    peaks = [record["max_rss"] for record in records if record["max_rss"]]
+    if peaks:
+        resources["children_max_rss"] = max(peaks)
+    elif (not records) and (
+        usage_after.ru_maxrss * RSS_UNIT
+        > max(usage_before.ru_maxrss * RSS_UNIT, self_max_rss)
+    ):
+        # the largest child of this process so far was started by this action
+        # and its peak was not inherited from this process
+        resources["children_max_rss"] = usage_after.ru_maxrss * RSS_UNIT
+
+    peaks = [record["max_vm"] for record in records if record.get("max_vm")]
+    if peaks:
+        resources["children_max_vm"] = max(peaks)
+
+    ios = [record["io"] for record in records if record["io"]]
+    if ios and (len(ios) == len(records)):
+        for key, name in (("rchar", "read"), ("wchar", "write")):
+            resources[f"children_{name}_chars"] = sum(io.get(key, 0) for io in ios)
+        for name in ("read", "write"):
+            resources[f"children_{name}_bytes"] = sum(
+                io.get(f"{name}_bytes", 0) for io in ios
+            )
+
+    return resources
+
+
 class DoitAction:
     def __init__(self, func):
         self.func = func
 
     def __call__(self, targets, *args, **kwargs):
+        records = []  # type: List[Dict[str, Any]]
+        with _CHILD_RECORDS_LOCK:
+            _CHILD_RECORDS.append(records)
+        usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+
         timer = Timer()
-        ret = self.func(targets, *args, **kwargs)
+        try:
+            ret = self.func(targets, *args, **kwargs)
+        finally:
+            with _CHILD_RECORDS_LOCK:
+                _CHILD_RECORDS.remove(records)
         timer.stop()
 
+        values = {
+            "monotonic_time": timer.get_monotonic_time(),
+            "perf_time": timer.get_perf_time(),
+            "process_time": timer.get_process_time(),
+        }
+        values.update(
+            _get_child_resources(
+                usage_before,
+                resource.getrusage(resource.RUSAGE_CHILDREN),
+                records,
+                _get_self_max_rss(),
+            ),
+        )
+
         if ret is None:
-            return {
-                self.func.__name__: {
-                    "monotonic_time": timer.get_monotonic_time(),
-                    "perf_time": timer.get_perf_time(),
-                    "process_time": timer.get_process_time(),
-                },
-            }
+            return {self.func.__name__: values}
 
         if isinstance(ret, dict):
             ret[self.func.__name__] = ret.get(self.func.__name__, {})
-            ret[self.func.__name__]["monotonic_time"] = timer.get_monotonic_time()
-            ret[self.func.__name__]["perf_time"] = timer.get_perf_time()
-            ret[self.func.__name__]["process_time"] = timer.get_process_time()
+            ret[self.func.__name__].update(values)
             return ret
 
         if isinstance(ret, bool):
             if not ret:
                 return ret
-            return {
-                self.func.__name__: {
-                    "monotonic_time": timer.get_monotonic_time(),
-                    "perf_time": timer.get_perf_time(),
-                    "process_time": timer.get_process_time(),
-                },
-            }
+            return {self.func.__name__: values}
 
         raise NotImplementedError(
             "The return type {} is not supported for Doit actions",
@@ -86,6 +282,14 @@ class DoitAction:
 
 
 def load_doit_db(path: str) -> Dict[str, Dict[str, Any]]:
+    """Load the doit database (sqlite3 or json backend)."""
+    with open(path, "rb") as fptr:
+        is_sqlite = fptr.read(16) == b"SQLite format 3\0"
+
+    if not is_sqlite:
+        with open(path) as fptr:
+            return json.load(fptr)
+
     db = sqlite3.connect(path)
     cursor = db.cursor()
     cursor.execute("SELECT task_id, task_data FROM doit")
@@ -94,27 +298,108 @@ def load_doit_db(path: str) -> Dict[str, Dict[str, Any]]:
     return {name: json.loads(data) for name, data in result}
 
 
-def load_doit_timings(path: str) -> Dict[str, Dict[str, float]]:
-    timings = {}  # type: Dict[str, Dict[str, float]]
+def load_doit_profile(path: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Load all values recorded by the actions of each task.
+
+    Returns:
+        The timings and resources (see :data:`RESOURCE_KEYS`) for each action
+        of each task.
+    """
+    profile = {}  # type: Dict[str, Dict[str, Dict[str, Any]]]
     data = load_doit_db(path)
     for task in data:
-        timings[task] = timings.get(task, {})
-        for action in data[task]["_values_:"]:
-            timings[task][action] = data[task]["_values_:"][action]["monotonic_time"]
-    return timings
+        profile[task] = profile.get(task, {})
+        for action, values in data[task].get("_values_:", {}).items():
+            if isinstance(values, dict) and ("monotonic_time" in values):
+                profile[task][action] = values
+    return profile
+
+
+def load_doit_timings(path: str) -> Dict[str, Dict[str, float]]:
+    return {
+        task: {action: values["monotonic_time"] for action, values in actions.items()}
+        for task, actions in load_doit_profile(path).items()
+    }
+
+
+def load_doit_resources(path: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Load the resources used by the child processes of each action."""
+    return {
+        task: {
+            action: {key: values.get(key, None) for key in RESOURCE_KEYS}
+            for action, values in actions.items()
+        }
+        for task, actions in load_doit_profile(path).items()
+    }
 
 
 def load_doit_timing(path: str, task: str, action: str) -> float:
     return load_doit_timings(path)[task][action]
 
 
+def _format_size(size: Optional[int]) -> Optional[str]:
+    return None if size is None else format_size(size)
+
+
 def format_doit_profile(
     timings: Dict[str, Dict[str, float]],
     tablefmt: str = "fancy_grid",
+    resources: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None,
 ) -> str:
-    profile = []  # type: List[Tuple[str, str, float]]
+    """Format the profile of tasks as a table sorted by run time.
+
+    Args:
+        timings: run time of each action of each task
+        tablefmt: table format of tabulate
+        resources: resources used by the child processes of each action (see
+            :func:`load_doit_resources`), adds columns for the CPU time, peak
+            memory and I/O if present
+    """
+    if resources is None:
+        profile = []  # type: List[Tuple[Any, ...]]
+        for task in timings:
+            for action in timings[task]:
+                profile.append((task, action, timings[task][action]))
+        profile.sort(key=lambda x: x[2], reverse=True)
+        return tabulate(
+            profile,
+            headers=["Task", "Action", "Time/s"],
+            tablefmt=tablefmt,
+        )
+
+    profile = []
     for task in timings:
         for action in timings[task]:
-            profile.append((task, action, timings[task][action]))
+            usage = resources.get(task, {}).get(action, {})
+            cpu_time = None
+            if usage.get("children_user_time", None) is not None:
+                cpu_time = usage["children_user_time"] + usage.get(
+                    "children_system_time",
+                    0.0,
+                )
+            profile.append(
+                (
+                    task,
+                    action,
+                    timings[task][action],
+                    cpu_time,
+                    _format_size(usage.get("children_max_rss", None)),
+                    _format_size(usage.get("children_read_bytes", None)),
+                    _format_size(usage.get("children_write_bytes", None)),
+                ),
+            )
     profile.sort(key=lambda x: x[2], reverse=True)
-    return tabulate(profile, headers=["Task", "Action", "Time/s"], tablefmt=tablefmt)
+    return tabulate(
+        profile,
+        headers=[
+            "Task",
+            "Action",
+            "Time/s",
+            "Child CPU/s",
+            "Peak RSS",
+            "Read",
+            "Written",
+        ],
+        tablefmt=tablefmt,
+        missingval="-",
+    )
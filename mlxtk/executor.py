@@ -0,0 +1,242 @@
+"""Reusable process pool for analyses.
+
+An :class:`AnalysisExecutor` keeps its pool of worker processes alive between
+calls so that scripts mapping several functions over the simulations of a scan
+only pay the startup cost of the pool once. Work is scheduled in chunks and
+results can be consumed as soon as they are available.
+
+Each process keeps a small least-recently-used cache of HDF5 files opened for
+reading (see :func:`open_hdf5`). Functions executed by the pool should use it
+to read files like ``propagate.h5`` that are accessed repeatedly. A cached file
+is reopened when it was modified. All cached files are closed when the
+executor is shut down: the workers close their files when they exit after the
+pool was closed, the current process closes its own files afterwards.
+"""
+
+import atexit
+import collections
+import itertools
+import os
+from multiprocessing import cpu_count
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+import h5py
+import tqdm
+from multiprocess.util import Finalize
+from pathos.pools import ProcessPool as Pool
+
+from mlxtk.log import get_logger
+
+LOGGER = get_logger(__name__)
+
+DEFAULT_MAX_OPEN_FILES = 8
+
+_COUNTER = itertools.count()
+_HDF5_FILES = collections.OrderedDict()  # type: collections.OrderedDict
+_MAX_OPEN_FILES = DEFAULT_MAX_OPEN_FILES
+
+
+def open_hdf5(path: Union[str, Path]) -> h5py.File:
+    """Open an HDF5 file for reading using the cache of the current process.
+
+    The returned file must not be closed by the caller.
+
+    Args:
+        path: path of the HDF5 file
+
+    Returns:
+        The opened file.
+    """
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    stamp = (stat.st_size, stat.st_ino, stat.st_mtime_ns)
+
+    entry = _HDF5_FILES.get(path, None)
+    if entry is not None:
+        if entry[0] == stamp and entry[1].id.valid:
+            _HDF5_FILES.move_to_end(path)
+            return entry[1]
+        _close_hdf5(path)
+
+    fptr = h5py.File(path, "r")
+    _HDF5_FILES[path] = (stamp, fptr)
+    while len(_HDF5_FILES) > _MAX_OPEN_FILES:
+        _close_hdf5(next(iter(_HDF5_FILES)))
+    return fptr
+
+
+def _close_hdf5(path: str):
+    _, fptr = _HDF5_FILES.pop(path)
+    try:
+        fptr.close()
+    except Exception as e:  # pylint: disable=broad-except
+        LOGGER.warning("failed to close %s: %s", path, e)
+
+
+def close_hdf5_files():
+    """Close all HDF5 files cached by the current process."""
+    for path in list(_HDF5_FILES.keys()):
+        _close_hdf5(path)
+
+
+def _init_worker(max_open_files: int):
+    global _MAX_OPEN_FILES
+    _MAX_OPEN_FILES = max_open_files
+
+
+def _close_worker_files():
+    close_hdf5_files()
+
+
+def _init_pool_worker(max_open_files: int):
+    _init_worker(max_open_files)
+    # run when the worker exits after the pool was closed
+    Finalize(None, _close_worker_files, exitpriority=10)
+
+
+def _call_indexed(func: Callable[[Any], Any]) -> Callable[[Tuple[int, Any]], Any]:
+    def helper(item: Tuple[int, Any]) -> Tuple[int, Any]:
+        return item[0], func(item[1])
+
+    return helper
+
+
+class AnalysisExecutor:
+    """Pool of worker processes that is reused for several maps.
+
+    The pool is started on first use and kept until :meth:`shutdown` is
+    called. The executor can be used as a context manager. Items are
+    processed serially in the current process if only one process is
+    requested or if the current process cannot create child processes (e.g. a
+    daemonic doit worker).
+
+    Args:
+        processes: number of worker processes
+        chunksize: number of items sent to a worker at once (chosen based on
+            the number of items and processes if ``None``)
+        max_open_files: number of HDF5 files each process keeps open
+    """
+
+    def __init__(
+        self,
+        processes: int = cpu_count(),
+        chunksize: Optional[int] = None,
+        max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+    ):
+        self.logger = get_logger(__name__ + ".AnalysisExecutor")
+        self.processes = processes
+        self.chunksize = chunksize
+        self.max_open_files = max_open_files
+        self.pool = None  # type: Optional[Pool]
+        self.serial = processes <= 1
+
+    def __enter__(self) -> "AnalysisExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def _get_pool(self) -> Optional[Pool]:
+        if self.serial:
+            return None
+
+        if self.pool is None:
+            try:
+                self.pool = Pool(
+                    self.processes,
+                    id=f"mlxtk-executor-{os.getpid()}-{next(_COUNTER)}",
+                    initializer=_init_pool_worker,
+                    initargs=(self.max_open_files,),
+                )
+            except AssertionError:
+                self.logger.warning("cannot create process pool, process serially")
+                self.serial = True
+                return None
+
+        return self.pool
+
+    def get_chunksize(self, num_items: int) -> int:
+        if self.chunksize is not None:
+            return self.chunksize
+        return max(1, num_items // (4 * self.processes))
+
+    def imap_unordered(
+        self,
+        func: Callable[[Any], Any],
+        items: Iterable[Any],
+        progress: bool = False,
+    ) -> Iterator[Tuple[int, Any]]:
+        """Map a function over items and yield results as they complete.
+
+        The pool is started when this method is called rather than on the
+        first iteration, so files opened while consuming the results are not
+        inherited by the workers.
+
+        Args:
+            func: function to call for each item
+            items: items to process
+            progress: whether to display a progress bar
+
+        Returns:
+            Iterator over tuples of the position of the item and the result.
+        """
+        work = list(enumerate(items))
+        pool = self._get_pool()
+        if pool is None:
+            _init_worker(self.max_open_files)
+            results = map(_call_indexed(func), work)
+        else:
+            results = pool.uimap(
+                _call_indexed(func),
+                work,
+                chunksize=self.get_chunksize(len(work)),
+            )
+
+        if not progress:
+            return iter(results)
+
+        def generate() -> Iterator[Tuple[int, Any]]:
+            with tqdm.tqdm(total=len(work)) as pbar:
+                for result in results:
+                    pbar.update()
+                    yield result
+
+        return generate()
+
+    def map(
+        self,
+        func: Callable[[Any], Any],
+        items: Iterable[Any],
+        progress: bool = True,
+    ) -> List[Any]:
+        """Map a function over items and return the results in order."""
+        items = list(items)
+        results = [None] * len(items)  # type: List[Any]
+        for position, result in self.imap_unordered(func, items, progress):
+            results[position] = result
+        return results
+
+    def shutdown(self):
+        """Stop the worker processes and close all cached files."""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool.clear()
+            self.pool = None
+
+        close_hdf5_files()
+
+
+_DEFAULT_EXECUTOR = None  # type: Optional[AnalysisExecutor]
+
+
+def get_default_executor() -> AnalysisExecutor:
+    """Get the executor shared by all analyses of this process."""
+    global _DEFAULT_EXECUTOR
+
+    if _DEFAULT_EXECUTOR is None:
+        _DEFAULT_EXECUTOR = AnalysisExecutor()
+        atexit.register(_DEFAULT_EXECUTOR.shutdown)
+
+    return _DEFAULT_EXECUTOR
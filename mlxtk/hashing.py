@@ -1,27 +1,184 @@
 """Hashing functions.
 
-Functions to hash files and other data using standard hashing programs such
-as ``sha256sum``.
+Functions to hash files and other data. The digests are identical to the ones
+computed by standard hashing programs such as ``sha256sum`` but they are
+computed in-process using :mod:`hashlib`. Programs without a :mod:`hashlib`
+counterpart are still executed as a subprocess.
+
+Digests of files are memoized persistently in an SQLite database keyed on the
+path, size, inode and modification/change times of the file. Unchanged files
+are therefore only hashed once. The database is stored in
+``~/.cache/mlxtk/file_hashes.sqlite`` and its location can be changed by
+setting ``MLXTK_HASH_CACHE``; setting it to an empty string disables the
+persistent memoization.
 """
 
+import hashlib
+import os
+import sqlite3
 import subprocess
 from pathlib import Path
-from typing import Union
+from typing import Dict, Optional, Tuple, Union
 
 import numpy
 
+from mlxtk.log import get_logger
+
+LOGGER = get_logger(__name__)
+
+HASH_PROGRAMS = {
+    "md5sum": "md5",
+    "sha1sum": "sha1",
+    "sha224sum": "sha224",
+    "sha256sum": "sha256",
+    "sha384sum": "sha384",
+    "sha512sum": "sha512",
+    "b2sum": "blake2b",
+}
+HASH_BLOCK_SIZE = 1 << 20
+ENV_HASH_CACHE = "MLXTK_HASH_CACHE"
+
+FileStamp = Tuple[int, int, int, int]
+
+
+def _new_hasher(program: str) -> Optional["hashlib._Hash"]:
+    if program not in HASH_PROGRAMS:
+        return None
+    return hashlib.new(HASH_PROGRAMS[program])
+
+
+def hash_bytes(data: bytes, program: str = "sha1sum") -> str:
+    hasher = _new_hasher(program)
+    if hasher is None:
+        return subprocess.check_output([program], input=data).decode().split()[0]
+    hasher.update(data)
+    return hasher.hexdigest()
+
 
 def hash_string(data: str, program: str = "sha1sum") -> str:
-    return subprocess.check_output([program], input=data.encode()).decode().split()[0]
+    return hash_bytes(data.encode(), program)
+
+
+class FileHashCache:
+    """Persistent memo of file digests.
+
+    Entries are only valid as long as the size, inode, modification and
+    change time of the file are unchanged. The change time cannot be set by
+    tools like ``cp -p`` which protects against files that are rewritten with
+    their old modification time.
+
+    Args:
+        path: path of the database (``None`` for an in-memory memo only)
+    """
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.memo = {}  # type: Dict[Tuple[str, str], Tuple[FileStamp, str]]
+        self.connection = None  # type: Optional[sqlite3.Connection]
+
+        if path is None:
+            return
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.connection = sqlite3.connect(str(path), timeout=30.0)
+            with self.connection:
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS hashes ("
+                    "path TEXT NOT NULL, "
+                    "program TEXT NOT NULL, "
+                    "size INTEGER NOT NULL, "
+                    "inode INTEGER NOT NULL, "
+                    "mtime_ns INTEGER NOT NULL, "
+                    "ctime_ns INTEGER NOT NULL, "
+                    "digest TEXT NOT NULL, "
+                    "PRIMARY KEY (path, program))",
+                )
+        except (OSError, sqlite3.Error) as e:
+            LOGGER.warning("cannot use persistent hash cache %s: %s", path, e)
+            self.connection = None
+
+    def get(self, path: str, program: str, stamp: FileStamp) -> Optional[str]:
+        entry = self.memo.get((path, program), None)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+
+        if self.connection is None:
+            return None
+
+        try:
+            row = self.connection.execute(
+                "SELECT size, inode, mtime_ns, ctime_ns, digest FROM hashes "
+                "WHERE path = ? AND program = ?",
+                (path, program),
+            ).fetchone()
+        except sqlite3.Error as e:
+            LOGGER.warning("failed to query hash cache: %s", e)
+            return None
+
+        if (row is None) or (tuple(row[:4]) != stamp):
+            return None
+
+        self.memo[(path, program)] = (stamp, row[4])
+        return row[4]
+
+    def set(self, path: str, program: str, stamp: FileStamp, digest: str):
+        self.memo[(path, program)] = (stamp, digest)
+
+        if self.connection is None:
+            return
+
+        try:
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO hashes "
+                    "(path, program, size, inode, mtime_ns, ctime_ns, digest) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (path, program) + stamp + (digest,),
+                )
+        except sqlite3.Error as e:
+            LOGGER.warning("failed to update hash cache: %s", e)
+
+
+_FILE_HASH_CACHE = None  # type: Optional[FileHashCache]
+
+
+def get_file_hash_cache() -> FileHashCache:
+    global _FILE_HASH_CACHE
+
+    if _FILE_HASH_CACHE is None:
+        path = os.environ.get(
+            ENV_HASH_CACHE,
+            str(Path.home() / ".cache" / "mlxtk" / "file_hashes.sqlite"),
+        )
+        _FILE_HASH_CACHE = FileHashCache(Path(path) if path else None)
+
+    return _FILE_HASH_CACHE
+
+
+def _hash_file_contents(path: Path, program: str) -> str:
+    hasher = _new_hasher(program)
+    if hasher is None:
+        return subprocess.check_output([program, str(path)]).decode().split()[0]
+
+    with open(path, "rb") as fptr:
+        for block in iter(lambda: fptr.read(HASH_BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
 
 
 def hash_file(path: Union[str, Path], program: str = "sha1sum") -> str:
-    return subprocess.check_output([program, str(path)]).split()[0]
+    path = Path(path).resolve()
+    stat = path.stat()
+    stamp = (stat.st_size, stat.st_ino, stat.st_mtime_ns, stat.st_ctime_ns)
+
+    cache = get_file_hash_cache()
+    digest = cache.get(str(path), program, stamp)
+    if digest is None:
+        digest = _hash_file_contents(path, program)
+        cache.set(str(path), program, stamp, digest)
+    return digest
 
 
 def inaccurate_hash(x: numpy.ndarray, decimals: int = 10, program="sha256sum") -> str:
-    return (
-        subprocess.check_output([program], input=x.round(decimals).tobytes("C"))
-        .decode()
-        .split()[0]
-    )
+    return hash_bytes(x.round(decimals).tobytes("C"), program)
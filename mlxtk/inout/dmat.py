@@ -132,21 +132,21 @@ def add_dmat_evecs_spf_to_hdf5(
 def read_dmat_spfrep_ascii(
     path: Union[str, Path],
 ) -> Tuple[numpy.ndarray, numpy.ndarray]:
-    path = make_path(path)
-    df = pandas.read_csv(
-        str(path),
-        delim_whitespace=True,
-        header=None,
-        names=["time", "i", "j", "real", "imag"],
-    )
+    time, _, (real, imag) = tools.read_ascii_steps(path, 2, 2)
+    return time, real + 1j * imag
 
-    time = numpy.unique(df["time"].values)
-    num_times = len(time)
-    num_i = len(numpy.unique(df["i"].values))
-    num_j = len(numpy.unique(df["j"].values))
-    elements = df["real"].values + 1j * df["imag"].values
 
-    return time, elements.reshape((num_times, num_i, num_j))
+def add_dmat_spfrep_ascii_to_hdf5(
+    fptr: Union[h5py.File, h5py.Group],
+    path: Union[str, Path],
+):
+    """Stream the one-body density matrix in spf representation to HDF5.
+
+    This produces the same layout as :func:`add_dmat_spfrep_to_hdf5` without
+    loading the whole ASCII file into memory.
+    """
+    group = fptr.create_group("dmat_spfrep")
+    tools.add_ascii_steps_to_hdf5(group, path, [None, None], ["real", "imag"])
 
 
 def add_dmat_spfrep_to_hdf5(
@@ -163,21 +163,21 @@ def add_dmat_spfrep_to_hdf5(
 def read_dmat_gridrep_ascii(
     path: Union[str, Path],
 ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
-    df = pandas.read_csv(
-        path,
-        header=None,
-        names=["time", "x1", "x2", "real", "imag"],
-        delim_whitespace=True,
-    )
+    time, (x1, x2), (real, imag) = tools.read_ascii_steps(path, 2, 2)
+    return time, x1, x2, real + 1j * imag
 
-    time = numpy.unique(df["time"].values)
-    x1 = numpy.unique(df["x1"].values)
-    x2 = numpy.unique(df["x2"].values)
-    dmat2 = numpy.reshape(
-        df["real"].values + 1j * df["imag"].values,
-        (len(time), len(x1), len(x2)),
-    )
-    return time, x1, x2, dmat2
+
+def add_dmat_gridrep_ascii_to_hdf5(
+    fptr: Union[h5py.File, h5py.Group],
+    path: Union[str, Path],
+):
+    """Stream the one-body density matrix in grid representation to HDF5.
+
+    This produces the same layout as :func:`add_dmat_gridrep_to_hdf5` without
+    loading the whole ASCII file into memory.
+    """
+    group = fptr.create_group("dmat_gridrep")
+    tools.add_ascii_steps_to_hdf5(group, path, ["x1", "x2"], ["real", "imag"])
 
 
 def read_dmat_gridrep_hdf5(
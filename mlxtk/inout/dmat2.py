@@ -3,10 +3,8 @@ from typing import Tuple, Union
 
 import h5py
 import numpy
-import pandas
 
 from mlxtk.inout import tools
-from mlxtk.util import make_path
 
 
 def read_dmat2_gridrep(
@@ -19,31 +17,24 @@ def read_dmat2_gridrep(
     return read_dmat2_gridrep_ascii(path)
 
 
-def read_dmat2_gridrep(
+def read_dmat2_gridrep_ascii(
     path: Union[str, Path],
 ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
-    is_hdf5, path, interior_path = tools.is_hdf5_path(path)
-    if is_hdf5:
-        return read_dmat2_gridrep_hdf5(path, interior_path)
-
-    return read_dmat2_gridrep_ascii(path)
+    time, (x1, x2), (dmat2,) = tools.read_ascii_steps(path, 2, 1)
+    return time, x1, x2, dmat2
 
 
-def read_dmat2_gridrep_ascii(
+def add_dmat2_gridrep_ascii_to_hdf5(
+    fptr: Union[h5py.File, h5py.Group],
     path: Union[str, Path],
-) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
-    df = pandas.read_csv(
-        path,
-        header=None,
-        names=["time", "x1", "x2", "dmat"],
-        delim_whitespace=True,
-    )
+):
+    """Stream the two-body density matrix in grid representation to HDF5.
 
-    time = numpy.unique(df["time"].values)
-    x1 = numpy.unique(df["x1"].values)
-    x2 = numpy.unique(df["x2"].values)
-    dmat2 = numpy.reshape(df["dmat"].values, (len(time), len(x1), len(x2)))
-    return time, x1, x2, dmat2
+    This produces the same layout as :func:`add_dmat2_gridrep_to_hdf5` without
+    loading the whole ASCII file into memory.
+    """
+    group = fptr.create_group("dmat2_gridrep")
+    tools.add_ascii_steps_to_hdf5(group, path, ["x1", "x2"], ["values"])
 
 
 def read_dmat2_gridrep_hdf5(
@@ -87,23 +78,25 @@ def add_dmat2_gridrep_to_hdf5(
 def read_dmat2_spfrep_ascii(
     path: Union[str, Path],
 ) -> Tuple[numpy.ndarray, numpy.ndarray]:
-    df = pandas.read_csv(
+    time, _, (real, imag) = tools.read_ascii_steps(path, 4, 2)
+    return time, real + 1j * imag
+
+
+def add_dmat2_spfrep_ascii_to_hdf5(
+    fptr: Union[h5py.File, h5py.Group],
+    path: Union[str, Path],
+):
+    """Stream the two-body density matrix in spf representation to HDF5.
+
+    This produces the same layout as :func:`add_dmat2_spfrep_to_hdf5` without
+    loading the whole ASCII file into memory.
+    """
+    group = fptr.create_group("dmat2_spfrep")
+    tools.add_ascii_steps_to_hdf5(
+        group,
         path,
-        header=None,
-        names=["time", "i", "j", "k", "l", "real", "imag"],
-        delim_whitespace=True,
-    )
-    time = numpy.unique(df["time"].values)
-    num_times = len(time)
-    num_i = len(numpy.unique(df["i"].values))
-    num_j = len(numpy.unique(df["j"].values))
-    num_k = len(numpy.unique(df["k"].values))
-    num_l = len(numpy.unique(df["l"].values))
-    return (
-        time,
-        numpy.reshape(df["real"].values, (num_times, num_i, num_j, num_k, num_l))
-        + 1j
-        * numpy.reshape(df["imag"].values, (num_times, num_i, num_j, num_k, num_l)),
+        [None, None, None, None],
+        ["real", "imag"],
     )
 
 
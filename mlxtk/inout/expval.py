@@ -22,7 +22,7 @@ def read_expval_ascii(path: Union[Path, str]) -> Tuple[numpy.ndarray, numpy.ndar
                 numpy.array([float(line[0]) + 1j * float(line[1])]),
             )
 
-    df = pandas.read_csv(path, delim_whitespace=True, names=["time", "real", "imag"])
+    df = pandas.read_csv(path, sep=r"\s+", names=["time", "real", "imag"])
     return (
         df["time"].values,
         df["real"].values + 1j * df["imag"].values,
@@ -41,6 +41,22 @@ def read_expval_hdf5(
         )
 
 
+def add_expval_to_hdf5(
+    fptr: Union[h5py.File, h5py.Group],
+    x: numpy.ndarray,
+    values: numpy.ndarray,
+    xname: str = "time",
+):
+    dset = fptr.create_dataset(xname, x.shape, dtype=numpy.float64)
+    dset[:] = x
+
+    dset = fptr.create_dataset("real", values.shape, dtype=numpy.float64)
+    dset[:] = values.real
+
+    dset = fptr.create_dataset("imag", values.shape, dtype=numpy.float64)
+    dset[:] = values.imag
+
+
 def write_expval_hdf5(
     path: Union[Path, str],
     x: numpy.ndarray,
@@ -48,14 +64,7 @@ def write_expval_hdf5(
     xname: str = "time",
 ):
     with h5py.File(path, "w") as fp:
-        dset = fp.create_dataset(xname, x.shape, dtype=numpy.float64)
-        dset[:] = x
-
-        dset = fp.create_dataset("real", values.shape, dtype=numpy.float64)
-        dset[:] = values.real
-
-        dset = fp.create_dataset("imag", values.shape, dtype=numpy.float64)
-        dset[:] = values.imag
+        add_expval_to_hdf5(fp, x, values, xname)
 
 
 def write_expval_ascii(
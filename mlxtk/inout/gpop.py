@@ -1,18 +1,16 @@
 """Read one-body density from ASCII and HDF5 files.
 """
 
-import io
 import re
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
 
 import h5py
 import numpy
-import pandas
 
 from mlxtk.inout import tools
 
-assert List
+RE_TIME_STAMP = re.compile(r"^#\s+(.+)\s+\[au\]$")
 
 
 def read_gpop(
@@ -46,6 +44,10 @@ def read_gpop_ascii(
 ]:
     """Read the one-body densities from a raw ML-X file.
 
+    The file is read once. The block structure (``dof npoints`` headers) of
+    the first time step is used to locate the data of all other time steps,
+    which is then parsed in bulk using numpy.
+
     Args:
         path (str): path of the ASCII file
 
@@ -53,66 +55,72 @@ def read_gpop_ascii(
         Tuple[numpy.ndarray, Dict[int, numpy.ndarray], Dict[int, numpy.ndarray]
         ]: one-body density data
     """
-    regex_time_stamp = re.compile(r"^#\s+(.+)\s+\[au\]$")
-    times = []
-    dofs = []  # type: List[int]
-    grids = {}
-    densities = {}
+    with open(path, "rb") as fhandle:
+        lines = fhandle.read().splitlines()
 
-    with open(path) as fhandle:
-        match = regex_time_stamp.match(fhandle.readline())
-        if match:
-            times.append(float(match.group(1)))
-
-        while True:
-            try:
-                dof_s, grid_points_s = fhandle.readline().split()
-            except ValueError:
-                raise RuntimeError("Failed to determine DOF and number of grid points")
-            dof_index = int(dof_s)
-            grid_points = int(grid_points_s)
-
-            sio = io.StringIO()
-            for _ in range(0, grid_points):
-                sio.write(fhandle.readline())
-            sio.seek(0)
-            data = pandas.read_csv(sio, sep=r"\s+", names=["grid", "density"])
-            del sio
-
-            if dof_index not in dofs:
-                dofs.append(dof_index)
-                grids[dof_index] = data["grid"].values
-                densities[dof_index] = [data["density"].values]
-            else:
-                densities[dof_index].append(data["density"])
-
-            # read the empty line after the block
-            fhandle.readline()
-
-            # check next line
-            position = fhandle.tell()
-            line = fhandle.readline()
-            if not line:
-                # end of file reached
-                break
-
-            match = regex_time_stamp.match(line)
-            if match:
-                # new time stamp
-                times.append(float(match.group(1)))
-                continue
-
-            # new dof
-            fhandle.seek(position)
-
-    # convert densities to numpy arrays
-    for dof_index in densities:
-        densities[dof_index] = numpy.array(densities[dof_index])
+    times, grids, densities = parse_gpop_lines(lines)
 
     if dof is None:
-        return (numpy.array(times), grids, densities)
+        return (times, grids, densities)
+
+    return (times, grids[dof], densities[dof])
 
-    return (numpy.array(times), grids[dof], densities[dof])
+
+def parse_gpop_lines(
+    lines: List[bytes],
+) -> Tuple[numpy.ndarray, Dict[int, numpy.ndarray], Dict[int, numpy.ndarray]]:
+    """Parse complete time steps of a raw ML-X one-body density file.
+
+    Args:
+        lines: lines of the file (without line endings)
+
+    Returns:
+        Times, grids and densities for each degree of freedom.
+    """
+    if (not lines) or (not RE_TIME_STAMP.match(lines[0].decode())):
+        raise RuntimeError("Failed to read time stamp")
+
+    # determine the layout of one time step:
+    # time stamp, then for each DoF a header, the data lines and an empty line
+    blocks = []  # type: List[Tuple[int, int, int]]
+    position = 1
+    while (position < len(lines)) and (not lines[position].startswith(b"#")):
+        try:
+            dof_s, grid_points_s = lines[position].split()
+        except ValueError:
+            raise RuntimeError("Failed to determine DOF and number of grid points")
+        blocks.append((int(dof_s), int(grid_points_s), position + 1))
+        position += int(grid_points_s) + 2
+    stride = position
+
+    # the empty line after the last block of the file might be missing
+    num_steps = (len(lines) + 1) // stride
+
+    times = numpy.zeros(num_steps, dtype=numpy.float64)
+    for step in range(num_steps):
+        match = RE_TIME_STAMP.match(lines[step * stride].decode())
+        if not match:
+            raise RuntimeError(f"Failed to read time stamp of step {step}")
+        times[step] = float(match.group(1))
+
+    grids = {}
+    densities = {}
+    for dof_index, grid_points, offset in blocks:
+        data = numpy.fromstring(
+            b"\n".join(
+                b"\n".join(lines[start : start + grid_points])
+                for start in range(offset, num_steps * stride, stride)
+            ).decode(),
+            dtype=numpy.float64,
+            sep=" ",
+        )
+        if data.shape[0] != num_steps * grid_points * 2:
+            raise RuntimeError(f"Malformed data for DOF {dof_index}")
+        data = data.reshape((num_steps, grid_points, 2))
+        grids[dof_index] = data[0, :, 0].copy()
+        densities[dof_index] = data[:, :, 1].copy()
+
+    return (times, grids, densities)
 
 
 def read_gpop_hdf5(
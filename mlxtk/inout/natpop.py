@@ -1,14 +1,19 @@
-import io
 import re
 from pathlib import Path
-from typing import Dict, Tuple, Union
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 import h5py
 import numpy
-import pandas
 
 from mlxtk.inout import tools
 
+RE_TIMESTAMP = re.compile(r"^#time:\s+(.+)\s+\[au\]$")
+RE_WEIGHT_INFO = re.compile(r"^Natural\s+weights")
+RE_NODE_INFO = re.compile(r"^node:\s*(\d+)\s+layer:\s+(\d+)$")
+RE_ORBITALS_START = re.compile(r"^m(\d+):\s+(.+)$")
+
+NATPOP_INITIAL_CAPACITY = 1024
+
 
 def read_natpop(
     path: str,
@@ -33,86 +38,125 @@ def read_natpop_ascii(
     numpy.ndarray,
     Union[Dict[int, numpy.ndarray], Dict[int, Dict[int, numpy.ndarray]]],
 ]:
-    re_timestamp = re.compile(r"^#time:\s+(.+)\s+\[au\]$")
-    re_weight_info = re.compile(r"^Natural\s+weights")
-    re_node_info = re.compile(r"^node:\s*(\d+)\s+layer:\s+(\d+)$")
-    re_orbitals_start = re.compile(r"^m(\d+):\s+(.+)$")
+    """Read the natural populations from a raw ML-X file.
+
+    The file is streamed line by line and the populations of each (node, dof)
+    pair are written into a preallocated ``(times, m)`` array that grows
+    geometrically when needed. When a node (and a dof) is requested, the
+    blocks of all other nodes (and dofs) are skipped without being parsed.
 
-    # read whole file
+    Args:
+        path (str): path of the ASCII file
+        node (int): only read data for this node (optional)
+        dof (int): only read data for this dof of the node (optional)
+
+    Returns:
+        natural populations
+    """
     with open(path) as fptr:
-        content = fptr.readlines()
+        timestamps, data = parse_natpop_lines(fptr, node, dof)
 
-    timestamps = []
-    node_content = {}
+    if node:
+        if dof:
+            return (timestamps, data[node][dof])
+        return (timestamps, data[node])
 
-    current_node = None
-    current_orbitals = None
+    return (timestamps, data)
 
-    for line in content:
-        line = line.strip()
 
-        # skip empty lines
-        if not line:
-            continue
+def parse_natpop_lines(
+    lines: Iterable[str],
+    node: int = 0,
+    dof: int = 0,
+) -> Tuple[numpy.ndarray, Dict[int, Dict[int, numpy.ndarray]]]:
+    """Parse the natural populations from the lines of a raw ML-X file.
+
+    Args:
+        lines: lines of the file
+        node: only parse data for this node (optional)
+        dof: only parse data for this dof of the node (optional)
+
+    Returns:
+        Times and natural populations for each node and dof.
+    """
+    timestamps = []  # type: List[float]
+    buffers = {}  # type: Dict[Tuple[int, int], numpy.ndarray]
+    counts = {}  # type: Dict[Tuple[int, int], int]
+
+    current_node = None  # type: Optional[int]
+    current_key = None  # type: Optional[Tuple[int, int]]
+    row = []  # type: List[float]
+
+    def flush_row():
+        if current_key is None:
+            return
+
+        if current_key not in buffers:
+            buffers[current_key] = numpy.zeros(
+                (NATPOP_INITIAL_CAPACITY, len(row)),
+                dtype=numpy.float64,
+            )
+            counts[current_key] = 0
+
+        buffer = buffers[current_key]
+        count = counts[current_key]
+        if count == buffer.shape[0]:
+            buffer = numpy.resize(buffer, (2 * buffer.shape[0], buffer.shape[1]))
+            buffers[current_key] = buffer
+
+        buffer[count, :] = row
+        counts[current_key] = count + 1
+
+    for line in lines:
+        line = line.strip()
 
-        # skip useless info lines
-        if re_weight_info.match(line):
+        # skip empty lines and useless info lines
+        if (not line) or RE_WEIGHT_INFO.match(line):
             continue
 
         # gather timestamps
-        match = re_timestamp.match(line)
+        match = RE_TIMESTAMP.match(line)
         if match:
+            flush_row()
+            current_key = None
             timestamps.append(float(match.group(1)))
             continue
 
         # check for "node: x    layer: y" line
-        match = re_node_info.match(line)
+        match = RE_NODE_INFO.match(line)
         if match:
-            current_node = int(match.group(1)) - 1
-            if current_node not in node_content:
-                node_content[current_node] = {}
+            flush_row()
+            current_key = None
+            current_node = int(match.group(1))
+            continue
+
+        # skip blocks of nodes that were not requested
+        if node and (current_node != node):
             continue
 
         # check for "mx: xxx xxx xxx ... " line
-        match = re_orbitals_start.match(line)
+        match = RE_ORBITALS_START.match(line)
         if match:
-            current_orbitals = int(match.group(1)) - 1
-            if current_orbitals not in node_content[current_node]:
-                node_content[current_node][current_orbitals] = []
-            node_content[current_node][current_orbitals].append(match.group(2))
+            flush_row()
+            current_key = None
+            current_dof = int(match.group(1))
+            if dof and (current_dof != dof):
+                continue
+            current_key = (current_node, current_dof)
+            row = [float(value) for value in match.group(2).split()]
             continue
 
         # found continued data line
-        node_content[current_node][current_orbitals][-1] += " " + line
-
-    # create DataFrames
-    data = {}
-    for n in node_content:
-        data[n + 1] = {}
-        for orbitals in node_content[n]:
-            # obtain number of orbitals
-            num_orbitals = len(node_content[n][orbitals][0].split())
-
-            # construct header for DataFrame
-            header = (
-                " ".join(
-                    ["orbital_" + str(orbital) for orbital in range(0, num_orbitals)],
-                )
-                + "\n"
-            )
+        if current_key is not None:
+            row += [float(value) for value in line.split()]
 
-            # create DataFrame
-            sio = io.StringIO(header + "\n".join(node_content[n][orbitals]))
-            dataFrame = pandas.read_csv(sio, sep=r"\s+")
-            vals = numpy.zeros(dataFrame.shape, dtype=numpy.float64)
-            for i in range(num_orbitals):
-                vals[:, i] = dataFrame["orbital_" + str(i)]
-            data[n + 1][orbitals + 1] = vals / 1000.0
+    flush_row()
 
-    if node:
-        if dof:
-            return (numpy.array(timestamps), data[node][dof])
-        return (numpy.array(timestamps), data[node])
+    data = {}  # type: Dict[int, Dict[int, numpy.ndarray]]
+    for (n, orbitals), buffer in buffers.items():
+        if n not in data:
+            data[n] = {}
+        data[n][orbitals] = buffer[: counts[(n, orbitals)]] / 1000.0
 
     return (numpy.array(timestamps), data)
 
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Tuple, Union
+from typing import Optional, Tuple, Union
 
 import h5py
 import numpy
@@ -45,6 +45,33 @@ def read_output_ascii(
     )
 
 
+def read_output_last_ascii(
+    path: Union[Path, str],
+) -> Optional[Tuple[float, float, float, float]]:
+    """Read the last entry of an output file (raw ASCII format).
+
+    Only the end of the file is read, which makes this suitable to monitor a
+    running propagation.
+
+    Args:
+       path (str): path to the file
+
+    Return:
+       The time, norm, energy and maximum SPF overlap of the last complete
+       entry or ``None`` if there is none.
+    """
+    line = tools.read_last_line(path)
+    if line is None:
+        return None
+
+    try:
+        time, norm, energy, overlap = (float(value) for value in line.split()[:4])
+    except ValueError:
+        return None
+
+    return (time, norm, energy, overlap)
+
+
 def read_output_hdf5(
     path: Union[Path, str],
     interior_path: str = "/",
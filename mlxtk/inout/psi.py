@@ -1,16 +1,39 @@
+import hashlib
 import io
+import mmap
+import os
 import re
 from pathlib import Path
-from typing import List, Tuple, Union
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import h5py
 import numpy
 
+from mlxtk.log import get_logger
 from mlxtk.tools.wave_function import get_spfs, load_wave_function
+from mlxtk.util import make_path
+
+LOGGER = get_logger(__name__)
 
 RE_TIME = re.compile(r"^\s+(.+)\s+\[au\]$")
 RE_ELEMENT = re.compile(r"^\s*\((.+)\,(.+)\)$")
 
+PSI_INDEX_VERSION = 2
+"""int: Version of the layout of the psi index files.
+"""
+
+_ELEMENT_TRANSLATION = bytes.maketrans(b"(),", b"   ")
+
 
 def read_first_frame(path: str) -> str:
     frame = []  # type: List[str]
@@ -29,16 +52,413 @@ def read_first_frame(path: str) -> str:
     return "".join(frame)
 
 
+def get_psi_index_path(path: Union[str, Path]) -> Path:
+    """Path of the sidecar file holding the frame index of a psi file.
+
+    Args:
+        path: path of the psi file
+
+    Returns:
+        Path of the hidden index file next to the psi file.
+    """
+    path = make_path(path)
+    return path.with_name("." + path.name + ".index.h5")
+
+
+class PsiFile:
+    """Random access to the frames of an ASCII psi file.
+
+    On first use the file is scanned once for the byte offsets of all
+    ``$time``/``$psi`` blocks. This index is stored in a hidden HDF5 file next
+    to the psi file (see :py:func:`get_psi_index_path`) and reused as long as
+    size and modification time of the psi file do not change. When the psi
+    file has only grown (e.g. during a running propagation) the index is
+    extended starting from the last known frame, provided that the beginning of
+    the file (tape and first frame) and the label of the last known frame are
+    unchanged. Otherwise the file was rewritten and the index is rebuilt.
+
+    Frames are parsed block-wise using numpy instead of line by line which
+    makes reading a single frame independent of the total number of frames.
+    A frame at the end of the file that has fewer coefficients than the first
+    frame (e.g. because it is still being written) is not indexed.
+
+    Args:
+        path: path of the psi file
+        cache_index: whether to store/load the index in/from the sidecar file
+
+    Attributes:
+        path (pathlib.Path): path of the psi file
+        tape (numpy.ndarray): tape of the wave function
+        times (numpy.ndarray): time of each frame (``nan`` if there is none)
+    """
+
+    def __init__(self, path: Union[str, Path], cache_index: bool = True):
+        self.path = make_path(path)
+        self.cache_index = cache_index
+
+        self.tape = numpy.zeros(0, dtype=numpy.int64)
+        self.times = numpy.zeros(0, dtype=numpy.float64)
+        self.frame_starts = numpy.zeros(0, dtype=numpy.int64)
+        self.data_starts = numpy.zeros(0, dtype=numpy.int64)
+        self.data_stops = numpy.zeros(0, dtype=numpy.int64)
+
+        self._num_values: Optional[int] = None
+
+        self._fhandle = open(self.path, "rb")
+        self._stat = os.fstat(self._fhandle.fileno())
+        self._mmap: Optional[mmap.mmap] = None
+        if self._stat.st_size > 0:
+            self._mmap = mmap.mmap(
+                self._fhandle.fileno(),
+                0,
+                access=mmap.ACCESS_READ,
+            )
+
+        self._load_index()
+
+    def __enter__(self) -> "PsiFile":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        del exc_type
+        del exc_value
+        del traceback
+        self.close()
+
+    def __len__(self) -> int:
+        return self.times.shape[0]
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._fhandle.close()
+
+    def _load_index(self):
+        path_index = get_psi_index_path(self.path)
+        size = self._stat.st_size
+        mtime_ns = self._stat.st_mtime_ns
+
+        if self.cache_index and path_index.exists():
+            try:
+                with h5py.File(path_index, "r") as fptr:
+                    if fptr.attrs["version"] != PSI_INDEX_VERSION:
+                        raise ValueError("incompatible index version")
+                    cached_size = int(fptr.attrs["size"])
+                    cached_mtime_ns = int(fptr.attrs["mtime_ns"])
+                    cached_signature = (
+                        str(fptr.attrs["head_digest"]),
+                        bytes(fptr.attrs["last_label"].tobytes()),
+                    )
+                    if cached_size <= size:
+                        self.tape = fptr["tape"][:]
+                        self.times = fptr["time"][:]
+                        self.frame_starts = fptr["frame_start"][:]
+                        self.data_starts = fptr["data_start"][:]
+                        self.data_stops = fptr["data_stop"][:]
+            except (OSError, KeyError, ValueError):
+                LOGGER.warning("ignoring broken psi index: %s", str(path_index))
+                cached_size = -1
+                cached_mtime_ns = -1
+                cached_signature = None
+
+            if (cached_size == size) and (cached_mtime_ns == mtime_ns):
+                return
+
+            if (
+                (cached_size < size)
+                and (len(self) > 0)
+                and (self._get_signature() == cached_signature)
+            ):
+                # the file has grown, the last frame might have been incomplete
+                LOGGER.debug("extend psi index: %s", str(path_index))
+                self._scan(int(self.frame_starts[-1]), len(self) - 1)
+                self._store_index()
+                return
+
+        LOGGER.debug("create psi index: %s", str(path_index))
+        self._scan(0, 0)
+        self._store_index()
+
+    def _get_signature(self) -> Optional[Tuple[str, bytes]]:
+        """Get a signature of the indexed part of the file.
+
+        Returns:
+            The digest of the tape and the first frame and the label
+            (``$time`` and ``$psi`` lines) of the last indexed frame. ``None``
+            if the index references bytes beyond the end of the file.
+        """
+        if (self._mmap is None) or (not len(self)):
+            return None
+
+        if int(self.data_stops[0]) > len(self._mmap):
+            return None
+
+        head_digest = hashlib.sha1(self._mmap[: int(self.data_stops[0])]).hexdigest()
+        last_label = self._mmap[int(self.frame_starts[-1]) : int(self.data_starts[-1])]
+        return head_digest, last_label
+
+    def _store_index(self):
+        if not self.cache_index:
+            return
+
+        path_index = get_psi_index_path(self.path)
+        path_temp = path_index.with_name(path_index.name + "." + str(os.getpid()))
+        try:
+            with h5py.File(path_temp, "w") as fptr:
+                fptr.attrs["version"] = PSI_INDEX_VERSION
+                fptr.attrs["size"] = self._stat.st_size
+                fptr.attrs["mtime_ns"] = self._stat.st_mtime_ns
+                head_digest, last_label = self._get_signature() or ("", b"")
+                fptr.attrs["head_digest"] = head_digest
+                fptr.attrs["last_label"] = numpy.void(last_label)
+                fptr.create_dataset("tape", data=self.tape, dtype=numpy.int64)
+                fptr.create_dataset("time", data=self.times, dtype=numpy.float64)
+                fptr.create_dataset(
+                    "frame_start",
+                    data=self.frame_starts,
+                    dtype=numpy.int64,
+                )
+                fptr.create_dataset(
+                    "data_start",
+                    data=self.data_starts,
+                    dtype=numpy.int64,
+                )
+                fptr.create_dataset(
+                    "data_stop",
+                    data=self.data_stops,
+                    dtype=numpy.int64,
+                )
+            os.replace(path_temp, path_index)
+        except OSError:
+            LOGGER.debug("cannot store psi index: %s", str(path_index))
+            if path_temp.exists():
+                path_temp.unlink()
+
+    def _scan(self, position: int, first_frame: int):
+        """Scan the file for frames starting at the given byte offset.
+
+        Args:
+            position: byte offset to start scanning at
+            first_frame: index of the first frame found at ``position``, all
+                frames before are kept from the existing index
+        """
+        times: List[float] = self.times[:first_frame].tolist()
+        frame_starts: List[int] = self.frame_starts[:first_frame].tolist()
+        data_starts: List[int] = self.data_starts[:first_frame].tolist()
+        data_stops: List[int] = self.data_stops[:first_frame].tolist()
+
+        mm = self._mmap
+        if mm is None:
+            self.tape = numpy.zeros(0, dtype=numpy.int64)
+            self.times = numpy.array(times, dtype=numpy.float64)
+            return
+
+        size = len(mm)
+        while position < size:
+            pos_psi = mm.find(b"$psi", position)
+            if pos_psi < 0:
+                break
+
+            time = numpy.nan
+            frame_start = pos_psi
+            pos_time = mm.rfind(b"$time", position, pos_psi)
+            if pos_time >= 0:
+                frame_start = pos_time
+                line_start = mm.find(b"\n", pos_time) + 1
+                line_stop = mm.find(b"\n", line_start)
+                line = mm[line_start : line_stop if line_stop >= 0 else size]
+                match = RE_TIME.match(line.decode())
+                if not match:
+                    raise RuntimeError(
+                        f"Error extracting time point from label: {line.decode()}",
+                    )
+                time = float(match.group(1))
+
+            data_start = mm.find(b"\n", pos_psi) + 1
+            if data_start == 0:
+                # incomplete frame at the end of the file
+                break
+
+            # the coefficients end at the first empty line or next label
+            data_stop = size
+            for separator in (b"\n\n", b"\n$"):
+                pos = mm.find(separator, data_start - 1)
+                if 0 <= pos < data_stop:
+                    data_stop = pos + 1
+
+            if (data_stop == size) and data_starts:
+                # the last frame might still be being written
+                num_values = self._parse_values(data_starts[0], data_stops[0]).shape[0]
+                if (not mm[data_start:data_stop].rstrip().endswith(b")")) or (
+                    self._parse_values(data_start, data_stop).shape[0] < num_values
+                ):
+                    break
+
+            times.append(time)
+            frame_starts.append(frame_start)
+            data_starts.append(data_start)
+            data_stops.append(data_stop)
+            position = data_stop
+
+        if first_frame == 0:
+            header_stop = frame_starts[0] if frame_starts else size
+            self.tape = numpy.array(
+                mm[:header_stop].replace(b"$tape", b"").split(),
+                dtype=numpy.int64,
+            )
+
+        self.times = numpy.array(times, dtype=numpy.float64)
+        self.frame_starts = numpy.array(frame_starts, dtype=numpy.int64)
+        self.data_starts = numpy.array(data_starts, dtype=numpy.int64)
+        self.data_stops = numpy.array(data_stops, dtype=numpy.int64)
+
+    def _parse_values(self, start: int, stop: int) -> numpy.ndarray:
+        return numpy.fromstring(
+            self._mmap[start:stop].translate(_ELEMENT_TRANSLATION).decode(),
+            dtype=numpy.float64,
+            sep=" ",
+        )
+
+    def _normalize_index(self, index: int) -> int:
+        num_frames = len(self)
+        if index < 0:
+            index += num_frames
+        if (index < 0) or (index >= num_frames):
+            raise KeyError(f"index {index} is out of bounds")
+        return index
+
+    def get_time(self, index: int) -> float:
+        """Get the time of a single frame.
+
+        Args:
+            index: index of the frame (negative values count from the end)
+
+        Returns:
+            The time of the frame.
+        """
+        return self.times[self._normalize_index(index)]
+
+    def read_frame(self, index: int) -> numpy.ndarray:
+        """Read the coefficients of a single frame.
+
+        Args:
+            index: index of the frame (negative values count from the end)
+
+        Returns:
+            The coefficients of the wave function.
+
+        Raises:
+            RuntimeError: if the frame has a different number of coefficients
+                than the first frame
+        """
+        index = self._normalize_index(index)
+        if self._num_values is None:
+            self._num_values = self._parse_values(
+                int(self.data_starts[0]),
+                int(self.data_stops[0]),
+            ).shape[0]
+
+        values = self._parse_values(
+            int(self.data_starts[index]),
+            int(self.data_stops[index]),
+        )
+        if (values.shape[0] != self._num_values) or (values.shape[0] % 2):
+            raise RuntimeError(
+                f"Frame {index} of {self.path} is incomplete or malformed: "
+                f"expected {self._num_values // 2} coefficients, "
+                f"found {values.shape[0] / 2:g}",
+            )
+        return values.view(numpy.complex128)
+
+    def read_frames(self, indices: Iterable[int]) -> numpy.ndarray:
+        """Read the coefficients of multiple frames.
+
+        Args:
+            indices: indices of the frames
+
+        Returns:
+            The coefficients of the wave function with time as the first axis.
+        """
+        indices = [self._normalize_index(index) for index in indices]
+        if not indices:
+            return numpy.zeros((0, 0), dtype=numpy.complex128)
+
+        first = self.read_frame(indices[0])
+        psis = numpy.zeros((len(indices), first.shape[0]), dtype=numpy.complex128)
+        psis[0] = first
+        for i, index in enumerate(indices[1:], 1):
+            psis[i] = self.read_frame(index)
+        return psis
+
+    def iter_frames(
+        self,
+        start: int = 0,
+        stop: Optional[int] = None,
+        step: int = 1,
+    ) -> Iterator[Tuple[float, numpy.ndarray]]:
+        """Iterate over a range of frames.
+
+        Only one frame is kept in memory at a time.
+
+        Args:
+            start: index of the first frame
+            stop: index after the last frame (defaults to the number of frames)
+            step: step between frames
+
+        Yields:
+            Time and coefficients of each frame.
+        """
+        for index in range(*slice(start, stop, step).indices(len(self))):
+            yield self.times[index], self.read_frame(index)
+
+    def get_frame_text(self, index: int) -> str:
+        """Get the tape and a single frame as the content of a wave function file.
+
+        Args:
+            index: index of the frame
+
+        Returns:
+            Text that can be used to load a wave function.
+        """
+        index = self._normalize_index(index)
+        header_stop = self.frame_starts[0]
+        return (
+            self._mmap[:header_stop]
+            + self._mmap[self.frame_starts[index] : self.data_stops[index]]
+        ).decode()
+
+    def write_frames(self, path: Union[str, Path], indices: Sequence[int]):
+        """Copy a selection of frames to a new psi file.
+
+        The frames are copied verbatim without parsing the coefficients.
+
+        Args:
+            path: path of the new psi file
+            indices: indices of the frames to copy
+        """
+        indices = [self._normalize_index(index) for index in indices]
+        header_stop = self.frame_starts[0] if len(self) else len(self._mmap)
+        with open(path, "wb") as fptr:
+            fptr.write(self._mmap[:header_stop])
+            for index in indices:
+                fptr.write(
+                    self._mmap[self.frame_starts[index] : self.data_stops[index]],
+                )
+                fptr.write(b"\n")
+
+
 def read_spfs(path: str) -> Tuple[numpy.ndarray, numpy.ndarray]:
-    with io.StringIO(read_first_frame(path)) as sio:
-        wfn = load_wave_function(sio)
+    with PsiFile(path) as psi_file:
+        with io.StringIO(psi_file.get_frame_text(0)) as sio:
+            wfn = load_wave_function(sio)
 
-    _, times, psis = read_psi_ascii(path)
+        spfs = []
+        for _, psi in psi_file.iter_frames():
+            wfn.PSI = psi
+            spfs.append(numpy.array(get_spfs(wfn)))
 
-    spfs = []
-    for psi in psis:
-        wfn.PSI = psi
-        spfs.append(numpy.array(get_spfs(wfn)))
+        times = psi_file.times
 
     return times, numpy.moveaxis(numpy.array(spfs), 1, 0)
 
@@ -46,133 +466,312 @@ def read_spfs(path: str) -> Tuple[numpy.ndarray, numpy.ndarray]:
 def read_psi_ascii(
     path: Union[str, Path],
 ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
-    path = str(path)
-
-    times: List[float] = []
-    psis: List[List[complex]] = []
-    tape: List[int] = []
-    tape_finished = False
-    with open(path) as fhandle:
-        for line in fhandle:
-            if line.startswith("$time"):
-                tape_finished = True
-                m = RE_TIME.match(fhandle.readline())
-                if not m:
-                    raise RuntimeError(
-                        f"Error extracting time point from label: {line}",
-                    )
-                time = float(m.group(1))
-                times.append(time)
-            elif line.startswith("$psi"):
-                tape_finished = True
-                psis.append([])
-                match = RE_ELEMENT.match(fhandle.readline())
-                while match:
-                    psis[-1].append(float(match.group(1)) + 1j * float(match.group(2)))
-                    match = RE_ELEMENT.match(fhandle.readline())
-
-            if not tape_finished:
-                if line.startswith("$tape"):
-                    continue
-
-                if not line.strip():
-                    continue
-
-                tape.append(int(line))
-
-    return (
-        numpy.array(tape, dtype=numpy.int64),
-        numpy.array(times),
-        numpy.array(
-            [numpy.array(psi).transpose() for psi in psis],
-            dtype=numpy.complex128,
-        ),
-    )
+    with PsiFile(path) as psi_file:
+        return (
+            psi_file.tape,
+            psi_file.times[~numpy.isnan(psi_file.times)],
+            psi_file.read_frames(range(len(psi_file))),
+        )
 
 
 def read_psi_frame_ascii(
     path: Union[str, Path],
     index: int,
 ) -> Tuple[numpy.ndarray, float, numpy.ndarray]:
-    path = str(path)
+    with PsiFile(path) as psi_file:
+        return (
+            psi_file.tape,
+            numpy.array(psi_file.get_time(index)),
+            psi_file.read_frame(index),
+        )
 
-    counter = -1
-    times: List[float] = []
-    psi: List[complex] = []
-    tape: List[int] = []
-    tape_finished = False
-    with open(path) as fhandle:
-        for line in fhandle:
-            if line.startswith("$time"):
-                tape_finished = True
-                m = RE_TIME.match(fhandle.readline())
-                if not m:
-                    raise RuntimeError(
-                        f"Error extracting time point from label: {line}",
-                    )
-                time = float(m.group(1))
-                times.append(time)
-            elif line.startswith("$psi"):
-                counter += 1
-                match = RE_ELEMENT.match(fhandle.readline())
-                while match:
-                    if counter == index:
-                        psi.append(float(match.group(1)) + 1j * float(match.group(2)))
-                    match = RE_ELEMENT.match(fhandle.readline())
-
-            if not tape_finished:
-                if line.startswith("$tape"):
-                    continue
-
-                if not line.strip():
-                    continue
-
-                tape.append(int(line))
-
-    if not psi:
-        raise KeyError(f"index {index} is out of bounds")
-
-    return (
-        numpy.array(tape, dtype=numpy.int64),
-        numpy.array(times[index]),
-        numpy.array(psi, dtype=numpy.complex128),
+
+def get_psi_hdf5_compression(
+    compression: Optional[str] = "gzip",
+    compression_opts: Optional[int] = None,
+    shuffle: bool = True,
+) -> Dict[str, Any]:
+    """Assemble the compression arguments for the datasets of a HDF5 psi file.
+
+    Args:
+        compression: compression filter (``"gzip"``, ``"lzf"`` or ``None``)
+        compression_opts: compression level for gzip (0-9)
+        shuffle: whether to apply the shuffle filter before compression
+
+    Returns:
+        Keyword arguments for :py:meth:`h5py.Group.create_dataset`.
+    """
+    if compression not in ("gzip", "lzf", None):
+        raise ValueError(f'unsupported compression "{compression}"')
+
+    if compression is None:
+        return {}
+
+    kwargs: Dict[str, Any] = {"compression": compression, "shuffle": shuffle}
+    if (compression == "gzip") and (compression_opts is not None):
+        kwargs["compression_opts"] = compression_opts
+    return kwargs
+
+
+def create_psi_hdf5(
+    fptr: Union[h5py.File, h5py.Group],
+    tape: numpy.ndarray,
+    num_coefficients: int,
+    compression: Optional[str] = "gzip",
+    compression_opts: Optional[int] = None,
+    shuffle: bool = True,
+):
+    """Create the datasets of an empty HDF5 psi file.
+
+    The ``psis`` dataset is chunked per time frame and both ``time`` and
+    ``psis`` have a resizable time axis so that frames can be appended using
+    :py:func:`append_psi_hdf5`.
+
+    Args:
+        fptr: file or group to create the datasets in
+        tape: tape of the wave function
+        num_coefficients: number of coefficients per frame
+        compression: compression filter (``"gzip"``, ``"lzf"`` or ``None``)
+        compression_opts: compression level for gzip (0-9)
+        shuffle: whether to apply the shuffle filter before compression
+    """
+    kwargs = get_psi_hdf5_compression(compression, compression_opts, shuffle)
+    fptr.create_dataset("tape", data=tape, dtype=numpy.int64)
+    fptr.create_dataset(
+        "time",
+        shape=(0,),
+        maxshape=(None,),
+        chunks=(1024,),
+        dtype=numpy.float64,
+    )
+    fptr.create_dataset(
+        "psis",
+        shape=(0, num_coefficients),
+        maxshape=(None, num_coefficients),
+        chunks=(1, max(num_coefficients, 1)),
+        dtype=numpy.complex128,
+        **kwargs,
     )
 
 
-def read_psi_hdf5(path):
+def append_psi_hdf5(
+    fptr: Union[h5py.File, h5py.Group],
+    time: numpy.ndarray,
+    psis: numpy.ndarray,
+):
+    """Append frames to a HDF5 psi file.
+
+    Args:
+        fptr: file or group containing the psi datasets
+        time: times of the new frames
+        psis: coefficients of the new frames (time is the first axis)
+    """
+    time = numpy.atleast_1d(time)
+    psis = numpy.atleast_2d(psis)
+
+    dset_time = fptr["time"]
+    dset_psis = fptr["psis"]
+    num_frames = dset_time.shape[0]
+    dset_time.resize((num_frames + time.shape[0],))
+    dset_psis.resize((num_frames + time.shape[0], dset_psis.shape[1]))
+    dset_time[num_frames:] = time
+    dset_psis[num_frames:, :] = psis
+
+
+def convert_psi_ascii_to_hdf5(
+    path_ascii: Union[str, Path],
+    path_hdf5: Union[str, Path],
+    compression: Optional[str] = "gzip",
+    compression_opts: Optional[int] = None,
+    shuffle: bool = True,
+    frames_per_write: int = 64,
+):
+    """Convert an ASCII psi file to the chunked HDF5 format.
+
+    Frames are streamed from the ASCII file. If the HDF5 file already contains
+    the first frames of the ASCII file (same tape and times, same coefficients
+    of the first and last stored frame), only the missing frames are appended.
+    Otherwise the HDF5 file is rewritten.
+
+    Args:
+        path_ascii: path of the ASCII psi file
+        path_hdf5: path of the HDF5 psi file
+        compression: compression filter (``"gzip"``, ``"lzf"`` or ``None``)
+        compression_opts: compression level for gzip (0-9)
+        shuffle: whether to apply the shuffle filter before compression
+        frames_per_write: number of frames to buffer before writing
+    """
+    with PsiFile(path_ascii) as psi_file:
+        if not len(psi_file):
+            raise RuntimeError(f"no frames in psi file: {path_ascii}")
+
+        mode = "w"
+        if Path(path_hdf5).exists():
+            with h5py.File(path_hdf5, "r") as fptr:
+                if "psis" in fptr:
+                    if _is_psi_hdf5_prefix(fptr, psi_file):
+                        mode = "a"
+                    else:
+                        LOGGER.info(
+                            "HDF5 psi file does not match %s, rewrite it: %s",
+                            str(path_ascii),
+                            str(path_hdf5),
+                        )
+
+        with h5py.File(path_hdf5, mode) as fptr:
+            start = 0
+            if mode == "a":
+                start = fptr["time"].shape[0]
+            else:
+                create_psi_hdf5(
+                    fptr,
+                    psi_file.tape,
+                    psi_file.read_frame(0).shape[0],
+                    compression,
+                    compression_opts,
+                    shuffle,
+                )
+
+            indices = list(range(start, len(psi_file)))
+            for i in range(0, len(indices), frames_per_write):
+                batch = indices[i : i + frames_per_write]
+                append_psi_hdf5(
+                    fptr,
+                    psi_file.times[batch],
+                    psi_file.read_frames(batch),
+                )
+
+
+def _is_psi_hdf5_prefix(fptr: h5py.File, psi_file: PsiFile) -> bool:
+    """Check whether an HDF5 psi file holds the first frames of an ASCII one.
+
+    The tape, all times and the coefficients of the first and the last stored
+    frame have to match.
+    """
+    if (fptr["time"].maxshape[0] is not None) or (
+        not numpy.array_equal(fptr["tape"][:], psi_file.tape)
+    ):
+        return False
+
+    num_frames = fptr["time"].shape[0]
+    if num_frames > len(psi_file):
+        return False
+
+    if not numpy.array_equal(
+        fptr["time"][:],
+        psi_file.times[:num_frames],
+        equal_nan=True,
+    ):
+        return False
+
+    for index in {0, num_frames - 1} if num_frames else ():
+        if not numpy.array_equal(fptr["psis"][index], psi_file.read_frame(index)):
+            return False
+
+    return True
+
+
+def read_psi_hdf5(
+    path: Union[str, Path],
+    start: Optional[int] = None,
+    stop: Optional[int] = None,
+    step: Optional[int] = None,
+    interior_path: str = "/",
+) -> List[numpy.ndarray]:
+    """Read a range of frames from a HDF5 psi file.
+
+    Only the requested frames are read (and decompressed) from the file.
+
+    Args:
+        path: path of the HDF5 file
+        start: index of the first frame
+        stop: index after the last frame
+        step: step between frames
+        interior_path: path of the group containing the datasets
+
+    Returns:
+        Tape, times and coefficients of the selected frames.
+    """
+    selection = slice(start, stop, step)
     with h5py.File(path, "r") as fptr:
-        tape = fptr["tape"][:]
-        time = fptr["time"][:]
-        psis = fptr["psis"][:, :]
+        tape = fptr[interior_path]["tape"][:]
+        time = fptr[interior_path]["time"][selection]
+        psis = fptr[interior_path]["psis"][selection, :]
     return [tape, time, psis]
 
 
-def write_psi_hdf5(path, data):
-    tape, time, psis = data
-    with h5py.File(path, "w") as fptr:
-        dset = fptr.create_dataset(
-            "tape",
-            tape.shape,
-            dtype=numpy.int64,
-            compression="gzip",
-        )
-        dset[:] = tape
+def read_psi_frame_hdf5(
+    path: Union[str, Path],
+    index: int,
+    interior_path: str = "/",
+) -> Tuple[numpy.ndarray, float, numpy.ndarray]:
+    """Read a single frame from a HDF5 psi file.
 
-        dset = fptr.create_dataset(
-            "time",
-            time.shape,
-            dtype=numpy.float64,
-            compression="gzip",
+    Args:
+        path: path of the HDF5 file
+        index: index of the frame (negative values count from the end)
+        interior_path: path of the group containing the datasets
+
+    Returns:
+        Tape, time and coefficients of the frame.
+    """
+    with h5py.File(path, "r") as fptr:
+        num_frames = fptr[interior_path]["time"].shape[0]
+        if index < 0:
+            index += num_frames
+        if (index < 0) or (index >= num_frames):
+            raise KeyError(f"index {index} is out of bounds")
+
+        return (
+            fptr[interior_path]["tape"][:],
+            numpy.array(fptr[interior_path]["time"][index]),
+            fptr[interior_path]["psis"][index, :],
         )
-        dset[:] = time
 
-        dset = fptr.create_dataset(
-            "psis",
-            psis.shape,
-            dtype=numpy.complex128,
-            compression="gzip",
+
+def read_psi_hdf5_time_range(
+    path: Union[str, Path],
+    t_start: Optional[float] = None,
+    t_stop: Optional[float] = None,
+    interior_path: str = "/",
+) -> List[numpy.ndarray]:
+    """Read all frames within a time interval from a HDF5 psi file.
+
+    Args:
+        path: path of the HDF5 file
+        t_start: lower bound of the interval (inclusive)
+        t_stop: upper bound of the interval (inclusive)
+        interior_path: path of the group containing the datasets
+
+    Returns:
+        Tape, times and coefficients of the selected frames.
+    """
+    with h5py.File(path, "r") as fptr:
+        time = fptr[interior_path]["time"][:]
+
+    start = None if t_start is None else int(numpy.searchsorted(time, t_start, "left"))
+    stop = None if t_stop is None else int(numpy.searchsorted(time, t_stop, "right"))
+    return read_psi_hdf5(path, start, stop, interior_path=interior_path)
+
+
+def write_psi_hdf5(
+    path: Union[str, Path],
+    data: Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray],
+    compression: Optional[str] = "gzip",
+    compression_opts: Optional[int] = None,
+    shuffle: bool = True,
+):
+    tape, time, psis = data
+    with h5py.File(path, "w") as fptr:
+        create_psi_hdf5(
+            fptr,
+            tape,
+            psis.shape[1],
+            compression,
+            compression_opts,
+            shuffle,
         )
-        dset[:, :] = psis[:, :]
+        append_psi_hdf5(fptr, time, psis)
 
 
 def write_psi_ascii(path, data):
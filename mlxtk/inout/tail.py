@@ -0,0 +1,280 @@
+"""Incremental ingestion of growing ASCII files into HDF5.
+
+``qdtk_propagate.x`` appends a record to the ``gpop``, ``natpop`` and
+``output`` files after each time step. The tailers in this module follow these
+files and append all complete records to resizable datasets of an HDF5 file
+that uses the same layout as :func:`mlxtk.inout.gpop.add_gpop_to_hdf5`,
+:func:`mlxtk.inout.natpop.add_natpop_to_hdf5` and
+:func:`mlxtk.inout.output.add_output_to_hdf5`.
+
+The number of ingested bytes of each file is stored as the ``offset`` attribute
+of its group, so that ingestion can be resumed (e.g. for a continuation run).
+Records that are not newer than the last ingested time are skipped.
+"""
+
+import abc
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Union
+
+import h5py
+import numpy
+
+from mlxtk.inout import tools
+from mlxtk.inout.gpop import parse_gpop_lines
+from mlxtk.inout.natpop import parse_natpop_lines
+from mlxtk.log import get_logger
+from mlxtk.util import make_path
+
+LOGGER = get_logger(__name__)
+
+DEFAULT_INGEST_INTERVAL = 10.0
+
+
+def _append(group: h5py.Group, name: str, data: numpy.ndarray):
+    if name not in group:
+        tools.create_stream_dataset(group, name, data.shape[1:])
+    tools.append_to_dataset(group[name], data)
+
+
+def _get_time_mask(group: h5py.Group, times: numpy.ndarray) -> numpy.ndarray:
+    if ("time" not in group) or (group["time"].shape[0] == 0):
+        return numpy.ones(times.shape, dtype=bool)
+    return times > group["time"][-1]
+
+
+class AsciiTailer(abc.ABC):
+    """Follow a growing ASCII file and ingest its complete records.
+
+    Args:
+        path: path of the ASCII file
+        group_name: name of the HDF5 group that receives the data
+    """
+
+    def __init__(self, path: Union[str, Path], group_name: str):
+        self.path = make_path(path)
+        self.group_name = group_name
+
+    @abc.abstractmethod
+    def find_end(self, data: bytes, final: bool) -> int:
+        """Get the number of bytes of ``data`` that form complete records."""
+
+    @abc.abstractmethod
+    def is_record_start(self, fhandle, offset: int) -> bool:
+        """Check whether a record starts at the given offset of the file."""
+
+    @abc.abstractmethod
+    def ingest(self, group: h5py.Group, data: bytes) -> int:
+        """Append complete records to the group.
+
+        Returns:
+            The number of appended records.
+        """
+
+    def update(
+        self,
+        fptr: h5py.File,
+        final: bool = False,
+        chunk_bytes: int = tools.ASCII_CHUNK_BYTES,
+    ) -> int:
+        """Ingest all complete records that were written since the last update.
+
+        Args:
+            fptr: HDF5 file receiving the data
+            final: whether the file is complete, so that the last record does
+                not have to be followed by another one
+            chunk_bytes: approximate number of bytes to parse at once
+
+        Returns:
+            The number of appended records.
+        """
+        if not self.path.exists():
+            return 0
+
+        group = fptr.require_group(self.group_name)
+        offset = int(group.attrs.get("offset", 0))
+        records = 0
+
+        with open(self.path, "rb") as fhandle:
+            size = os.fstat(fhandle.fileno()).st_size
+            if offset and (
+                (offset > size) or (not self.is_record_start(fhandle, offset))
+            ):
+                LOGGER.warning("%s was rewritten, ingest it again", self.path)
+                offset = 0
+
+            fhandle.seek(offset)
+            data = b""
+            while True:
+                block = fhandle.read(chunk_bytes)
+                data += block
+                at_eof = len(block) < chunk_bytes
+                end = self.find_end(data, final and at_eof)
+                if end:
+                    records += self.ingest(group, data[:end])
+                    offset += end
+                    group.attrs["offset"] = offset
+                    data = data[end:]
+                if at_eof:
+                    break
+
+        return records
+
+
+class TimeStepTailer(AsciiTailer):
+    """Tailer for files whose records start with a ``#`` time stamp line."""
+
+    def find_end(self, data: bytes, final: bool) -> int:
+        if final:
+            return len(data)
+        return data.rfind(b"\n#") + 1
+
+    def is_record_start(self, fhandle, offset: int) -> bool:
+        fhandle.seek(offset - 1)
+        return fhandle.read(2) == b"\n#"
+
+
+class GpopTailer(TimeStepTailer):
+    def __init__(self, path: Union[str, Path], group_name: str = "gpop"):
+        super().__init__(path, group_name)
+
+    def ingest(self, group: h5py.Group, data: bytes) -> int:
+        if not data.strip():
+            return 0
+
+        times, grids, densities = parse_gpop_lines(data.splitlines())
+        mask = _get_time_mask(group, times)
+        if not mask.any():
+            return 0
+
+        for dof in grids:
+            group_dof = group.require_group("dof_" + str(dof))
+            if "grid" not in group_dof:
+                group_dof.create_dataset("grid", data=grids[dof])
+            _append(group_dof, "density", densities[dof][mask])
+        _append(group, "time", times[mask])
+
+        return int(mask.sum())
+
+
+class NatpopTailer(TimeStepTailer):
+    def __init__(self, path: Union[str, Path], group_name: str = "natpop"):
+        super().__init__(path, group_name)
+
+    def ingest(self, group: h5py.Group, data: bytes) -> int:
+        times, natpops = parse_natpop_lines(data.decode().splitlines())
+        if not times.shape[0]:
+            return 0
+
+        mask = _get_time_mask(group, times)
+        if not mask.any():
+            return 0
+
+        for node in natpops:
+            group_node = group.require_group("node_" + str(node))
+            for dof in natpops[node]:
+                _append(group_node, "dof_" + str(dof), natpops[node][dof][mask])
+        _append(group, "time", times[mask])
+
+        return int(mask.sum())
+
+
+class OutputTailer(AsciiTailer):
+    """Tailer for the ``output`` file that contains one record per line."""
+
+    columns = ["time", "norm", "energy", "overlap"]
+
+    def __init__(self, path: Union[str, Path], group_name: str = "output"):
+        super().__init__(path, group_name)
+
+    def find_end(self, data: bytes, final: bool) -> int:
+        if final:
+            return len(data)
+        return data.rfind(b"\n") + 1
+
+    def is_record_start(self, fhandle, offset: int) -> bool:
+        fhandle.seek(offset - 1)
+        return fhandle.read(1) == b"\n"
+
+    def ingest(self, group: h5py.Group, data: bytes) -> int:
+        text = data.decode()
+        if not text.strip():
+            return 0
+
+        values = numpy.fromstring(text, sep=" ")
+        if values.shape[0] % len(self.columns):
+            raise RuntimeError(f"Malformed output file {self.path}")
+        values = values.reshape((-1, len(self.columns)))
+
+        mask = _get_time_mask(group, values[:, 0])
+        if not mask.any():
+            return 0
+
+        for i, name in enumerate(self.columns):
+            _append(group, name, values[mask, i])
+
+        return int(mask.sum())
+
+
+class LiveIngestion:
+    """Ingest growing ASCII files into an HDF5 file in a background thread.
+
+    The files are ingested every ``interval`` seconds while the context is
+    active. The HDF5 file is only opened for the duration of an update so that
+    it can be read in the meantime; updates are retried later if the file is
+    in use. When the context is left without an exception, a final update
+    ingests the remaining records.
+
+    Args:
+        path: path of the HDF5 file
+        tailers: tailers for the files to ingest
+        interval: time between two updates in seconds
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        tailers: List[AsciiTailer],
+        interval: float = DEFAULT_INGEST_INTERVAL,
+    ):
+        self.logger = get_logger(__name__ + ".LiveIngestion")
+        self.path = make_path(path).resolve()
+        self.tailers = tailers
+        self.interval = interval
+        self.event_stop = threading.Event()
+        self.thread = None  # type: Optional[threading.Thread]
+
+    def update(self, final: bool = False) -> int:
+        """Ingest all new records.
+
+        Returns:
+            The number of appended records.
+        """
+        if not self.tailers:
+            return 0
+
+        with h5py.File(self.path, "a") as fptr:
+            return sum(tailer.update(fptr, final) for tailer in self.tailers)
+
+    def _run(self):
+        while not self.event_stop.wait(self.interval):
+            try:
+                records = self.update()
+                self.logger.debug("ingested %d record(s)", records)
+            except (OSError, RuntimeError, ValueError) as e:
+                self.logger.warning("live ingestion failed, retry later: %s", e)
+
+    def __enter__(self) -> "LiveIngestion":
+        self.event_stop.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.event_stop.set()
+        self.thread.join()
+        self.thread = None
+
+        if exc_type is None:
+            self.update(final=True)
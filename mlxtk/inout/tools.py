@@ -3,8 +3,12 @@
 This module provides common functions when working with I/O.
 """
 
+import os
 from pathlib import Path
-from typing import List, Tuple, Union
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+import h5py
+import numpy
 
 from mlxtk.util import make_path
 
@@ -12,6 +16,14 @@ HDF5_MAGIC_NUMBER = bytes([0x89, 0x48, 0x44, 0x46, 0x0D, 0x0A, 0x1A, 0x0A])
 """bytes: Magic number of the HDF5 file format.
 """
 
+ASCII_CHUNK_BYTES = 64 << 20
+"""int: Approximate number of bytes of an ASCII file that are parsed at once.
+"""
+
+HDF5_CHUNK_ELEMENTS = 1 << 18
+"""int: Approximate number of elements per chunk of streamed HDF5 datasets.
+"""
+
 
 def is_hdf5_path(path: Union[str, Path]) -> Tuple[bool, Path, str]:
     """Parse a path which potentially resides inside a HDF5 file
@@ -58,3 +70,267 @@ def is_hdf5_file(path: Path) -> bool:
 
     with open(path, "rb") as fptr:
         return fptr.read(8) == HDF5_MAGIC_NUMBER
+
+
+def read_ascii_blocks(
+    path: Union[str, Path],
+    num_columns: int,
+    chunk_bytes: int = ASCII_CHUNK_BYTES,
+) -> Iterator[numpy.ndarray]:
+    """Read a whitespace separated table that consists of time steps.
+
+    The first column of the table holds the time. All rows of one time step
+    form a block and all blocks have the same number of rows. Blank lines are
+    ignored. The file is parsed in chunks of roughly ``chunk_bytes`` bytes, so
+    that only a few blocks are held in memory at once.
+
+    Args:
+        path: path of the ASCII file
+        num_columns: number of columns of the table
+        chunk_bytes: approximate number of bytes to parse at once
+
+    Yields:
+        numpy.ndarray: arrays of shape ``(steps, rows, num_columns)`` holding
+            complete time steps.
+    """
+    block_size = None  # type: Optional[int]
+    pending = numpy.zeros((0, num_columns), dtype=numpy.float64)
+
+    with open(path, "rb") as fptr:
+        while True:
+            lines = fptr.readlines(chunk_bytes)
+            text = b"".join(lines).decode()
+            if text.strip():
+                data = numpy.fromstring(text, sep=" ")
+                if data.shape[0] % num_columns:
+                    raise RuntimeError(
+                        f"Malformed table in {path}: expected {num_columns} columns",
+                    )
+                pending = numpy.concatenate(
+                    (pending, data.reshape((-1, num_columns))),
+                )
+
+            if (block_size is None) and pending.shape[0]:
+                changed = numpy.nonzero(pending[:, 0] != pending[0, 0])[0]
+                if changed.shape[0]:
+                    block_size = int(changed[0])
+                elif lines:
+                    continue
+                else:
+                    block_size = pending.shape[0]
+
+            if block_size:
+                num_blocks = pending.shape[0] // block_size
+                if num_blocks:
+                    blocks = pending[: num_blocks * block_size].reshape(
+                        (num_blocks, block_size, num_columns),
+                    )
+                    if not (blocks[:, :, 0] == blocks[:, :1, 0]).all():
+                        raise RuntimeError(
+                            f"Malformed table in {path}: time steps differ in size",
+                        )
+                    pending = pending[num_blocks * block_size :]
+                    yield blocks
+
+            if not lines:
+                break
+
+    if pending.shape[0]:
+        raise RuntimeError(f"Malformed table in {path}: incomplete time step")
+
+
+def create_stream_dataset(
+    group: Union[h5py.File, h5py.Group],
+    name: str,
+    shape: Sequence[int],
+    dtype=numpy.float64,
+) -> h5py.Dataset:
+    """Create a chunked dataset that can be extended along its first axis.
+
+    Args:
+        group: group in which the dataset is created
+        name: name of the dataset
+        shape: shape of one entry along the first axis
+        dtype: data type of the dataset
+    """
+    shape = tuple(shape)
+    steps = max(1, HDF5_CHUNK_ELEMENTS // max(1, int(numpy.prod(shape))))
+    return group.create_dataset(
+        name,
+        shape=(0,) + shape,
+        maxshape=(None,) + shape,
+        chunks=(steps,) + tuple(max(1, n) for n in shape),
+        dtype=dtype,
+    )
+
+
+def append_to_dataset(dset: h5py.Dataset, data: numpy.ndarray):
+    """Append data along the first axis of a resizable dataset."""
+    start = dset.shape[0]
+    dset.resize(start + data.shape[0], axis=0)
+    dset[start:] = data
+
+
+def iter_ascii_steps(
+    path: Union[str, Path],
+    num_indices: int,
+    num_values: int,
+    chunk_bytes: int = ASCII_CHUNK_BYTES,
+) -> Iterator[Tuple[numpy.ndarray, List[numpy.ndarray], List[numpy.ndarray]]]:
+    """Read a table of values on a regular grid for each time step.
+
+    Each row of the table consists of the time, ``num_indices`` coordinates
+    (grid points or indices) and ``num_values`` values. The coordinates of all
+    time steps have to be identical and the last coordinate has to vary
+    fastest.
+
+    Args:
+        path: path of the ASCII file
+        num_indices: number of coordinate columns
+        num_values: number of value columns
+        chunk_bytes: approximate number of bytes to parse at once
+
+    Yields:
+        Tuple[numpy.ndarray, List[numpy.ndarray], List[numpy.ndarray]]: times,
+            coordinates and values (shape ``(steps, len(coord1), ...)``) for
+            consecutive time steps.
+    """
+    first = None  # type: Optional[numpy.ndarray]
+    axes = []  # type: List[numpy.ndarray]
+    shape = ()  # type: Tuple[int, ...]
+    for blocks in read_ascii_blocks(path, 1 + num_indices + num_values, chunk_bytes):
+        if first is None:
+            first = blocks[0, :, 1 : 1 + num_indices].copy()
+            axes = [numpy.unique(first[:, i]) for i in range(num_indices)]
+            shape = tuple(len(axis) for axis in axes)
+            if int(numpy.prod(shape)) != first.shape[0]:
+                raise RuntimeError(f"Malformed table in {path}: irregular grid")
+
+        if not (blocks[:, :, 1 : 1 + num_indices] == first).all():
+            raise RuntimeError(f"Malformed table in {path}: grid changes over time")
+
+        yield (
+            blocks[:, 0, 0].copy(),
+            axes,
+            [
+                blocks[:, :, 1 + num_indices + i].reshape((-1,) + shape)
+                for i in range(num_values)
+            ],
+        )
+
+
+def read_ascii_steps(
+    path: Union[str, Path],
+    num_indices: int,
+    num_values: int,
+) -> Tuple[numpy.ndarray, List[numpy.ndarray], List[numpy.ndarray]]:
+    """Read a table of values on a regular grid for all time steps at once.
+
+    See :func:`iter_ascii_steps` for a description of the format.
+    """
+    times = []  # type: List[numpy.ndarray]
+    axes = []  # type: List[numpy.ndarray]
+    values = [[] for _ in range(num_values)]  # type: List[List[numpy.ndarray]]
+    for chunk_times, axes, chunk_values in iter_ascii_steps(
+        path,
+        num_indices,
+        num_values,
+    ):
+        times.append(chunk_times)
+        for i, value in enumerate(chunk_values):
+            values[i].append(value)
+
+    if not times:
+        raise RuntimeError(f"No data in {path}")
+
+    return (
+        numpy.concatenate(times),
+        axes,
+        [numpy.concatenate(value) for value in values],
+    )
+
+
+def add_ascii_steps_to_hdf5(
+    group: Union[h5py.File, h5py.Group],
+    path: Union[str, Path],
+    index_names: Sequence[Optional[str]],
+    value_names: Sequence[str],
+    chunk_bytes: int = ASCII_CHUNK_BYTES,
+):
+    """Convert a table of values on a regular grid to HDF5 datasets.
+
+    The table is streamed into chunked datasets ``time`` and ``value_names``,
+    so that the memory usage does not depend on the number of time steps. See
+    :func:`iter_ascii_steps` for a description of the format.
+
+    Args:
+        group: group in which the datasets are created
+        path: path of the ASCII file
+        index_names: names of the datasets storing the coordinates (``None``
+            to skip a coordinate)
+        value_names: names of the datasets storing the values
+        chunk_bytes: approximate number of bytes to parse at once
+    """
+    dset_time = None  # type: Optional[h5py.Dataset]
+    dsets = []  # type: List[h5py.Dataset]
+    for times, axes, values in iter_ascii_steps(
+        path,
+        len(index_names),
+        len(value_names),
+        chunk_bytes,
+    ):
+        if dset_time is None:
+            for name, axis in zip(index_names, axes):
+                if name is not None:
+                    group.create_dataset(name, data=axis)
+            dset_time = create_stream_dataset(group, "time", ())
+            dsets = [
+                create_stream_dataset(group, name, values[0].shape[1:])
+                for name in value_names
+            ]
+
+        append_to_dataset(dset_time, times)
+        for dset, value in zip(dsets, values):
+            append_to_dataset(dset, value)
+
+    if dset_time is None:
+        raise RuntimeError(f"No data in {path}")
+
+
+def read_last_line(path: Union[str, Path], block_size: int = 4096) -> Optional[bytes]:
+    """Read the last complete, non-empty line of a file.
+
+    The file is read backwards in blocks starting from its end, so that the
+    cost does not depend on the size of the file. A trailing line that is not
+    terminated by a newline (e.g. because it is still being written) is
+    ignored.
+
+    Args:
+        path: path of the file
+        block_size: number of bytes to read at once
+
+    Returns:
+        The last line without its line ending or ``None`` if there is no
+        complete line.
+    """
+    with open(path, "rb") as fptr:
+        position = fptr.seek(0, os.SEEK_END)
+        data = b""
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            fptr.seek(position)
+            data = fptr.read(step) + data
+
+            newline = data.rfind(b"\n")
+            if newline < 0:
+                continue
+
+            text = data[:newline].rstrip()
+            start = text.rfind(b"\n")
+            if start >= 0:
+                return text[start + 1 :]
+            if (position == 0) and text:
+                return text
+
+    return None
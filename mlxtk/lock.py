@@ -1,16 +1,23 @@
-"""A simple lock file implementation.
+"""Lock file implementations.
 
 This module contains a simple class to represent a lock file that can be used
-to prevent simultaneous accesses.
+to prevent simultaneous accesses and a lock based on ``flock`` that supports
+shared and exclusive locking with blocking waits.
 
 Todo:
     * Use ``pathlib.Path.touch`` with ``exist_ok=False`` to create file.
 """
 
+import errno
+import fcntl
 import json
 import os
 import platform
+import signal
+import threading
+import time
 from pathlib import Path
+from typing import Optional
 
 from mlxtk.log import get_logger
 
@@ -54,3 +61,230 @@ class LockFile:
         del traceback
 
         self.path.unlink()
+
+
+class FileLockTimeoutError(Exception):
+    """Error that is thrown when a lock could not be acquired in time.
+
+    Args:
+        path: path of the lock file
+        timeout: time waited for the lock in seconds
+    """
+
+    def __init__(self, path: Path, timeout: float):
+        super().__init__(f"Could not acquire lock {path} within {timeout} s")
+
+
+class _FlockInterrupted(Exception):
+    pass
+
+
+def _raise_interrupted(signum, frame):
+    del signum
+    del frame
+    raise _FlockInterrupted()
+
+
+def _is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def is_lock_file_active(path: Path) -> bool:
+    """Check whether a lock file written by :class:`LockFile` is still held.
+
+    Lock files of processes that died on the local host are not held. Holders
+    on other hosts cannot be checked and are assumed to be alive.
+
+    Args:
+        path: path of the lock file
+    """
+    try:
+        with open(path) as fptr:
+            holder = json.load(fptr)
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError):
+        # the file might be written right now
+        return True
+
+    if holder.get("host") != platform.node():
+        return True
+
+    return _is_process_alive(holder["pid"])
+
+
+class FileLock:
+    """Inter-process lock based on ``flock``.
+
+    Waiting processes block in the kernel until the lock is released, the
+    lock is released automatically when the holding process dies. The holder of
+    an exclusive lock records its host and PID in the lock file like
+    :class:`LockFile`. If the recorded process is found to be dead on the local
+    host while the lock is still held (e.g. by a forked child that inherited
+    the file descriptor), a warning is logged while waiting.
+
+    Args:
+        path: path of the lock file
+        shared: acquire a shared (read) lock instead of an exclusive one
+        timeout: maximum time to wait in seconds (``None`` to wait forever)
+        check_interval: interval in seconds to check for dead holders
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        shared: bool = False,
+        timeout: Optional[float] = None,
+        check_interval: float = 5.0,
+    ):
+        self.path = path.resolve()
+        self.shared = shared
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.fd = None  # type: Optional[int]
+
+    def _flock(self, fd: int, timeout: float) -> bool:
+        operation = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+        try:
+            fcntl.flock(fd, operation | fcntl.LOCK_NB)
+            return True
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+
+        if timeout <= 0.0:
+            return False
+
+        if threading.current_thread() is not threading.main_thread():
+            # signals can only be used in the main thread, poll instead
+            deadline = time.monotonic() + timeout
+            interval = 0.001
+            while time.monotonic() < deadline:
+                time.sleep(min(interval, max(deadline - time.monotonic(), 0.0)))
+                interval = min(2 * interval, 0.1)
+                try:
+                    fcntl.flock(fd, operation | fcntl.LOCK_NB)
+                    return True
+                except OSError as e:
+                    if e.errno not in (errno.EAGAIN, errno.EACCES):
+                        raise
+            return False
+
+        # block in flock until the lock is free or the timer interrupts it, a
+        # timer of the caller is suspended meanwhile and resumed afterwards
+        previous_delay, previous_interval = signal.setitimer(signal.ITIMER_REAL, 0.0)
+        if previous_delay > 0.0:
+            timeout = min(timeout, previous_delay)
+        previous_handler = signal.signal(signal.SIGALRM, _raise_interrupted)
+        start = time.monotonic()
+        try:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                fcntl.flock(fd, operation)
+                return True
+            except _FlockInterrupted:
+                return False
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0.0)
+        finally:
+            signal.signal(signal.SIGALRM, previous_handler)
+            if previous_delay > 0.0:
+                signal.setitimer(
+                    signal.ITIMER_REAL,
+                    max(previous_delay - (time.monotonic() - start), 1e-6),
+                    previous_interval,
+                )
+
+    def _get_dead_holder(self) -> Optional[int]:
+        try:
+            with open(self.path) as fptr:
+                holder = json.load(fptr)
+        except (OSError, ValueError):
+            return None
+
+        if holder.get("host") != platform.node():
+            return None
+
+        if _is_process_alive(holder["pid"]):
+            return None
+
+        return holder["pid"]
+
+    def acquire(self):
+        start = time.monotonic()
+        reported_holder = None  # type: Optional[int]
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            remaining = self.check_interval
+            if self.timeout is not None:
+                remaining = min(
+                    remaining,
+                    max(self.timeout - (time.monotonic() - start), 0.0),
+                )
+
+            if self._flock(fd, remaining):
+                # make sure the lock file was not replaced in the meantime
+                try:
+                    same_file = os.path.samestat(os.fstat(fd), os.stat(self.path))
+                except FileNotFoundError:
+                    same_file = False
+                if same_file:
+                    break
+            os.close(fd)
+
+            if (self.timeout is not None) and (
+                time.monotonic() - start >= self.timeout
+            ):
+                raise FileLockTimeoutError(self.path, self.timeout)
+
+            # the lock is still held through a file descriptor that a live
+            # process inherited, it must not be broken
+            dead_holder = self._get_dead_holder()
+            if (dead_holder is not None) and (dead_holder != reported_holder):
+                LOGGER.warning(
+                    "lock %s was acquired by process %d which is not running "
+                    "anymore, but it is still held by a process that inherited "
+                    "the file descriptor",
+                    self.path,
+                    dead_holder,
+                )
+                reported_holder = dead_holder
+
+        self.fd = fd
+        if self.shared:
+            # no exclusive holder can exist, remove records of crashed holders
+            if os.fstat(fd).st_size:
+                os.ftruncate(fd, 0)
+        else:
+            os.ftruncate(fd, 0)
+            os.write(
+                fd,
+                json.dumps({"host": platform.node(), "pid": os.getpid()}).encode(),
+            )
+
+    def release(self):
+        if self.fd is None:
+            return
+
+        if not self.shared:
+            os.ftruncate(self.fd, 0)
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        del exc_type
+        del exc_value
+        del traceback
+
+        self.release()
@@ -5,22 +5,25 @@ parameter ranges.
 """
 
 import argparse
+import json
 import os
 import pickle
-import subprocess
 import sys
 from itertools import combinations
 from pathlib import Path
-from typing import Callable, List, Union
+from typing import Callable, Dict, List, Union
 
 import mlxtk.parameters
 from mlxtk import cwd
 from mlxtk.cwd import WorkingDir
-from mlxtk.hashing import hash_string
+from mlxtk.hashing import hash_bytes, hash_string
 from mlxtk.log import get_logger
 from mlxtk.parameters import Parameters
+from mlxtk.scan_index import ScanIndex
 from mlxtk.simulation import Simulation
 from mlxtk.simulation_set import SimulationSet
+from mlxtk.simulation_set.cmd_profile import run_profile
+from mlxtk.simulation_set.cmd_qsub_array import submit_array_jobs
 
 assert List
 
@@ -59,83 +62,183 @@ class ParameterScan(SimulationSet):
         ]
 
     def store_parameters(self):
+        """Store the parameters of all combinations.
+
+        The parameters are written to ``parameters.pickle`` and
+        ``parameters.json`` in each simulation directory and to the scan index
+        (``scan.sqlite``). A digest of the parameters of each simulation is
+        kept in the index so that only directories whose parameters changed
+        are written. ``scan.pickle`` is kept for compatibility and only
+        rewritten when the scan changed.
+        """
         self.logger.info("storing scan parameters")
         self.create_working_dir()
 
         if not self.combinations:
             return
 
-        with cwd.WorkingDir(self.working_dir):
-            for combination in self.combinations:
-                working_dir = self.compute_working_dir(combination)
-                working_dir.mkdir(exist_ok=True, parents=True)
-                with cwd.WorkingDir(working_dir):
-                    with open("parameters.pickle", "wb") as fptr:
-                        pickle.dump(combination, fptr, protocol=3)
-
-                    with open("parameters.json", "w") as fptr:
-                        fptr.write(combination.to_json() + "\n")
-
-            with open("scan.pickle", "wb") as fptr:
-                pickle.dump(
-                    [combination for combination in self.combinations],
-                    fptr,
-                    protocol=3,
-                )
+        index = ScanIndex(self.working_dir)
+        known = index.get_digests()
+        stored = set(known.values())
+        path_sim = self.working_dir / "sim"
+        existing = set(os.listdir(path_sim)) if path_sim.exists() else set()
+
+        changed = []
+        written = 0
+        for i, combination in enumerate(self.combinations):
+            blob = pickle.dumps(combination, protocol=3)
+            digest = hash_bytes(blob)
+            working_dir = self.compute_working_dir(combination)
+            entry = (working_dir.name, digest)
+
+            if known.get(i) != entry:
+                changed.append((i, working_dir.name, digest, blob))
+
+            if (working_dir.name in existing) and (entry in stored):
+                continue
+
+            working_dir.mkdir(exist_ok=True, parents=True)
+            with open(working_dir / "parameters.pickle", "wb") as fptr:
+                fptr.write(blob)
+
+            with open(working_dir / "parameters.json", "w") as fptr:
+                fptr.write(combination.to_json() + "\n")
+            written += 1
+
+        self.logger.info(
+            "wrote parameters of %d of %d simulation(s)",
+            written,
+            len(self.combinations),
+        )
+
+        path_pickle = self.working_dir / "scan.pickle"
+        if changed or (len(known) != len(self.combinations)):
+            index.update(changed, len(self.combinations))
+        elif path_pickle.exists():
+            return
+
+        with open(path_pickle, "wb") as fptr:
+            pickle.dump(
+                [combination for combination in self.combinations],
+                fptr,
+                protocol=3,
+            )
+
+    def get_simulation_links(self) -> Dict[str, str]:
+        """Compute the symlinks pointing to the simulation directories.
 
-    def link_simulations(self):
+        Returns:
+            Mapping of the link paths (relative to the working directory) to
+            their relative targets.
+        """
         if not self.combinations:
-            return
+            return {}
+
+        working_dir = Path(os.path.realpath(self.working_dir))
+        targets = []
+        for combination in self.combinations:
+            path = self.compute_working_dir(combination)
+            targets.append(
+                os.path.relpath(
+                    os.path.realpath(path),
+                    working_dir / "by_index",
+                ),
+            )
 
-        self.logger.info("create simulation symlinks")
-        self.create_working_dir()
+        links = {}
+        for index, target in enumerate(targets):
+            links[os.path.join("by_index", str(index))] = target
 
-        # link by index
-        with cwd.WorkingDir(self.working_dir):
-            path_by_index = Path("by_index")
-            if not path_by_index.exists():
-                os.makedirs(path_by_index)
+        variables, constants = mlxtk.parameters.get_variables(self.combinations)
+        for combination, target in zip(self.combinations, targets):
+            if not variables:
+                name = "_".join(
+                    constant + "=" + str(combination[constant])
+                    for constant in constants
+                )
+            else:
+                name = "_".join(
+                    variable + "=" + str(combination[variable])
+                    for variable in variables
+                )
+            # by_index and by_param are on the same level, targets are equal
+            links[os.path.join("by_param", name)] = target
 
-            for index, combination in enumerate(self.combinations):
-                path = self.compute_working_dir(combination)
-                link = path_by_index / str(index)
+        return links
 
-                if link.exists():
-                    link.unlink()
-                subprocess.run(["ln", "-s", "-f", "-r", path, link])
+    def link_simulations(self, force: bool = False):
+        """Create the ``by_index`` and ``by_param`` symlinks.
 
-        # link by parameters
-        with cwd.WorkingDir(self.working_dir):
-            path_by_param = Path("by_param")
-            if not path_by_param.exists():
-                os.makedirs(path_by_param)
-
-            variables, constants = mlxtk.parameters.get_variables(self.combinations)
-            for combination in self.combinations:
-                try:
-                    if not variables:
-                        name = "_".join(
-                            constant + "=" + str(combination[constant])
-                            for constant in constants
-                        )
-                    else:
-                        name = "_".join(
-                            variable + "=" + str(combination[variable])
-                            for variable in variables
-                        )
-                    path = self.compute_working_dir(combination)
-                    link = path_by_param / name
-
-                    if link.exists():
-                        link.unlink()
-                    subprocess.run(["ln", "-s", "-f", "-r", path, link])
-                except OSError:
-                    continue
+        Only links that are missing or point to a different target are
+        (re)created and links that do not belong to the scan are removed. A
+        manifest of the links is stored so that the check is skipped when
+        the scan did not change, unless ``force`` is set.
+        """
+        if not self.combinations:
+            return
+
+        self.create_working_dir()
+
+        links = self.get_simulation_links()
+        digest = hash_string(json.dumps(links, sort_keys=True))
+        path_manifest = self.working_dir / "links.json"
+
+        if (
+            (not force)
+            and path_manifest.exists()
+            and (self.working_dir / "by_index").is_dir()
+            and (self.working_dir / "by_param").is_dir()
+        ):
+            try:
+                with open(path_manifest) as fptr:
+                    if json.load(fptr).get("digest") == digest:
+                        self.logger.info("simulation symlinks are up to date")
+                        return
+            except ValueError:
+                pass
+
+        self.logger.info("update simulation symlinks")
+
+        created = 0
+        removed = 0
+        for directory in ("by_index", "by_param"):
+            path_dir = self.working_dir / directory
+            path_dir.mkdir(exist_ok=True)
+
+            with os.scandir(path_dir) as it:
+                for entry in it:
+                    if not entry.is_symlink():
+                        continue
+
+                    link = os.path.join(directory, entry.name)
+                    target = links.get(link, None)
+                    if (target is not None) and (os.readlink(entry.path) == target):
+                        del links[link]
+                        continue
+
+                    os.unlink(entry.path)
+                    removed += 1
+
+        for link, target in links.items():
+            try:
+                os.symlink(target, self.working_dir / link)
+                created += 1
+            except OSError as e:
+                self.logger.warning("failed to create symlink %s: %s", link, e)
+
+        self.logger.info("created %d and removed %d symlink(s)", created, removed)
+
+        with open(path_manifest, "w") as fptr:
+            json.dump({"digest": digest}, fptr)
 
     def unlink_simulations(self):
         if not self.working_dir.exists():
             return
 
+        path_manifest = self.working_dir / "links.json"
+        if path_manifest.exists():
+            path_manifest.unlink()
+
         with cwd.WorkingDir(self.working_dir):
             path_by_index = Path("by_index")
             if path_by_index.exists():
@@ -159,7 +262,6 @@ class ParameterScan(SimulationSet):
 
     def cmd_dry_run(self, args: argparse.Namespace):
         self.compute_simulations()
-        self.unlink_simulations()
         self.store_parameters()
         self.link_simulations()
 
@@ -176,6 +278,16 @@ class ParameterScan(SimulationSet):
     def cmd_list_tasks(self, args: argparse.Namespace):
         self.compute_simulation(args.index).main(["list"])
 
+    def cmd_profile(self, args: argparse.Namespace):
+        self.logger.info("profile parameter scan")
+        run_profile(
+            self,
+            args,
+            [self.compute_simulation_name(p) for p in self.combinations],
+            [self.compute_working_dir(p).resolve() for p in self.combinations],
+            self.combinations,
+        )
+
     def cmd_propagation_status(self, args: argparse.Namespace):
         self.compute_simulations()
         super().cmd_propagation_status(args)
@@ -187,15 +299,20 @@ class ParameterScan(SimulationSet):
     def cmd_qsub_array(self, args: argparse.Namespace):
         self.simulations = [None for _ in self.combinations]
 
-        self.unlink_simulations()
-        self.store_parameters()
-        self.link_simulations()
+        if not args.dry_run:
+            self.store_parameters()
+            self.link_simulations()
 
-        super().cmd_qsub_array(args)
+        self.logger.info("submitting parameter scan as an array to SGE scheduler")
+        submit_array_jobs(
+            self,
+            args,
+            [self.compute_working_dir(p).resolve() for p in self.combinations],
+            self.combinations,
+        )
 
     def cmd_run(self, args: argparse.Namespace):
         self.compute_simulations()
-        self.unlink_simulations()
         self.store_parameters()
         self.link_simulations()
 
@@ -1,24 +1,71 @@
 """Selecting simulations from a scan based on parameters.
 """
 
+import numbers
 import os
 import pickle
 from copy import deepcopy
 from pathlib import Path
-from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 import numpy
 from tqdm import tqdm
 
 from mlxtk.cwd import WorkingDir
+from mlxtk.executor import AnalysisExecutor, get_default_executor
 from mlxtk.log import get_logger
-from mlxtk.parameters import Parameters, get_variables
-from mlxtk.util import make_path, map_parallel_progress
+from mlxtk.parameters import Parameters, get_parameters_key, get_variables
+from mlxtk.scan_index import ScanIndex
+from mlxtk.util import make_path
 
 LOGGER = get_logger(__name__)
 
 
+def _get_equal_mask(column: numpy.ndarray, value: Any) -> numpy.ndarray:
+    if column.dtype.kind in "biufc":
+        if isinstance(value, numbers.Number):
+            return column == value
+        return numpy.zeros(column.shape, dtype=bool)
+    return numpy.fromiter(
+        (entry == value for entry in column),
+        dtype=bool,
+        count=len(column),
+    )
+
+
+def _get_isin_mask(column: numpy.ndarray, values: Iterable[Any]) -> numpy.ndarray:
+    values = list(values)
+    if (column.dtype.kind in "biufc") and all(
+        isinstance(value, numbers.Number) for value in values
+    ):
+        return numpy.isin(column, values)
+    return numpy.fromiter(
+        (entry in values for entry in column),
+        dtype=bool,
+        count=len(column),
+    )
+
+
 class ParameterSelection:
+    """A selection of parameter sets of a scan.
+
+    The values of each parameter are stored column-wise in numpy arrays that
+    are created on first use, so that selections are computed as vectorized
+    masks. Parameter sets are looked up through a hash index on their
+    canonical values.
+    """
+
     def __init__(
         self,
         parameters: Iterable[Parameters],
@@ -30,37 +77,78 @@ class ParameterSelection:
         else:
             self.parameters = list(zip(indices, parameters))
         self.path = None if path is None else make_path(path).resolve()
+        self.indices = numpy.array([i for i, _ in self.parameters], dtype=numpy.int64)
+        self.columns = {}  # type: Dict[str, numpy.ndarray]
+        self._lookup = None  # type: Optional[Dict[str, int]]
+        self._names = None  # type: Optional[List[str]]
+
+    def get_names(self) -> List[str]:
+        """Get the names of the parameters shared by all parameter sets."""
+        if self._names is None:
+            if not self.parameters:
+                self._names = []
+            else:
+                names = set(self.parameters[0][1].names)
+                for _, parameters in self.parameters[1:]:
+                    names &= set(parameters.names)
+                self._names = [
+                    name for name in self.parameters[0][1].names if name in names
+                ]
+        return self._names
+
+    def get_column(self, name: str) -> numpy.ndarray:
+        """Get the values of a parameter for all parameter sets as an array."""
+        if name not in self.columns:
+            values = [parameters[name] for _, parameters in self.parameters]
+            column = numpy.array(values)
+            if (column.dtype.kind not in "biufc") or (column.ndim != 1):
+                column = numpy.empty(len(values), dtype=object)
+                for i, value in enumerate(values):
+                    column[i] = value
+            self.columns[name] = column
+        return self.columns[name]
+
+    def _subset(self, mask: numpy.ndarray) -> "ParameterSelection":
+        positions = numpy.nonzero(mask)[0]
+        selection = ParameterSelection(
+            [self.parameters[i][1] for i in positions],
+            self.path,
+            self.indices[positions].tolist(),
+        )
+        selection.columns = {
+            name: column[positions] for name, column in self.columns.items()
+        }
+        selection._names = self._names
+        return selection
+
+    def _group(self, name: str) -> Dict[Any, List[int]]:
+        groups = {}  # type: Dict[Any, List[int]]
+        for position, value in enumerate(self.get_column(name).tolist()):
+            groups.setdefault(value, []).append(position)
+        return groups
 
     def get_variable_names(self) -> List[str]:
         return get_variables([p[1] for p in self.parameters])[0]
 
     def copy(self):
         return ParameterSelection(
-            deepcopy(
-                [p[1].copy() for p in self.parameters],
-                self.path,
-                [p[0] for p in self.parameters],
-            ),
+            [p[1].copy() for p in self.parameters],
+            self.path,
+            [p[0] for p in self.parameters],
         )
 
     def partition_single(self, parameter_name: str):
-        parameter_values = self.get_values(parameter_name)
-        partitions = {
-            value: [[], []] for value in parameter_values
-        }  # type: Dict[Any, List[List[int], List[Parameters]]]
-        for index, parameter in self.parameters:
-            partitions[parameter[parameter_name]][0].append(index)
-            partitions[parameter[parameter_name]][1].append(
-                parameter.copy().remove_parameter(parameter_name),
-            )
-        return {
-            value: ParameterSelection(
-                partitions[value][1],
+        partitions = {}
+        for value, positions in self._group(parameter_name).items():
+            partitions[value] = ParameterSelection(
+                [
+                    self.parameters[i][1].copy().remove_parameter(parameter_name)
+                    for i in positions
+                ],
                 self.path,
-                partitions[value][0],
+                self.indices[positions].tolist(),
             )
-            for value in parameter_values
-        }
+        return partitions
 
     def partition(self, parameter_names: Union[str, List[str]]):
         if isinstance(parameter_names, str):
@@ -79,18 +167,15 @@ class ParameterSelection:
         Returns:
             A new ParameterSelection containing only matching parameter sets.
         """
-        entries = []
-        indices = []
-        for index, entry in self.parameters:
-            if entry[name] == value:
-                entries.append(entry)
-                indices.append(index)
-        return ParameterSelection(entries, self.path, indices)
+        return self._subset(_get_equal_mask(self.get_column(name), value))
 
     def group_by(self, name: str):
-        return {
-            value: self.fix_parameter(name, value) for value in self.get_values(name)
-        }
+        groups = {}
+        for value, positions in self._group(name).items():
+            mask = numpy.zeros(len(self.parameters), dtype=bool)
+            mask[positions] = True
+            groups[value] = self._subset(mask)
+        return groups
 
     def select_parameter(self, name: str, values: Iterable[Any]):
         """Select by multiple values of a single parameter.
@@ -102,11 +187,7 @@ class ParameterSelection:
         Returns:
             A new ParameterSelection containing only matching parameter sets.
         """
-        return ParameterSelection(
-            [entry[1] for entry in self.parameters if entry[1][name] in values],
-            self.path,
-            [entry[0] for entry in self.parameters if entry[1][name] in values],
-        )
+        return self._subset(_get_isin_mask(self.get_column(name), values))
 
     def select_parameters(self, names: Iterable[str], values: Iterable[Iterable[Any]]):
         """Select by multiple values of a single parameter.
@@ -118,10 +199,10 @@ class ParameterSelection:
         Returns:
             A new ParameterSelection containing only matching parameter sets.
         """
-        selection = self
+        mask = numpy.ones(len(self.parameters), dtype=bool)
         for name, vals in zip(names, values):
-            selection = selection.select_parameter(name, vals)
-        return selection
+            mask &= _get_isin_mask(self.get_column(name), vals)
+        return self._subset(mask)
 
     def get_values(self, name: str) -> Set[Any]:
         """Get all unique values for a parameter.
@@ -132,15 +213,46 @@ class ParameterSelection:
         Returns:
             All unique values of the given parameter.
         """
-        return list({entry[1][name] for entry in self.parameters})
+        return list(set(self.get_column(name).tolist()))
 
-    def get_path(self, parameters: Parameters) -> Path:
-        for entry, path in zip(self.parameters, self.get_paths()):
-            if parameters.has_same_common_parameters(entry[1]):
-                return path
+    def get_position(self, parameters: Parameters) -> int:
+        """Get the position of a parameter set in this selection.
+
+        Parameters that are not part of this selection are ignored. If all
+        parameters of the selection are specified, the position is found using
+        the hash index; otherwise the common parameters are compared.
+
+        Raises:
+            RuntimeError: No matching parameter set exists.
+        """
+        names = self.get_names()
+        common = set(parameters.names) & set(names)
+
+        if common == set(names):
+            if self._lookup is None:
+                self._lookup = {}
+                for position, (_, entry) in reversed(list(enumerate(self.parameters))):
+                    self._lookup[get_parameters_key(entry, names)] = position
+            position = self._lookup.get(get_parameters_key(parameters, names), None)
+            if position is not None:
+                return position
+        else:
+            mask = numpy.ones(len(self.parameters), dtype=bool)
+            for name in common:
+                mask &= _get_equal_mask(self.get_column(name), parameters[name])
+            positions = numpy.nonzero(mask)[0]
+            if positions.size:
+                return int(positions[0])
 
         raise RuntimeError("cannot find path for parameters: " + str(parameters))
 
+    def get_path(self, parameters: Parameters) -> Path:
+        if not self.path:
+            raise ValueError("No path is specified for ParameterSelection")
+
+        index = self.indices[self.get_position(parameters)]
+        return self.path / "by_index" / str(index)
+
     def get_paths(self) -> List[Path]:
         """Compute the paths for all included parameter sets.
 
@@ -168,14 +280,7 @@ class ParameterSelection:
 
     def get_variable_values(self) -> Tuple[List[str], Dict[str, numpy.array]]:
         variables = self.get_variable_names()
-        values = {var: [] for var in variables}
-
-        for _, parameters in self.parameters:
-            for var in variables:
-                values[var].append(parameters[var])
-
-        for var in variables:
-            values[var] = numpy.array(values[var])
+        values = {var: numpy.array(self.get_column(var).tolist()) for var in variables}
 
         return variables, values
 
@@ -183,6 +288,7 @@ class ParameterSelection:
         self,
         func: Callable[[int, str, Parameters], Any],
         parallel=True,
+        executor: Optional[AnalysisExecutor] = None,
     ) -> List[Any]:
         """Call a function for each included parameter set.
 
@@ -190,14 +296,54 @@ class ParameterSelection:
             func: Function to call for each parameter set. It takes the index
                 of the parameter set as the first argument, the path as a
                 second argument and the parameter set as the third argument.
+            parallel: Whether to call the function in parallel.
+            executor: Executor used for parallel calls (defaults to the
+                executor shared by all analyses of this process).
 
         Returns:
             The provided function may return values. This function returns a
             list of all return values created by calling the function for each
             parameter set.
         """
+        results = [None] * len(self.parameters)  # type: List[Any]
+        for position, result in self._foreach(func, parallel, executor):
+            results[position] = result
+        return results
+
+    def iforeach(
+        self,
+        func: Callable[[int, str, Parameters], Any],
+        parallel=True,
+        executor: Optional[AnalysisExecutor] = None,
+    ) -> Iterator[Tuple[int, Any]]:
+        """Call a function for each included parameter set lazily.
+
+        The results are yielded as soon as they are available, so that they do
+        not have to be kept in memory at once. See :meth:`foreach` for the
+        arguments.
+
+        Returns:
+            Iterator over tuples of the index of the parameter set and the
+            return value of the function. The order of the parameter sets is
+            not preserved for parallel calls.
+        """
+        indices = self.indices.tolist()
+        for position, result in self._foreach(func, parallel, executor):
+            yield indices[position], result
+
+    def _foreach(
+        self,
+        func: Callable[[int, str, Parameters], Any],
+        parallel: bool,
+        executor: Optional[AnalysisExecutor],
+    ) -> Iterator[Tuple[int, Any]]:
+        # the workers of a reused pool do not follow changes of the working
+        # directory (e.g. by plot_foreach)
+        working_dir = os.getcwd()
 
         def helper(item):
+            if os.getcwd() != working_dir:
+                os.chdir(working_dir)
             return func(item[0], item[1], item[2])
 
         work = [
@@ -206,12 +352,11 @@ class ParameterSelection:
         ]
 
         if parallel:
-            return map_parallel_progress(helper, work)
+            if executor is None:
+                executor = get_default_executor()
+            return executor.imap_unordered(helper, work, progress=True)
 
-        return [
-            func(entry[0], path, entry[1])
-            for entry, path in tqdm(list(zip(self.parameters, self.get_paths())))
-        ]
+        return enumerate(helper(item) for item in tqdm(work))
 
     def plot_foreach(
         self,
@@ -235,10 +380,18 @@ class ParameterSelection:
 def load_scan(path: Union[str, Path]) -> ParameterSelection:
     """Load all parameter sets of a parameter scan.
 
+    The parameters are read one by one from the scan index (``scan.sqlite``)
+    if present, otherwise from ``scan.pickle``.
+
     Args:
-        path: Path to the parameter scan containing the file ``scan.pickle``.
+        path: Path to the parameter scan containing the file ``scan.sqlite`` or
+            ``scan.pickle``.
     """
     path = make_path(path)
+    index = ScanIndex(path)
+    if index.exists():
+        return ParameterSelection(index, path)
+
     with open(path / "scan.pickle", "rb") as fptr:
         obj = pickle.load(fptr)
         return ParameterSelection((parameter for parameter in obj), path)
@@ -1,6 +1,7 @@
 import copy
 import itertools
 import json
+import numbers
 from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy
@@ -202,6 +203,34 @@ class Parameters:
         setattr(self, name, value)
 
 
+def get_canonical_value(value: Any) -> str:
+    # values that compare equal (e.g. 1, 1.0 and numpy.float64(1.0)) have to
+    # map to the same key
+    if isinstance(value, numbers.Integral):
+        value = int(value)
+        if abs(value) < 2**53:
+            return repr(float(value))
+        return repr(value)
+
+    if isinstance(value, numbers.Real):
+        return repr(float(value))
+
+    if isinstance(value, numbers.Complex):
+        value = complex(value)
+        if value.imag == 0.0:
+            return repr(value.real)
+        return repr(value)
+
+    return repr(value)
+
+
+def get_parameters_key(parameters: Parameters, names: Iterable[str]) -> str:
+    """Compute a canonical key of the given subset of parameters."""
+    return repr(
+        [(name, get_canonical_value(parameters[name])) for name in sorted(names)],
+    )
+
+
 def generate_all(parameters: Parameters, values: Dict[str, Any]) -> List[Parameters]:
     for name in parameters.names:
         values[name] = values.get(name, [parameters[name]])
@@ -0,0 +1,340 @@
+"""Predict the resources of simulations for the SGE scheduler.
+
+The resources used by previous runs of the simulations of a set or scan (see
+:mod:`mlxtk.scan_profile`) are used to fit a power law over the numeric
+variables of the scan, both for the CPU time and for the peak memory of a
+simulation. An upper bound of the prediction, multiplied by a safety factor, is
+requested as ``h_cpu`` and ``h_vmem`` for each job.
+
+``h_vmem`` limits the virtual memory of a job, which can be much larger than
+its resident set size. The memory model is therefore fitted to the peak
+virtual memory (``max_vm``) of the child processes. Simulations whose profile
+only contains the peak resident set size (e.g. from older versions) do not
+count as training data for the memory, so the default memory is used if none
+of them recorded the virtual memory.
+
+The requests are rounded up to a coarse ladder of values and the jobs of an
+array are grouped into a few resource classes that are submitted as separate
+job arrays, so that short jobs do not wait in the queues of long ones.
+Simulations without training data use the default resources.
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy
+
+from mlxtk.parameters import Parameters
+from mlxtk.scan_profile import TOTAL, get_costs, get_numeric_variables
+from mlxtk.util import parse_size
+
+DEFAULT_SAFETY_FACTOR = 1.5
+DEFAULT_MAX_CLASSES = 4
+
+# z-score of the upper bound of the prediction (~97.7% for normal residuals)
+UPPER_BOUND_Z = 2.0
+
+# memory used by the Python process running the tasks
+MEMORY_OVERHEAD = 512 << 20
+MEMORY_STEP = 256 << 20
+MIN_MEMORY = 512 << 20
+
+TIME_LADDER = [
+    10 * 60,
+    30 * 60,
+    3600,
+    2 * 3600,
+    4 * 3600,
+    8 * 3600,
+    12 * 3600,
+    24 * 3600,
+]
+
+RE_TIME = re.compile(r"^\s*(?:(?:(\d+):)?(\d+):)?(\d+)\s*$")
+
+
+def parse_time(time: str) -> int:
+    """Parse a time of the form ``[[HH:]MM:]SS`` in seconds."""
+    m = RE_TIME.match(time)
+    if not m:
+        raise ValueError(f'invalid time "{time}"')
+
+    hours, minutes, seconds = (int(group or 0) for group in m.groups())
+    return (hours * 60 + minutes) * 60 + seconds
+
+
+def format_time(seconds: float) -> str:
+    """Format a time in seconds as ``HH:MM:SS`` (as expected by ``h_cpu``)."""
+    minutes, seconds = divmod(int(numpy.ceil(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def format_memory(size: int) -> str:
+    """Format a memory size for ``h_vmem`` (e.g. ``"2G"`` or ``"768M"``)."""
+    if size % (1 << 30) == 0:
+        return f"{size >> 30}G"
+    return f"{-(-size // (1 << 20))}M"
+
+
+def round_memory(size: float) -> int:
+    """Round a memory size up to a multiple of :data:`MEMORY_STEP`."""
+    size = max(size, MIN_MEMORY)
+    return int(numpy.ceil(size / MEMORY_STEP)) * MEMORY_STEP
+
+
+def round_time(seconds: float) -> int:
+    """Round a time up to the next step of :data:`TIME_LADDER` (or full days)."""
+    for step in TIME_LADDER:
+        if seconds <= step:
+            return step
+    return int(numpy.ceil(seconds / TIME_LADDER[-1])) * TIME_LADDER[-1]
+
+
+class ResourceModel:
+    """Power law model of a cost as a function of the variables of a scan.
+
+    The logarithm of the cost is fitted linearly in the logarithms of the
+    variables (or the variables themselves if they are not all positive). If
+    there are too few data points for a fit, the largest observed cost is
+    predicted.
+
+    Args:
+        variables: names of the numeric variables of the scan
+    """
+
+    def __init__(self, variables: Sequence[str] = ()):
+        self.variables = list(variables)
+        self.logarithmic = {}  # type: Dict[str, bool]
+        self.coefficients = None  # type: Optional[numpy.ndarray]
+        self.sigma = 0.0
+        self.max_log = None  # type: Optional[float]
+
+    def _get_design_matrix(self, parameters: Sequence[Parameters]) -> numpy.ndarray:
+        columns = [numpy.ones(len(parameters))]
+        for name in self.variables:
+            values = numpy.array([p[name] for p in parameters], dtype=numpy.float64)
+            columns.append(numpy.log(values) if self.logarithmic[name] else values)
+        return numpy.column_stack(columns)
+
+    def fit(self, costs: numpy.ndarray, parameters: Sequence[Parameters]) -> bool:
+        """Fit the model.
+
+        Args:
+            costs: cost of each simulation (``NaN`` if unknown)
+            parameters: parameters of each simulation
+
+        Returns:
+            Whether there was any data to fit.
+        """
+        mask = numpy.isfinite(costs) & (costs > 0.0)
+        if not mask.any():
+            return False
+
+        logs = numpy.log(costs[mask])
+        self.max_log = float(logs.max())
+        parameters = [p for p, valid in zip(parameters, mask) if valid]
+
+        self.variables = [
+            name
+            for name in self.variables
+            if len({p[name] for p in parameters}) > 1
+        ]
+        if len(parameters) <= len(self.variables) + 1:
+            self.variables = []
+            self.coefficients = None
+            return True
+
+        self.logarithmic = {
+            name: all(p[name] > 0 for p in parameters) for name in self.variables
+        }
+        matrix = self._get_design_matrix(parameters)
+        self.coefficients = numpy.linalg.lstsq(matrix, logs, rcond=None)[0]
+        residuals = logs - matrix @ self.coefficients
+        self.sigma = float(
+            numpy.sqrt(
+                numpy.sum(residuals**2) / max(len(parameters) - matrix.shape[1], 1),
+            ),
+        )
+        return True
+
+    def predict(
+        self,
+        parameters: Parameters,
+        z: float = UPPER_BOUND_Z,
+    ) -> Optional[float]:
+        """Predict an upper bound of the cost for the given parameters.
+
+        Args:
+            parameters: parameters of the simulation
+            z: number of standard deviations of the residuals to add
+
+        Returns:
+            The predicted cost or ``None`` if the model was not fitted.
+        """
+        if self.max_log is None:
+            return None
+
+        if self.coefficients is None:
+            return float(numpy.exp(self.max_log))
+
+        if any(
+            self.logarithmic[name] and (parameters[name] <= 0)
+            for name in self.variables
+        ):
+            return float(numpy.exp(self.max_log))
+
+        matrix = self._get_design_matrix([parameters])
+        return float(numpy.exp((matrix @ self.coefficients)[0] + z * self.sigma))
+
+
+def predict_resources(
+    profiles: List[Dict[str, Dict[str, float]]],
+    parameters: Optional[List[Parameters]] = None,
+    safety_factor: float = DEFAULT_SAFETY_FACTOR,
+) -> List[Tuple[Optional[int], Optional[int]]]:
+    """Predict the memory and CPU time of each simulation.
+
+    Args:
+        profiles: profile of each simulation (see
+            :func:`mlxtk.scan_profile.load_simulation_profile`)
+        parameters: parameters of each simulation (for parameter scans)
+        safety_factor: factor applied to the predictions
+
+    Returns:
+        The memory in bytes and the CPU time in seconds for each simulation,
+        rounded up (see :func:`round_memory` and :func:`round_time`). Values
+        that cannot be predicted for lack of data are ``None``.
+    """
+    if parameters is None:
+        parameters = [Parameters() for _ in profiles]
+    variables = get_numeric_variables(parameters) if len(parameters) > 1 else []
+
+    # the CPU time of the child processes exceeds the wall-clock time when
+    # they use several threads
+    times = numpy.fmax(
+        get_costs(profiles, TOTAL, "time"),
+        get_costs(profiles, TOTAL, "cpu_time"),
+    )
+    # h_vmem limits the virtual memory, the resident set size is not a bound
+    memories = get_costs(profiles, TOTAL, "max_vm")
+
+    model_time = ResourceModel(variables)
+    model_time.fit(times, parameters)
+    model_memory = ResourceModel(variables)
+    model_memory.fit(memories, parameters)
+
+    predictions = []  # type: List[Tuple[Optional[int], Optional[int]]]
+    for p in parameters:
+        memory = model_memory.predict(p)
+        time = model_time.predict(p)
+        predictions.append(
+            (
+                None
+                if memory is None
+                else round_memory(memory * safety_factor + MEMORY_OVERHEAD),
+                None if time is None else round_time(time * safety_factor),
+            ),
+        )
+
+    return predictions
+
+
+def group_resource_classes(
+    allocations: List[Tuple[int, int]],
+    max_classes: int = DEFAULT_MAX_CLASSES,
+) -> List[Tuple[int, int, List[int]]]:
+    """Group jobs with similar resource requests.
+
+    Jobs with the same request form a class. As long as there are more than
+    ``max_classes`` classes, the two classes whose merge increases the total
+    reserved memory-time product the least are merged; the merged class
+    requests the maximum of both.
+
+    Args:
+        allocations: memory in bytes and CPU time in seconds for each job
+        max_classes: maximum number of classes
+
+    Returns:
+        The memory, the CPU time and the job indices of each class sorted by
+        the requested time.
+    """
+    classes = {}  # type: Dict[Tuple[int, int], List[int]]
+    for index, allocation in enumerate(allocations):
+        classes.setdefault(allocation, []).append(index)
+
+    def reservation(memory: int, time: int, indices: List[int]) -> float:
+        return float(memory) * float(time) * len(indices)
+
+    while len(classes) > max(max_classes, 1):
+        keys = sorted(classes)
+        best = None  # type: Optional[Tuple[float, Tuple[int, int], Tuple[int, int]]]
+        for i, first in enumerate(keys):
+            for second in keys[i + 1 :]:
+                merged = (max(first[0], second[0]), max(first[1], second[1]))
+                increase = (
+                    reservation(*merged, classes[first] + classes[second])
+                    - reservation(*first, classes[first])
+                    - reservation(*second, classes[second])
+                )
+                if (best is None) or (increase < best[0]):
+                    best = (increase, first, second)
+
+        _, first, second = best
+        merged = (max(first[0], second[0]), max(first[1], second[1]))
+        indices = classes.pop(first) + classes.pop(second)
+        classes[merged] = sorted(classes.get(merged, []) + indices)
+
+    return [
+        (memory, time, classes[(memory, time)])
+        for memory, time in sorted(classes, key=lambda key: (key[1], key[0]))
+    ]
+
+
+def plan_allocation(
+    profiles: List[Dict[str, Dict[str, float]]],
+    parameters: Optional[List[Parameters]],
+    default_memory: str,
+    default_time: str,
+    safety_factor: float = DEFAULT_SAFETY_FACTOR,
+    max_classes: int = DEFAULT_MAX_CLASSES,
+    cpus: int = 1,
+) -> List[Tuple[int, int, List[int]]]:
+    """Determine the resource classes for the simulations of a set or scan.
+
+    Resources that cannot be predicted use the default memory and time. SGE
+    applies ``h_vmem`` to each slot of the parallel environment, the predicted
+    memory of a simulation is therefore divided by the number of CPUs. The
+    default memory is already given per slot.
+
+    Returns:
+        The memory per slot in bytes, the CPU time in seconds and the
+        simulation indices of each class.
+    """
+    default_memory_bytes = parse_size(default_memory)
+    default_time_seconds = parse_time(default_time)
+    cpus = max(cpus, 1)
+    allocations = [
+        (
+            default_memory_bytes if memory is None else -(-memory // cpus),
+            default_time_seconds if time is None else time,
+        )
+        for memory, time in predict_resources(profiles, parameters, safety_factor)
+    ]
+    return group_resource_classes(allocations, max_classes)
+
+
+def format_indices(indices: Sequence[int]) -> str:
+    """Format indices as a compact list of ranges (e.g. ``"0-3,7"``)."""
+    ranges = []  # type: List[str]
+    indices = sorted(indices)
+    start = 0
+    for i in range(1, len(indices) + 1):
+        if (i < len(indices)) and (indices[i] == indices[i - 1] + 1):
+            continue
+        if i - 1 == start:
+            ranges.append(str(indices[start]))
+        else:
+            ranges.append(f"{indices[start]}-{indices[i - 1]}")
+        start = i
+    return ",".join(ranges)
@@ -0,0 +1,98 @@
+"""Index of the parameters of a parameter scan.
+
+The parameters of all simulations of a scan are stored in an SQLite database
+(``scan.sqlite``) inside the scan directory. Each row holds the pickled
+parameters of one simulation together with the name of its directory and a
+digest of the parameters. This allows to update the index incrementally and to
+read single entries without loading the whole scan.
+"""
+
+import contextlib
+import pickle
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
+
+from mlxtk.parameters import Parameters
+from mlxtk.util import make_path
+
+SCAN_INDEX = "scan.sqlite"
+
+ScanIndexEntry = Tuple[int, str, str, bytes]
+
+
+class ScanIndex:
+    """Parameters of a scan stored in an indexed database.
+
+    Args:
+        path: directory of the parameter scan
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = make_path(path) / SCAN_INDEX
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(str(self.path), timeout=60.0)
+        try:
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS parameters ("
+                    "idx INTEGER PRIMARY KEY, "
+                    "name TEXT NOT NULL, "
+                    "digest TEXT NOT NULL, "
+                    "parameters BLOB NOT NULL)",
+                )
+                yield connection
+        finally:
+            connection.close()
+
+    def __len__(self) -> int:
+        with self.transaction() as connection:
+            return connection.execute("SELECT COUNT(*) FROM parameters").fetchone()[0]
+
+    def __getitem__(self, index: int) -> Parameters:
+        with self.transaction() as connection:
+            row = connection.execute(
+                "SELECT parameters FROM parameters WHERE idx = ?",
+                (index,),
+            ).fetchone()
+        if row is None:
+            raise IndexError(f"no parameters with index {index}")
+        return pickle.loads(row[0])
+
+    def __iter__(self) -> Iterator[Parameters]:
+        with self.transaction() as connection:
+            for (blob,) in connection.execute(
+                "SELECT parameters FROM parameters ORDER BY idx",
+            ):
+                yield pickle.loads(blob)
+
+    def get_digests(self) -> Dict[int, Tuple[str, str]]:
+        """Get the directory name and parameter digest of all entries."""
+        with self.transaction() as connection:
+            return {
+                index: (name, digest)
+                for index, name, digest in connection.execute(
+                    "SELECT idx, name, digest FROM parameters",
+                )
+            }
+
+    def update(self, entries: List[ScanIndexEntry], size: int):
+        """Update the index in a single transaction.
+
+        Args:
+            entries: changed entries as tuples of index, directory name, digest
+                and pickled parameters
+            size: total number of entries, rows with larger indices are removed
+        """
+        with self.transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO parameters (idx, name, digest, parameters) "
+                "VALUES (?, ?, ?, ?)",
+                entries,
+            )
+            connection.execute("DELETE FROM parameters WHERE idx >= ?", (size,))
@@ -0,0 +1,315 @@
+"""Profile the simulations of a set or parameter scan.
+
+Each simulation records the run time of its tasks and the resources used by
+their child processes in its doit database (``doit.json``, see
+:class:`mlxtk.doit_compat.DoitAction`). The functions of this module collect
+these records for all simulations and aggregate them per task type, i.e. the
+part of the task name before the first colon (``propagate``, ``expval``,
+``reduced_density_matrix``, ...). The pseudo task type ``total`` contains the
+sum over all tasks of a simulation.
+
+For parameter scans the cost of each task type can be correlated with the
+numeric variables of the scan (e.g. the number of particles or the grid size).
+Simulations whose cost deviates strongly from the other simulations (after
+removing the fitted dependence on the scan variables) are flagged as outliers
+using the modified z-score of the logarithm of the cost.
+"""
+
+import numbers
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy
+import scipy.stats
+
+from mlxtk.doit_compat import load_doit_profile
+from mlxtk.log import get_logger
+from mlxtk.parameters import Parameters, get_variables
+from mlxtk.util import make_path
+
+LOGGER = get_logger(__name__)
+
+DOIT_DB_FILE = "doit.json"
+TOTAL = "total"
+COST_KEYS = ["time", "cpu_time", "max_rss", "max_vm", "read_bytes", "write_bytes"]
+DEFAULT_OUTLIER_THRESHOLD = 3.5
+
+
+def get_task_type(task: str) -> str:
+    return task.split(":", 1)[0]
+
+
+def _create_entry() -> Dict[str, Any]:
+    entry = {key: None for key in COST_KEYS}  # type: Dict[str, Any]
+    entry["tasks"] = 0
+    entry["time"] = 0.0
+    return entry
+
+
+def _add_sum(entry: Dict[str, Any], key: str, value: Optional[float]):
+    if value is not None:
+        entry[key] = (entry[key] or 0) + value
+
+
+def _add_max(entry: Dict[str, Any], key: str, value: Optional[float]):
+    if value is not None:
+        entry[key] = max(entry[key] or 0, value)
+
+
+def _add_values(entry: Dict[str, Any], values: Dict[str, Any]):
+    entry["time"] += values["monotonic_time"]
+    if values.get("children_user_time", None) is not None:
+        _add_sum(
+            entry,
+            "cpu_time",
+            values["children_user_time"] + values.get("children_system_time", 0.0),
+        )
+    _add_max(entry, "max_rss", values.get("children_max_rss", None))
+    _add_max(entry, "max_vm", values.get("children_max_vm", None))
+    _add_sum(entry, "read_bytes", values.get("children_read_bytes", None))
+    _add_sum(entry, "write_bytes", values.get("children_write_bytes", None))
+
+
+def load_simulation_profile(
+    working_dir: Union[str, Path],
+) -> Dict[str, Dict[str, Any]]:
+    """Load the cost of each task type of a simulation.
+
+    Args:
+        working_dir: working directory of the simulation
+
+    Returns:
+        The number of ``tasks``, the wall-clock ``time``, the ``cpu_time`` of
+        the child processes, their peak resident memory ``max_rss``, their
+        peak virtual memory ``max_vm`` and the ``read_bytes``/``write_bytes``
+        for each task type. Resources that were
+        not recorded are ``None``. The result is empty if the simulation was
+        not run yet.
+    """
+    path = make_path(working_dir) / DOIT_DB_FILE
+    if not path.exists():
+        return {}
+
+    try:
+        profile = load_doit_profile(str(path))
+    except (OSError, ValueError) as e:
+        LOGGER.warning("cannot read doit database %s: %s", path, e)
+        return {}
+
+    result = {}  # type: Dict[str, Dict[str, Any]]
+    for task, actions in profile.items():
+        if not actions:
+            continue
+
+        for task_type in (get_task_type(task), TOTAL):
+            entry = result.setdefault(task_type, _create_entry())
+            entry["tasks"] += 1
+            for values in actions.values():
+                _add_values(entry, values)
+
+    return result
+
+
+def collect_profiles(
+    working_dirs: Sequence[Union[str, Path]],
+    jobs: int = 16,
+) -> List[Dict[str, Dict[str, Any]]]:
+    """Load the profiles of several simulations in parallel.
+
+    See :func:`load_simulation_profile` for the format of each profile.
+    """
+    with ThreadPool(max(1, jobs)) as pool:
+        return pool.map(load_simulation_profile, working_dirs)
+
+
+def get_task_types(profiles: List[Dict[str, Dict[str, Any]]]) -> List[str]:
+    task_types = sorted({task_type for profile in profiles for task_type in profile})
+    if TOTAL in task_types:
+        task_types.remove(TOTAL)
+        task_types.append(TOTAL)
+    return task_types
+
+
+def get_costs(
+    profiles: List[Dict[str, Dict[str, Any]]],
+    task_type: str,
+    key: str = "time",
+) -> numpy.ndarray:
+    """Get one cost of a task type for each simulation (``NaN`` if missing)."""
+    costs = numpy.full(len(profiles), numpy.nan)
+    for i, profile in enumerate(profiles):
+        value = profile.get(task_type, {}).get(key, None)
+        if value is not None:
+            costs[i] = value
+    return costs
+
+
+def summarize_task_types(
+    profiles: List[Dict[str, Dict[str, Any]]],
+) -> Dict[str, Dict[str, Any]]:
+    """Aggregate the profiles of several simulations per task type.
+
+    Returns:
+        For each task type the number of ``simulations`` and ``tasks``, the
+        ``total``, ``mean``, ``median`` and ``max`` wall-clock time, the total
+        ``cpu_time``, the largest ``max_rss`` and ``max_vm`` and the total
+        ``read_bytes`` and ``write_bytes``.
+    """
+    summary = {}  # type: Dict[str, Dict[str, Any]]
+    for task_type in get_task_types(profiles):
+        entries = [profile[task_type] for profile in profiles if task_type in profile]
+        times = numpy.array([entry["time"] for entry in entries])
+        result = {
+            "simulations": len(entries),
+            "tasks": sum(entry["tasks"] for entry in entries),
+            "total": float(times.sum()),
+            "mean": float(times.mean()),
+            "median": float(numpy.median(times)),
+            "max": float(times.max()),
+        }  # type: Dict[str, Any]
+
+        aggregate = _create_entry()
+        for entry in entries:
+            _add_sum(aggregate, "cpu_time", entry["cpu_time"])
+            _add_max(aggregate, "max_rss", entry["max_rss"])
+            _add_max(aggregate, "max_vm", entry["max_vm"])
+            _add_sum(aggregate, "read_bytes", entry["read_bytes"])
+            _add_sum(aggregate, "write_bytes", entry["write_bytes"])
+        for key in ("cpu_time", "max_rss", "max_vm", "read_bytes", "write_bytes"):
+            result[key] = aggregate[key]
+
+        summary[task_type] = result
+
+    return summary
+
+
+def get_numeric_variables(parameters: List[Parameters]) -> List[str]:
+    """Get the names of the variables of a scan that have numeric values."""
+    if not parameters:
+        return []
+
+    return [
+        name
+        for name in get_variables(parameters)[0]
+        if all(
+            isinstance(p[name], numbers.Real) and not isinstance(p[name], bool)
+            for p in parameters
+        )
+    ]
+
+
+def correlate_parameters(
+    profiles: List[Dict[str, Dict[str, Any]]],
+    parameters: List[Parameters],
+    task_type: str,
+    key: str = "time",
+) -> Dict[str, Dict[str, Optional[float]]]:
+    """Correlate the cost of a task type with the variables of a scan.
+
+    Args:
+        profiles: profile of each simulation
+        parameters: parameters of each simulation
+        task_type: task type to analyze
+        key: cost to analyze (see :data:`COST_KEYS`)
+
+    Returns:
+        For each numeric variable the Spearman rank ``correlation`` of the cost
+        with the value of the variable and the ``exponent`` of a power law
+        fitted to the cost (``None`` if it cannot be determined, e.g. because
+        of non-positive values).
+    """
+    costs = get_costs(profiles, task_type, key)
+    mask = numpy.isfinite(costs) & (costs > 0.0)
+    if mask.sum() < 3:
+        return {}
+
+    result = {}  # type: Dict[str, Dict[str, Optional[float]]]
+    for name in get_numeric_variables(parameters):
+        values = numpy.array([p[name] for p in parameters], dtype=numpy.float64)[mask]
+        if numpy.unique(values).shape[0] < 2:
+            continue
+
+        correlation = None  # type: Optional[float]
+        if numpy.unique(costs[mask]).shape[0] > 1:
+            correlation = float(scipy.stats.spearmanr(values, costs[mask])[0])
+
+        exponent = None  # type: Optional[float]
+        if (values > 0.0).all():
+            exponent = float(
+                numpy.polyfit(numpy.log(values), numpy.log(costs[mask]), 1)[0],
+            )
+
+        result[name] = {"correlation": correlation, "exponent": exponent}
+
+    return result
+
+
+def get_design_matrix(
+    parameters: List[Parameters],
+    variables: List[str],
+) -> numpy.ndarray:
+    """Create the design matrix of a power law fit over scan variables.
+
+    The matrix contains a constant column and one column per variable with the
+    logarithm of its values (or the values themselves if they are not all
+    positive).
+    """
+    columns = [numpy.ones(len(parameters))]
+    for name in variables:
+        values = numpy.array([p[name] for p in parameters], dtype=numpy.float64)
+        columns.append(numpy.log(values) if (values > 0.0).all() else values)
+    return numpy.column_stack(columns)
+
+
+def find_outliers(
+    costs: numpy.ndarray,
+    threshold: float = DEFAULT_OUTLIER_THRESHOLD,
+    parameters: Optional[List[Parameters]] = None,
+) -> Dict[int, float]:
+    """Find costs that deviate strongly from the others.
+
+    The modified z-score ``0.6745 * (x - median(x)) / MAD`` of the logarithm of
+    the costs is used, so that a single expensive simulation does not hide
+    others. If the parameters of a scan are given, the expected dependence of
+    the cost on the numeric variables is removed first by fitting a power law
+    (see :func:`get_design_matrix`), so that only simulations that are
+    unexpectedly expensive (or cheap) for their parameters are flagged.
+
+    Args:
+        costs: one cost per simulation (``NaN`` for missing values)
+        threshold: smallest absolute score of an outlier
+        parameters: parameters of each simulation
+
+    Returns:
+        The score of each outlier by position.
+    """
+    mask = numpy.isfinite(costs) & (costs > 0.0)
+    if mask.sum() < 3:
+        return {}
+
+    logs = numpy.log(costs[mask])
+    if parameters:
+        variables = get_numeric_variables(parameters)
+        if mask.sum() > len(variables) + 2:
+            matrix = get_design_matrix(parameters, variables)[mask]
+            coefficients = numpy.linalg.lstsq(matrix, logs, rcond=None)[0]
+            logs = logs - matrix @ coefficients
+
+    deviation = logs - numpy.median(logs)
+    mad = numpy.median(numpy.abs(deviation))
+    if mad > 1e-12:
+        scores = 0.6745 * deviation / mad
+    else:
+        # more than half of the costs are equal, use the mean absolute deviation
+        mean_deviation = numpy.mean(numpy.abs(deviation))
+        if mean_deviation <= 1e-12:
+            return {}
+        scores = deviation / (1.253314 * mean_deviation)
+
+    positions = numpy.nonzero(mask)[0]
+    return {
+        int(position): float(score)
+        for position, score in zip(positions, scores)
+        if abs(score) >= threshold
+    }
@@ -0,0 +1,59 @@
+import argparse
+from pathlib import Path
+
+from mlxtk.cache import ArtifactCache, get_cache_path, get_cache_size
+from mlxtk.log import get_logger
+from mlxtk.util import format_size, parse_size
+
+LOGGER = get_logger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="manage the artifact cache")
+    parser.add_argument(
+        "-p",
+        "--path",
+        type=Path,
+        help="directory of the cache (defaults to the configured cache)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="print statistics about the cache")
+    parser_gc = subparsers.add_parser(
+        "gc",
+        help="evict least recently used entries",
+    )
+    parser_gc.add_argument(
+        "-s",
+        "--max-size",
+        type=parse_size,
+        help="maximum size of the cache (e.g. 50G)",
+    )
+    subparsers.add_parser("clear", help="remove all entries")
+    args = parser.parse_args()
+
+    path = args.path if args.path else get_cache_path()
+    if path is None:
+        raise RuntimeError("no artifact cache configured")
+    cache = ArtifactCache(path, get_cache_size())
+
+    if args.command == "stats":
+        stats = cache.stats()
+        print("path:", stats["path"])
+        print("entries:", stats["entries"])
+        print("size:", format_size(stats["size"]))
+        if stats["max_size"] is not None:
+            print("max size:", format_size(stats["max_size"]))
+        print("hits:", stats["hits"])
+        for kind in sorted(stats["kinds"]):
+            count, size = stats["kinds"][kind]
+            print(f"  {kind}: {count} entries, {format_size(size)}")
+    elif args.command == "gc":
+        evicted = cache.gc(args.max_size)
+        LOGGER.info("evicted %d entries", evicted)
+        print("size:", format_size(cache.stats()["size"]))
+    elif args.command == "clear":
+        cache.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -135,14 +135,14 @@ def main():
             with h5py.File(output, "a") as fptr:
                 if not args.only_diagonalize:
                     if gridrep:
-                        dmat.add_dmat_gridrep_to_hdf5(
+                        dmat.add_dmat_gridrep_ascii_to_hdf5(
                             fptr,
-                            dmat.read_dmat_gridrep_ascii(f"dmat_dof{args.dof}_grid"),
+                            f"dmat_dof{args.dof}_grid",
                         )
                     else:
-                        dmat.add_dmat_spfrep_to_hdf5(
+                        dmat.add_dmat_spfrep_ascii_to_hdf5(
                             fptr,
-                            *dmat.read_dmat_spfrep_ascii(f"dmat_dof{args.dof}_spf"),
+                            f"dmat_dof{args.dof}_spf",
                         )
 
                 if args.diagonalize or args.only_diagonalize:
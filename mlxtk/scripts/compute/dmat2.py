@@ -143,18 +143,14 @@ def main():
             with h5py.File(output, "a") as fptr:
                 if not args.only_diagonalize:
                     if gridrep:
-                        dmat2.add_dmat2_gridrep_to_hdf5(
+                        dmat2.add_dmat2_gridrep_ascii_to_hdf5(
                             fptr,
-                            dmat2.read_dmat2_gridrep_ascii(
-                                f"dmat2_dof{args.dof1}_dof{args.dof2}_grid",
-                            ),
+                            f"dmat2_dof{args.dof1}_dof{args.dof2}_grid",
                         )
                     else:
-                        dmat2.add_dmat2_spfrep_to_hdf5(
+                        dmat2.add_dmat2_spfrep_ascii_to_hdf5(
                             fptr,
-                            *dmat2.read_dmat2_spfrep_ascii(
-                                f"dmat2_dof{args.dof1}_dof{args.dof2}_spf",
-                            ),
+                            f"dmat2_dof{args.dof1}_dof{args.dof2}_spf",
                         )
 
                 # if args.diagonalize or args.only_diagonalize:
@@ -1,11 +1,8 @@
 import argparse
 from pathlib import Path
 
-import h5py
-
-from mlxtk.inout import dmat, dmat2, g2
 from mlxtk.log import get_logger
-from mlxtk.tools.correlation import compute_g2, compute_g2_diff
+from mlxtk.tools.correlation import DEFAULT_CHUNK_SIZE, compute_g2_hdf5
 
 LOGGER = get_logger(__name__)
 
@@ -17,22 +14,25 @@ def main():
     parser.add_argument("-o", "--output", default="g2.h5", type=Path)
     parser.add_argument("--diff", action="store_true")
     parser.add_argument("--normalize", action="store_true")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="number of time steps to process at once",
+    )
     args = parser.parse_args()
 
-    LOGGER.info("read dmat")
-    data_dmat = dmat.read_dmat_gridrep_hdf5(args.dmat, "dmat_gridrep")
-    LOGGER.info("read dmat2")
-    data_dmat2 = dmat2.read_dmat2_gridrep_hdf5(args.dmat2, "dmat2_gridrep")
-
-    if args.diff:
-        data = compute_g2_diff(data_dmat, data_dmat2, normalize=args.normalize)
-    else:
-        if args.normalize:
-            parser.error("The --normalize flag requires the --dif flag to be set.")
-        data = compute_g2(data_dmat, data_dmat2)
-
-    with h5py.File(args.output, "w") as fptr:
-        g2.add_g2_to_hdf5(fptr, data)
+    if args.normalize and (not args.diff):
+        parser.error("The --normalize flag requires the --dif flag to be set.")
+
+    compute_g2_hdf5(
+        args.dmat,
+        args.dmat2,
+        args.output,
+        diff=args.diff,
+        normalize=args.normalize,
+        chunk_size=args.chunk_size,
+    )
 
 
 if __name__ == "__main__":
@@ -6,7 +6,7 @@ from pathlib import Path
 import h5py
 
 from mlxtk.cwd import WorkingDir
-from mlxtk.inout.dmat2 import add_dmat2_gridrep_to_hdf5, read_dmat2_gridrep_ascii
+from mlxtk.inout.dmat2 import add_dmat2_gridrep_ascii_to_hdf5
 from mlxtk.util import copy_file
 
 
@@ -66,10 +66,7 @@ def main():
                 ],
             )
             with h5py.File(output_file, "w") as fptr:
-                add_dmat2_gridrep_to_hdf5(
-                    fptr,
-                    read_dmat2_gridrep_ascii(basename + "_grid"),
-                )
+                add_dmat2_gridrep_ascii_to_hdf5(fptr, basename + "_grid")
 
 
 if __name__ == "__main__":
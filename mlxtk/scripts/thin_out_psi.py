@@ -4,7 +4,7 @@ import re
 
 import numpy
 
-from mlxtk.inout import read_psi_ascii, write_psi_ascii
+from mlxtk.inout import PsiFile
 from mlxtk.log import get_logger
 
 LOGGER = get_logger(__name__)
@@ -32,7 +32,8 @@ def main():
     args = parser.parse_args()
 
     initial_size = os.path.getsize(os.path.realpath(args.input_))
-    tape, times, psi = read_psi_ascii(args.input_)
+    psi_file = PsiFile(args.input_)
+    times = psi_file.times
     LOGGER.info("starting with %d time steps", len(times))
 
     indices = set()
@@ -75,8 +76,8 @@ def main():
     indices = list(indices)
     indices.sort()
     times = times[indices]
-    psi = psi[indices]
-    write_psi_ascii(args.output, (tape, times, psi))
+    psi_file.write_frames(args.output, indices)
+    psi_file.close()
 
     final_size = os.path.getsize(os.path.realpath(args.output))
     LOGGER.info("ending up with %d time steps", len(times))
@@ -6,9 +6,10 @@ import os
 import re
 import subprocess
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from mlxtk import log, templates
+from mlxtk.resource_model import DEFAULT_MAX_CLASSES, DEFAULT_SAFETY_FACTOR
 
 LOGGER = log.get_logger(__name__)
 REGEX_QSTAT = re.compile(r"^(\d+)\s+")
@@ -35,7 +36,7 @@ def add_parser_arguments(parser: argparse.ArgumentParser):
         "-m",
         "--memory",
         default="2G",
-        help="amount of memory available to the job(s)",
+        help="amount of memory available to the job(s) per CPU (h_vmem)",
     )
     parser.add_argument(
         "-t",
@@ -55,6 +56,31 @@ def add_parser_arguments(parser: argparse.ArgumentParser):
         default=None,
         help=("email address to notify about finished, aborted and suspended" "jobs"),
     )
+    parser.add_argument(
+        "--predict",
+        action="store_true",
+        help=(
+            "predict memory and time of each job from the resources used by"
+            " previous runs (--memory/--time are used if there is no data)"
+        ),
+    )
+    parser.add_argument(
+        "--safety-factor",
+        type=float,
+        default=DEFAULT_SAFETY_FACTOR,
+        help="factor applied to the predicted resources",
+    )
+    parser.add_argument(
+        "--max-classes",
+        type=int,
+        default=DEFAULT_MAX_CLASSES,
+        help="maximum number of job arrays with different resources",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="print the resources of the job(s) without submitting them",
+    )
 
 
 def get_jobs_in_queue() -> List[int]:
@@ -172,14 +198,29 @@ def submit_array(
     namespace: argparse.Namespace,
     sge_dir: Path = Path(os.path.curdir),
     job_name: str = "",
+    indices: Optional[List[int]] = None,
+    array_script: str = "sge_array",
 ):
-    array_script = "sge_array"
+    """Create a job array script for a command and submit it.
 
+    The index of each task is appended to the command.
+
+    Args:
+        command: the shell command as a string
+        number_of_tasks: number of tasks of the array
+        namespace: the command line arguments
+        sge_dir: working dir for the jobs
+        job_name: name of the job array
+        indices: indices passed to the tasks (``0`` to ``number_of_tasks - 1``
+            if ``None``)
+        array_script: name of the job array script
+    """
     args = {
         "command": command,
         "cpus": namespace.cpus,
         "email": namespace.email,
         "memory": namespace.memory,
+        "indices": indices,
         "number_of_tasks": number_of_tasks,
         "queues": namespace.queues,
         "sge_dir": sge_dir,
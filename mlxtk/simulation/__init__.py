@@ -46,6 +46,11 @@ class Simulation(base.SimulationBase):
             nargs="?",
             help="name of the propagation to check",
         )
+        self.argparser_propagation_status.add_argument(
+            "--json",
+            action="store_true",
+            help="print the status as JSON",
+        )
 
         self.argparser_qdel = self.subparsers.add_parser("qdel")
         self.argparser_qdel.set_defaults(subcommand=self.cmd_qdel)
@@ -75,6 +80,7 @@ class Simulation(base.SimulationBase):
     from mlxtk.simulation.cmd_propagation_status import (
         check_propagation_status,
         cmd_propagation_status,
+        get_propagation_status,
     )
     from mlxtk.simulation.cmd_qdel import cmd_qdel
     from mlxtk.simulation.cmd_qsub import cmd_qsub
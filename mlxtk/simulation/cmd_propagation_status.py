@@ -1,11 +1,54 @@
 import argparse
+import json
 import pickle
+import time as time_module
+from typing import Any, Dict, Optional
 
-from mlxtk.inout.output import read_output_ascii
+from mlxtk.inout.output import read_output_last_ascii
+from mlxtk.lock import is_lock_file_active
 from mlxtk.simulation.base import SimulationBase
 
+# a run is stalled if the output was not updated for this many times the
+# expected interval between two records (but at least STALL_MIN_TIME seconds)
+STALL_FACTOR = 10.0
+STALL_MIN_TIME = 600.0
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}d {hours:02d}:{minutes:02d}:{seconds:02d}"
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def get_propagation_status(self: SimulationBase, propagation: str) -> Dict[str, Any]:
+    """Determine the state of a propagation.
+
+    Only the last line of the output file of a running propagation is read.
+    The throughput (simulated time per wall-clock second) is measured since
+    the start of the current run of ``qdtk_propagate.x``.
+
+    An unfinished propagation is ``"stalled"`` instead of ``"running"`` if no
+    process holds the ``run.lock`` of the simulation (e.g. because the job was
+    killed) or if the output was not updated for :data:`STALL_FACTOR` times
+    the wall-clock time that one output step ``dt`` takes at the measured
+    throughput. Stalled propagations have no ``eta``.
+
+    Returns:
+        A dictionary with the ``state`` (``"not started"``, ``"running"``,
+        ``"stalled"`` or ``"finished"``), the ``progress`` (between 0 and 1),
+        the simulated ``time`` and ``tfinal``, the ``throughput``, the
+        estimated remaining wall-clock time ``eta`` and the wall-clock time of
+        the ``last_update`` (``None`` if unknown).
+    """
+    # mlxtk.tasks depends on mlxtk.simulation
+    from mlxtk.tasks.propagate import RUN_START_FILE
 
-def check_propagation_status(self: SimulationBase, propagation: str) -> float:
     work_dir = self.working_dir / ("." + propagation)  # sim/.propagate/
     final_dir = self.working_dir / propagation  # sim/propagate/
     result_file = final_dir / "propagate.h5"  # sim/propagate/propagate.h5
@@ -13,28 +56,84 @@ def check_propagation_status(self: SimulationBase, propagation: str) -> float:
         propagation + ".prop_pickle"
     )  # sim/propagate.prop_pickle
     output_file = work_dir / "output"  # sim/.propagate/output
+    run_start_file = work_dir / RUN_START_FILE  # sim/.propagate/run_start.json
+
+    status = {
+        "name": str(self.name),
+        "state": "not started",
+        "progress": 0.0,
+        "time": None,
+        "tfinal": None,
+        "throughput": None,
+        "eta": None,
+        "last_update": None,
+    }  # type: Dict[str, Any]
 
     if not work_dir.exists():
         if result_file.exists():
-            return 1.0
-        else:
-            return 0.0
-
-    if not pickle_file.exists():
-        return 0.0
+            status["state"] = "finished"
+            status["progress"] = 1.0
+            status["eta"] = 0.0
+        return status
 
-    if not output_file.exists():
-        return 0.0
+    if (not pickle_file.exists()) or (not output_file.exists()):
+        return status
 
     with open(pickle_file, "rb") as fptr:
-        tfinal = pickle.load(fptr)[3]["tfinal"]
+        flags = pickle.load(fptr)[3]
+    tfinal = flags["tfinal"]
 
-    times, _, _, _ = read_output_ascii(output_file)
+    owned = is_lock_file_active(self.working_dir / "run.lock")
+    status["state"] = "running" if owned else "stalled"
+    status["tfinal"] = tfinal
+    last_update = output_file.stat().st_mtime
+    status["last_update"] = last_update
 
-    return times[-1] / tfinal
+    last_entry = read_output_last_ascii(output_file)
+    if last_entry is None:
+        return status
+
+    time = last_entry[0]
+    status["time"] = time
+    status["progress"] = time / tfinal
+
+    try:
+        with open(run_start_file) as fptr:
+            run_start = json.load(fptr)
+    except (OSError, ValueError):
+        return status
+
+    elapsed = last_update - run_start["wall_time"]
+    simulated = time - run_start["time"]
+    if (elapsed > 0.0) and (simulated > 0.0):
+        status["throughput"] = simulated / elapsed
+
+        dt = flags.get("dt", None)
+        if dt:
+            max_silence = max(STALL_FACTOR * dt / status["throughput"], STALL_MIN_TIME)
+            if time_module.time() - last_update > max_silence:
+                status["state"] = "stalled"
+
+        if status["state"] == "running":
+            status["eta"] = max(tfinal - time, 0.0) / status["throughput"]
+
+    return status
+
+
+def check_propagation_status(self: SimulationBase, propagation: str) -> float:
+    return get_propagation_status(self, propagation)["progress"]
 
 
 def cmd_propagation_status(self: SimulationBase, args: argparse.Namespace):
     self.logger.info("check progress of propagation: %s", args.name)
-    progress = check_propagation_status(self, args.name)
-    self.logger.info("total progress: %6.2f%%", progress * 100.0)
+    status = get_propagation_status(self, args.name)
+    if getattr(args, "json", False):
+        print(json.dumps(status, indent=2))
+        return
+
+    if status["state"] == "stalled":
+        self.logger.warning("propagation is stalled")
+    self.logger.info("total progress: %6.2f%%", status["progress"] * 100.0)
+    if status["throughput"] is not None:
+        self.logger.info("throughput: %g/s", status["throughput"])
+        self.logger.info("eta: %s", format_duration(status["eta"]))
@@ -1,13 +1,34 @@
 import argparse
+import copy
 import sys
 from pathlib import Path
 
 from mlxtk import sge
 from mlxtk.cwd import WorkingDir
+from mlxtk.resource_model import format_memory, format_time, plan_allocation
+from mlxtk.scan_profile import load_simulation_profile
 from mlxtk.simulation.base import SimulationBase
 
 
 def cmd_qsub(self: SimulationBase, args: argparse.Namespace):
+    if getattr(args, "predict", False):
+        # use the resources of the previous run of this simulation
+        memory, time, _ = plan_allocation(
+            [load_simulation_profile(self.working_dir)],
+            None,
+            args.memory,
+            args.time,
+            args.safety_factor,
+            cpus=int(args.cpus),
+        )[0]
+        args = copy.copy(args)
+        args.memory = format_memory(memory)
+        args.time = format_time(time)
+
+    if getattr(args, "dry_run", False):
+        print(f"h_vmem={args.memory} h_cpu={args.time}")
+        return
+
     self.create_working_dir()
     call_dir = Path.cwd().absolute()
     script_path = Path(sys.argv[0]).absolute()
@@ -5,6 +5,7 @@ from pathlib import Path
 from typing import List, Optional, Tuple, Union
 
 from mlxtk import sge
+from mlxtk.scan_profile import COST_KEYS, DEFAULT_OUTLIER_THRESHOLD
 from mlxtk.simulation import Simulation
 from mlxtk.simulation_set import base
 
@@ -92,6 +93,35 @@ class SimulationSet(base.SimulationSetBase):
         self.argparser_lockfiles = self.subparsers.add_parser("lockfiles")
         self.argparser_lockfiles.set_defaults(subcommand=self.cmd_lockfiles)
 
+        self.argparser_profile = self.subparsers.add_parser("profile")
+        self.argparser_profile.set_defaults(subcommand=self.cmd_profile)
+        self.argparser_profile.add_argument(
+            "-k",
+            "--key",
+            choices=COST_KEYS,
+            default="time",
+            help="cost used for the correlations and outliers",
+        )
+        self.argparser_profile.add_argument(
+            "-t",
+            "--threshold",
+            type=float,
+            default=DEFAULT_OUTLIER_THRESHOLD,
+            help="smallest modified z-score of an outlier",
+        )
+        self.argparser_profile.add_argument(
+            "--json",
+            action="store_true",
+            help="print the report as JSON",
+        )
+        self.argparser_profile.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            default=16,
+            help="number of threads used to read the doit databases",
+        )
+
         self.argparser_propagation_status = self.subparsers.add_parser(
             "propagation-status",
         )
@@ -105,6 +135,18 @@ class SimulationSet(base.SimulationSetBase):
             type=str,
             help="name of the propagation",
         )
+        self.argparser_propagation_status.add_argument(
+            "--json",
+            action="store_true",
+            help="print the status as JSON",
+        )
+        self.argparser_propagation_status.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            default=16,
+            help="number of threads used to check the simulations",
+        )
 
         self.argparser_qsub = self.subparsers.add_parser("qsub")
         self.argparser_qsub.set_defaults(subcommand=self.cmd_qsub_array)
@@ -177,6 +219,7 @@ class SimulationSet(base.SimulationSetBase):
     from mlxtk.simulation_set.cmd_list import cmd_list
     from mlxtk.simulation_set.cmd_list_tasks import cmd_list_tasks
     from mlxtk.simulation_set.cmd_lockfiles import cmd_lockfiles
+    from mlxtk.simulation_set.cmd_profile import cmd_profile
     from mlxtk.simulation_set.cmd_propagation_status import cmd_propagation_status
     from mlxtk.simulation_set.cmd_qdel import cmd_qdel
     from mlxtk.simulation_set.cmd_qsub_array import cmd_qsub_array
@@ -0,0 +1,197 @@
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import tabulate
+
+from mlxtk.cwd import WorkingDir
+from mlxtk.parameters import Parameters
+from mlxtk.scan_profile import (
+    DEFAULT_OUTLIER_THRESHOLD,
+    collect_profiles,
+    correlate_parameters,
+    find_outliers,
+    get_costs,
+    get_task_types,
+    summarize_task_types,
+)
+from mlxtk.simulation.cmd_propagation_status import format_duration
+from mlxtk.simulation_set.base import SimulationSetBase
+from mlxtk.util import format_size
+
+
+def create_profile_report(
+    names: List[str],
+    working_dirs: List[Path],
+    parameters: Optional[List[Parameters]] = None,
+    key: str = "time",
+    threshold: float = DEFAULT_OUTLIER_THRESHOLD,
+    jobs: int = 16,
+) -> Dict[str, Any]:
+    """Create a profiling report for several simulations.
+
+    Args:
+        names: name of each simulation
+        working_dirs: working directory of each simulation
+        parameters: parameters of each simulation (for parameter scans)
+        key: cost used for the correlations and outliers
+        threshold: smallest modified z-score of an outlier
+        jobs: number of threads used to read the doit databases
+
+    Returns:
+        The ``summary`` per task type, the ``correlations`` with the scan
+        parameters per task type and a list of ``outliers``.
+    """
+    profiles = collect_profiles(working_dirs, jobs)
+
+    report = {
+        "simulations": sum(1 for profile in profiles if profile),
+        "summary": summarize_task_types(profiles),
+        "correlations": {},
+        "outliers": [],
+    }  # type: Dict[str, Any]
+
+    for task_type in get_task_types(profiles):
+        if parameters:
+            correlations = correlate_parameters(profiles, parameters, task_type, key)
+            if correlations:
+                report["correlations"][task_type] = correlations
+
+        costs = get_costs(profiles, task_type, key)
+        for position, score in find_outliers(costs, threshold, parameters).items():
+            report["outliers"].append(
+                {
+                    "index": position,
+                    "name": names[position],
+                    "task_type": task_type,
+                    key: float(costs[position]),
+                    "score": score,
+                },
+            )
+
+    report["outliers"].sort(key=lambda outlier: -abs(outlier["score"]))
+    return report
+
+
+def _format_cost(key: str, value: Optional[float]) -> Optional[str]:
+    if value is None:
+        return None
+    if key in ("time", "cpu_time"):
+        return format_duration(value)
+    return format_size(value)
+
+
+def print_profile_report(report: Dict[str, Any], key: str = "time"):
+    print(
+        tabulate.tabulate(
+            [
+                [
+                    task_type,
+                    entry["simulations"],
+                    entry["tasks"],
+                    format_duration(entry["total"]),
+                    format_duration(entry["mean"]),
+                    format_duration(entry["median"]),
+                    format_duration(entry["max"]),
+                    _format_cost("cpu_time", entry["cpu_time"]),
+                    _format_cost("max_rss", entry["max_rss"]),
+                    _format_cost("max_vm", entry["max_vm"]),
+                    _format_cost("read_bytes", entry["read_bytes"]),
+                    _format_cost("write_bytes", entry["write_bytes"]),
+                ]
+                for task_type, entry in report["summary"].items()
+            ],
+            headers=[
+                "Task type",
+                "Simulations",
+                "Tasks",
+                "Total",
+                "Mean",
+                "Median",
+                "Max",
+                "Child CPU",
+                "Peak RSS",
+                "Peak VM",
+                "Read",
+                "Written",
+            ],
+            missingval="-",
+        ),
+    )
+
+    if report["correlations"]:
+        print()
+        print(
+            tabulate.tabulate(
+                [
+                    [task_type, name, entry["correlation"], entry["exponent"]]
+                    for task_type, correlations in report["correlations"].items()
+                    for name, entry in correlations.items()
+                ],
+                headers=["Task type", "Parameter", "Spearman", "Exponent"],
+                floatfmt=".2f",
+                missingval="-",
+            ),
+        )
+
+    if report["outliers"]:
+        print()
+        print(
+            tabulate.tabulate(
+                [
+                    [
+                        outlier["index"],
+                        outlier["name"],
+                        outlier["task_type"],
+                        _format_cost(key, outlier[key]),
+                        outlier["score"],
+                    ]
+                    for outlier in report["outliers"]
+                ],
+                headers=["Index", "Simulation", "Task type", key, "Score"],
+                floatfmt=".1f",
+            ),
+        )
+
+
+def run_profile(
+    self: SimulationSetBase,
+    args: argparse.Namespace,
+    names: List[str],
+    working_dirs: List[Path],
+    parameters: Optional[List[Parameters]] = None,
+):
+    report = create_profile_report(
+        names,
+        working_dirs,
+        parameters,
+        args.key,
+        args.threshold,
+        args.jobs,
+    )
+    self.logger.info(
+        "found profiling data for %d of %d simulation(s)",
+        report["simulations"],
+        len(names),
+    )
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print_profile_report(report, args.key)
+
+
+def cmd_profile(self: SimulationSetBase, args: argparse.Namespace):
+    self.logger.info("profile simulation set")
+    with WorkingDir(self.working_dir):
+        working_dirs = [
+            Path(simulation.working_dir).resolve() for simulation in self.simulations
+        ]
+    run_profile(
+        self,
+        args,
+        [simulation.name for simulation in self.simulations],
+        working_dirs,
+    )
@@ -1,16 +1,107 @@
 import argparse
+import json
+from multiprocessing.pool import ThreadPool
+from typing import Any, Dict, List, Optional
+
+import tabulate
 
 from mlxtk.cwd import WorkingDir
+from mlxtk.simulation.cmd_propagation_status import format_duration
 from mlxtk.simulation_set.base import SimulationSetBase
 
 
+def summarize_propagation_status(statuses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine the status of the propagations of several simulations.
+
+    The ETA of the whole set assumes that the simulations which are currently
+    running keep their throughput and that the remaining simulated time of all
+    unfinished simulations is processed with the combined throughput. Stalled
+    simulations do not contribute to the throughput.
+    """
+    states = {}  # type: Dict[str, int]
+    for status in statuses:
+        states[status["state"]] = states.get(status["state"], 0) + 1
+
+    throughput = sum(
+        status["throughput"]
+        for status in statuses
+        if (status["state"] == "running") and (status["throughput"] is not None)
+    )
+
+    remaining = 0.0  # type: Optional[float]
+    tfinals = [status["tfinal"] for status in statuses if status["tfinal"] is not None]
+    default_tfinal = max(tfinals) if tfinals else None
+    eta = None  # type: Optional[float]
+    for status in statuses:
+        if status["state"] == "finished":
+            continue
+        tfinal = status["tfinal"] if status["tfinal"] is not None else default_tfinal
+        if tfinal is None:
+            remaining = None
+            break
+        remaining += max(tfinal - (status["time"] or 0.0), 0.0)
+
+    if remaining is not None:
+        if remaining == 0.0:
+            eta = 0.0
+        elif throughput > 0.0:
+            eta = remaining / throughput
+
+    return {
+        "simulations": len(statuses),
+        "states": states,
+        "progress": (
+            sum(status["progress"] for status in statuses) / len(statuses)
+            if statuses
+            else 1.0
+        ),
+        "throughput": throughput,
+        "remaining": remaining,
+        "eta": eta,
+        "max_eta": max(
+            (status["eta"] for status in statuses if status["eta"] is not None),
+            default=None,
+        ),
+    }
+
+
 def cmd_propagation_status(self: SimulationSetBase, args: argparse.Namespace):
-    total = 0.0
     self.logger.info("check propagation status of propagation: %s", args.name)
     with WorkingDir(self.working_dir):
-        for simulation in self.simulations:
-            progress = simulation.check_propagation_status(args.name)
-            total += progress
-            self.logger.info("sim %s: %6.2f%%", simulation.name, progress * 100.0)
-    total = total / len(self.simulations)
-    self.logger.info("total: %6.2f%%", total * 100.0)
+        with ThreadPool(max(1, getattr(args, "jobs", 16))) as pool:
+            statuses = pool.map(
+                lambda simulation: simulation.get_propagation_status(args.name),
+                self.simulations,
+            )
+    summary = summarize_propagation_status(statuses)
+
+    if getattr(args, "json", False):
+        print(json.dumps({"simulations": statuses, "total": summary}, indent=2))
+        return
+
+    table = [
+        [
+            status["name"],
+            status["state"],
+            "{:6.2f}%".format(status["progress"] * 100.0),
+            "-" if status["time"] is None else "{:g}".format(status["time"]),
+            "-" if status["throughput"] is None else "{:.3g}".format(
+                status["throughput"],
+            ),
+            format_duration(status["eta"]),
+        ]
+        for status in statuses
+    ]
+    print(
+        tabulate.tabulate(
+            table,
+            headers=["Simulation", "State", "Progress", "Time", "Time/s", "ETA"],
+        ),
+    )
+    self.logger.info(
+        "total: %6.2f%%, throughput: %g/s, eta: %s (longest simulation: %s)",
+        summary["progress"] * 100.0,
+        summary["throughput"],
+        format_duration(summary["eta"]),
+        format_duration(summary["max_eta"]),
+    )
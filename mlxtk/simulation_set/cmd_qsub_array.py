@@ -1,10 +1,22 @@
 import argparse
+import copy
 import os
 import sys
 from pathlib import Path
+from typing import List, Optional, Tuple
+
+import tabulate
 
 from mlxtk import sge
 from mlxtk.cwd import WorkingDir
+from mlxtk.parameters import Parameters
+from mlxtk.resource_model import (
+    format_indices,
+    format_memory,
+    format_time,
+    plan_allocation,
+)
+from mlxtk.scan_profile import collect_profiles
 from mlxtk.simulation_set.base import SimulationSetBase
 
 
@@ -28,18 +40,111 @@ def cmd_qsub(self: SimulationSetBase, args: argparse.Namespace):
             )
 
 
-def cmd_qsub_array(self: SimulationSetBase, args: argparse.Namespace):
-    self.logger.info("submitting simulation set as an array to SGE scheduler")
+def plan_array_jobs(
+    self: SimulationSetBase,
+    args: argparse.Namespace,
+    working_dirs: List[Path],
+    parameters: Optional[List[Parameters]] = None,
+) -> List[Tuple[str, str, List[int]]]:
+    """Determine the resource classes of the jobs of an array.
+
+    Without ``--predict`` all jobs use the memory and time given on the command
+    line.
+
+    Returns:
+        The memory per CPU and the time requested by each class and its job
+        indices.
+    """
+    if not getattr(args, "predict", False):
+        return [(args.memory, args.time, list(range(len(working_dirs))))]
+
+    profiles = collect_profiles(working_dirs)
+    self.logger.info(
+        "predict resources from %d of %d simulation(s) with profiling data",
+        sum(1 for profile in profiles if profile),
+        len(profiles),
+    )
+    return [
+        (format_memory(memory), format_time(time), indices)
+        for memory, time, indices in plan_allocation(
+            profiles,
+            parameters,
+            args.memory,
+            args.time,
+            args.safety_factor,
+            args.max_classes,
+            cpus=int(args.cpus),
+        )
+    ]
+
+
+def submit_array_jobs(
+    self: SimulationSetBase,
+    args: argparse.Namespace,
+    working_dirs: List[Path],
+    parameters: Optional[List[Parameters]] = None,
+):
+    classes = plan_array_jobs(self, args, working_dirs, parameters)
+
+    if getattr(args, "dry_run", False):
+        print(
+            tabulate.tabulate(
+                [
+                    [i, len(indices), memory, time, format_indices(indices)]
+                    for i, (memory, time, indices) in enumerate(classes)
+                ],
+                headers=["Class", "Tasks", "h_vmem", "h_cpu", "Indices"],
+            ),
+        )
+        return
+
     self.create_working_dir()
 
     script_path = Path(sys.argv[0]).resolve()
     command = " ".join([sys.executable, str(script_path), "run-index"])
 
     with WorkingDir(self.working_dir):
-        sge.submit_array(
-            command,
-            len(self.simulations),
-            args,
-            sge_dir=script_path.parent,
-            job_name=self.name,
-        )
+        if len(classes) == 1:
+            namespace = copy.copy(args)
+            namespace.memory, namespace.time, _ = classes[0]
+            sge.submit_array(
+                command,
+                len(working_dirs),
+                namespace,
+                sge_dir=script_path.parent,
+                job_name=self.name,
+            )
+            return
+
+        for i, (memory, time, indices) in enumerate(classes):
+            self.logger.info(
+                "submit class %d: %d task(s), h_vmem=%s, h_cpu=%s",
+                i,
+                len(indices),
+                memory,
+                time,
+            )
+            namespace = copy.copy(args)
+            namespace.memory = memory
+            namespace.time = time
+            sge.submit_array(
+                command,
+                len(indices),
+                namespace,
+                sge_dir=script_path.parent,
+                job_name=f"{self.name}_{i}",
+                indices=indices,
+                array_script=f"sge_array_{i}",
+            )
+
+
+def cmd_qsub_array(self: SimulationSetBase, args: argparse.Namespace):
+    self.logger.info("submitting simulation set as an array to SGE scheduler")
+    submit_array_jobs(
+        self,
+        args,
+        [
+            (self.working_dir / simulation.working_dir).resolve()
+            for simulation in self.simulations
+        ],
+    )
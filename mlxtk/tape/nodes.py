@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 import abc
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from graphviz import Digraph
+if TYPE_CHECKING:
+    from graphviz import Digraph
 
 
 class Node(abc.ABC):
@@ -253,6 +254,8 @@ class Node(abc.ABC):
         return nodes
 
     def to_graph(self):
+        from graphviz import Digraph
+
         self.compute_node_indices(False)
         self.compute_dof_numbers()
 
@@ -1,4 +1,8 @@
-from mlxtk.tasks.expval import ComputeExpectationValue, ComputeExpectationValueStatic
+from mlxtk.tasks.expval import (
+    ComputeExpectationValue,
+    ComputeExpectationValues,
+    ComputeExpectationValueStatic,
+)
 from mlxtk.tasks.mb_operator import CreateMBOperator, MBOperatorSpecification
 from mlxtk.tasks.momentum_distribution import MCTDHBMomentumDistribution
 from mlxtk.tasks.number_state_analysis import (
@@ -9,14 +9,22 @@ Todo:
 """
 
 import os
-import subprocess
 import tempfile
+from multiprocessing.pool import ThreadPool
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Union
+from typing import Any, Callable, Dict, List, Sequence, Union
+
+import h5py
 
 from mlxtk import cwd
-from mlxtk.doit_compat import DoitAction
-from mlxtk.inout.expval import read_expval_ascii, write_expval_hdf5
+from mlxtk.cache import compute_cache_key, get_default_cache
+from mlxtk.doit_compat import DoitAction, run_process
+from mlxtk.inout.expval import (
+    add_expval_to_hdf5,
+    read_expval_ascii,
+    read_expval_hdf5,
+    write_expval_hdf5,
+)
 from mlxtk.log import get_logger
 from mlxtk.tasks.task import Task
 from mlxtk.util import copy_file, make_path
@@ -26,6 +34,7 @@ class ComputeExpectationValue(Task):
     def __init__(self, psi: Union[str, Path], operator: Union[str, Path], **kwargs):
         self.logger = get_logger(__name__ + ".ComputeExpectationValue")
         self.unique_name = kwargs.get("unique_name", False)
+        self.use_cache = kwargs.get("cache", True)
 
         # compute required paths
         self.operator = make_path(operator)
@@ -56,6 +65,15 @@ class ComputeExpectationValue(Task):
             expval = self.expval.resolve()
             wave_function = self.wave_function.resolve()
 
+            cache = get_default_cache() if self.use_cache else None
+            if cache is not None:
+                cache_key = compute_cache_key(
+                    "expval",
+                    [operator, psi, wave_function],
+                )
+                if cache.lookup(cache_key, {"expval.h5": expval}):
+                    return
+
             with tempfile.TemporaryDirectory() as tmpdir:
                 with cwd.WorkingDir(tmpdir):
                     self.logger.info("compute expectation value")
@@ -76,12 +94,16 @@ class ComputeExpectationValue(Task):
                     self.logger.info("command: %s", " ".join(cmd))
                     env = os.environ.copy()
                     env["OMP_NUM_THREADS"] = env.get("OMP_NUM_THREADS", "1")
-                    subprocess.run(cmd, env=env)
+                    run_process(cmd, env=env)
 
                     write_expval_hdf5("expval.h5", *read_expval_ascii("expval"))
 
+                    expval.unlink(missing_ok=True)
                     copy_file("expval.h5", expval)
 
+            if cache is not None:
+                cache.store(cache_key, "expval", {"expval.h5": expval})
+
         return {
             "name": f"expval:{self.name}:compute",
             "actions": [action_compute],
@@ -93,6 +115,165 @@ class ComputeExpectationValue(Task):
         return [self.task_compute]
 
 
+class ComputeExpectationValues(Task):
+    """Compute the expectation values of multiple operators for the same psi.
+
+    The psi file is linked once into a temporary directory and
+    ``qdtk_expect.x`` is run for each operator using a pool of ``workers``
+    processes. Each result is written to the same file as
+    :class:`ComputeExpectationValue` would produce; only results that are
+    missing or older than the psi, the wave function or their operator file are
+    recomputed. Results are looked up in and stored to the artifact cache under
+    the same keys as :class:`ComputeExpectationValue` uses. All results are
+    also collected in one HDF5 file (``output``, default ``expvals.h5`` next to
+    the psi) with one group per operator.
+    """
+
+    def __init__(
+        self,
+        psi: Union[str, Path],
+        operators: Sequence[Union[str, Path]],
+        **kwargs,
+    ):
+        self.logger = get_logger(__name__ + ".ComputeExpectationValues")
+        self.unique_name = kwargs.get("unique_name", False)
+        self.workers = kwargs.get("workers", 1)
+        self.use_cache = kwargs.get("cache", True)
+
+        # compute required paths
+        self.psi = make_path(psi)
+        self.operators = [make_path(operator) for operator in operators]
+        self.expvals = []  # type: List[Path]
+        for operator in self.operators:
+            if self.unique_name:
+                self.expvals.append(
+                    self.psi.with_name(
+                        self.psi.stem + "_" + operator.stem,
+                    ).with_suffix(".exp.h5"),
+                )
+            else:
+                self.expvals.append(
+                    (self.psi.parent / operator.stem).with_suffix(".exp.h5"),
+                )
+
+        self.groups = [operator.stem for operator in self.operators]
+        if len(set(self.groups)) != len(self.groups):
+            raise ValueError("operator names have to be unique")
+
+        self.output = make_path(kwargs.get("output", self.psi.parent / "expvals.h5"))
+
+        if "wave_function" in kwargs:
+            self.wave_function = make_path(kwargs["wave_function"])
+        else:
+            self.wave_function = make_path(self.psi.parent / "final").with_suffix(
+                ".wfn",
+            )
+
+        self.name = str(self.output.with_suffix(""))
+
+    def is_outdated(self, index: int) -> bool:
+        expval = self.expvals[index]
+        if not expval.exists():
+            return True
+
+        mtime = expval.stat().st_mtime
+        return any(
+            path.stat().st_mtime > mtime
+            for path in (self.psi, self.wave_function, self.operators[index])
+        )
+
+    def task_compute(self) -> Dict[str, Any]:
+        @DoitAction
+        def action_compute(targets: List[str]):
+            del targets
+
+            outdated = [i for i in range(len(self.operators)) if self.is_outdated(i)]
+            psi = self.psi.resolve()
+            wave_function = self.wave_function.resolve()
+            operators = [operator.resolve() for operator in self.operators]
+            expvals = [expval.resolve() for expval in self.expvals]
+            env = os.environ.copy()
+            env["OMP_NUM_THREADS"] = env.get("OMP_NUM_THREADS", "1")
+
+            cache = get_default_cache() if self.use_cache else None
+            cache_keys = {}  # type: Dict[int, str]
+            if cache is not None:
+                for index in list(outdated):
+                    cache_keys[index] = compute_cache_key(
+                        "expval",
+                        [operators[index], psi, wave_function],
+                    )
+                    if cache.lookup(cache_keys[index], {"expval.h5": expvals[index]}):
+                        outdated.remove(index)
+
+            self.logger.info(
+                "compute %d of %d expectation values",
+                len(outdated),
+                len(self.operators),
+            )
+
+            def compute(index: int):
+                # each operator gets its own directory, the psi is shared
+                workdir = Path(str(index))
+                workdir.mkdir()
+                os.symlink(operators[index], workdir / "operator")
+                os.symlink(psi, workdir / "psi")
+                os.symlink(Path("restart").resolve(), workdir / "restart")
+                cmd = [
+                    "qdtk_expect.x",
+                    "-opr",
+                    "operator",
+                    "-rst",
+                    "restart",
+                    "-psi",
+                    "psi",
+                    "-save",
+                    "expval",
+                ]
+                self.logger.info("command: %s", " ".join(cmd))
+                run_process(cmd, env=env, cwd=workdir)
+
+                write_expval_hdf5(
+                    workdir / "expval.h5",
+                    *read_expval_ascii(workdir / "expval"),
+                )
+                expvals[index].unlink(missing_ok=True)
+                copy_file(workdir / "expval.h5", expvals[index])
+
+                if cache is not None:
+                    cache.store(
+                        cache_keys[index],
+                        "expval",
+                        {"expval.h5": expvals[index]},
+                    )
+
+            if outdated:
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    with cwd.WorkingDir(tmpdir):
+                        os.symlink(psi, "psi")
+                        copy_file(wave_function, "restart")
+                        with ThreadPool(self.workers) as pool:
+                            pool.map(compute, outdated, 1)
+
+            with h5py.File(self.output, "w") as fptr:
+                for group, expval in zip(self.groups, self.expvals):
+                    add_expval_to_hdf5(
+                        fptr.create_group(group),
+                        *read_expval_hdf5(expval),
+                    )
+
+        return {
+            "name": f"expvals:{self.name}:compute",
+            "actions": [action_compute],
+            "targets": [str(self.output)] + [str(expval) for expval in self.expvals],
+            "file_dep": [str(self.psi), str(self.wave_function)]
+            + [str(operator) for operator in self.operators],
+        }
+
+    def get_tasks_run(self) -> List[Callable[[], Dict[str, Any]]]:
+        return [self.task_compute]
+
+
 class ComputeExpectationValueStatic(Task):
     def __init__(self, wave_function: Union[str, Path], operator: Union[str, Path]):
         self.logger = get_logger(__name__ + ".ComputeExpectationValueStatic")
@@ -132,7 +313,7 @@ class ComputeExpectationValueStatic(Task):
                     self.logger.info("command: %s", " ".join(cmd))
                     env = os.environ.copy()
                     env["OMP_NUM_THREADS"] = env.get("OMP_NUM_THREADS", "1")
-                    subprocess.run(cmd, env=env)
+                    run_process(cmd, env=env)
 
                     write_expval_hdf5("expval.h5", *read_expval_ascii("expval"))
                     copy_file("expval.h5", expval)
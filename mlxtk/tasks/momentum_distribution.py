@@ -1,7 +1,6 @@
 import os
 import pickle
 import shutil
-import subprocess
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Optional
 
@@ -11,7 +10,7 @@ from QDTK.Operator import trafo_to_momentum_rep
 from mlxtk import dvr
 from mlxtk.cwd import WorkingDir
 from mlxtk.doit_analyses import output
-from mlxtk.doit_compat import DoitAction
+from mlxtk.doit_compat import DoitAction, run_process
 from mlxtk.hashing import inaccurate_hash
 from mlxtk.inout.momentum_distribution import (
     add_momentum_distribution_to_hdf5,
@@ -109,7 +108,7 @@ class MCTDHBMomentumDistribution(Task):
                 env = os.environ.copy()
                 env["OMP_NUM_THREADS"] = env.get("OMP_NUM_THREADS", "1")
 
-                result = subprocess.run(cmd, env=env)
+                result = run_process(cmd, env=env)
                 if result.returncode != 0:
                     raise RuntimeError("Failed to run qdtk_analysis.x")
 
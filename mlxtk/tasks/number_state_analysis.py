@@ -1,5 +1,4 @@
 import os
-import subprocess
 import tempfile
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Union
@@ -8,7 +7,7 @@ import h5py
 import numpy
 
 from mlxtk import cwd, inout
-from mlxtk.doit_compat import DoitAction
+from mlxtk.doit_compat import DoitAction, run_process
 from mlxtk.log import get_logger
 from mlxtk.tasks.task import Task
 from mlxtk.tools.wave_function import load_wave_function
@@ -66,7 +65,7 @@ class NumberStateAnalysisStatic(Task):
                     self.logger.info("command: %s", " ".join(cmd))
                     env = os.environ.copy()
                     env["OMP_NUM_THREADS"] = env.get("OMP_NUM_THREADS", "1")
-                    subprocess.run(cmd, env=env)
+                    run_process(cmd, env=env)
 
                     times, real, imag = inout.read_fixed_ns_ascii("result")
                     wfn = load_wave_function("basis")
@@ -155,7 +154,7 @@ class NumberStateAnalysis(Task):
                     self.logger.info("command: %s", " ".join(cmd))
                     env = os.environ.copy()
                     env["OMP_NUM_THREADS"] = env.get("OMP_NUM_THREADS", "1")
-                    subprocess.run(cmd, env=env)
+                    run_process(cmd, env=env)
 
                     times, real, imag = inout.read_fixed_ns_ascii("result")
                     wfn = load_wave_function("basis")
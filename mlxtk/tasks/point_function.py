@@ -3,7 +3,6 @@ from __future__ import annotations
 import itertools
 import os
 import pickle
-import subprocess
 import tempfile
 from pathlib import Path
 from typing import Any, Callable
@@ -13,7 +12,7 @@ import numpy
 from numpy.typing import NDArray
 
 from mlxtk import cwd
-from mlxtk.doit_compat import DoitAction
+from mlxtk.doit_compat import DoitAction, run_process
 from mlxtk.hashing import inaccurate_hash
 from mlxtk.inout.expval import read_expval_ascii
 from mlxtk.log import get_logger
@@ -111,7 +110,7 @@ class ComputePointFunction(Task):
                         self.logger.info(f'command: {" ".join(cmd)}')
                         env = os.environ.copy()
                         env["OMP_NUM_THREADS"] = env.get("OMP_NUM_THREADS", "1")
-                        subprocess.run(cmd, env=env)
+                        run_process(cmd, env=env)
 
                         time, values = read_expval_ascii("expval")
                         if results is None:
@@ -1,8 +1,9 @@
 import copy
+import json
 import os
 import pickle
 import shutil
-import subprocess
+import time
 from collections import OrderedDict
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union
@@ -11,12 +12,13 @@ import h5py
 import numpy
 
 from mlxtk import cwd
-from mlxtk.doit_compat import DoitAction
+from mlxtk.cache import compute_cache_key, get_default_cache
+from mlxtk.doit_compat import DoitAction, run_process
 from mlxtk.hashing import hash_file
 from mlxtk.inout.eigenbasis import add_eigenbasis_to_hdf5, read_eigenbasis_ascii
-from mlxtk.inout.gpop import add_gpop_to_hdf5, read_gpop_ascii
-from mlxtk.inout.natpop import add_natpop_to_hdf5, read_natpop_ascii
-from mlxtk.inout.output import add_output_to_hdf5, read_output_ascii
+from mlxtk.inout.output import read_output_last_ascii
+from mlxtk.inout.psi import convert_psi_ascii_to_hdf5
+from mlxtk.inout.tail import GpopTailer, LiveIngestion, NatpopTailer, OutputTailer
 from mlxtk.log import get_logger
 from mlxtk.tasks.task import Task
 from mlxtk.temporary_dir import TemporaryDir
@@ -62,6 +64,10 @@ FLAG_TYPES = {
     "zvode_mf": int,
 }
 
+# file in the temporary directory of a propagation that records when the
+# current run of qdtk_propagate.x was started (used to estimate the progress)
+RUN_START_FILE = "run_start.json"
+
 DEFAULT_FLAGS = {
     "MBop_apply": False,
     "atol": 1e-12,
@@ -87,7 +93,13 @@ DEFAULT_FLAGS = {
 def create_flags(**kwargs) -> Tuple[Dict[str, Any], List[str]]:
     flags = copy.copy(DEFAULT_FLAGS)
 
-    non_qdtk_flags = ["extra_files", "gauge_diag_oper"]
+    non_qdtk_flags = [
+        "cache",
+        "extra_files",
+        "gauge_diag_oper",
+        "psi_hdf5",
+        "psi_hdf5_compression",
+    ]
 
     for flag in kwargs:
         if flag not in FLAG_TYPES:
@@ -135,6 +147,12 @@ class Propagate(Task):
         self.hamiltonian = hamiltonian
         self.logger = get_logger(__name__ + ".Propagate")
         self.diag_gauge_oper: Optional[str] = kwargs.get("diag_gauge_oper", None)
+        self.psi_hdf5: bool = kwargs.get("psi_hdf5", False)
+        self.psi_hdf5_compression: Dict[str, Any] = kwargs.get(
+            "psi_hdf5_compression",
+            {},
+        )
+        self.use_cache: bool = kwargs.get("cache", True)
 
         self.flags, self.flag_list = create_flags(**kwargs)
         self.flag_list += ["-rst", "restart", "-opr", "hamiltonian"]
@@ -170,6 +188,8 @@ class Propagate(Task):
             self.qdtk_files = ["final.wfn"]
             if self.flags["psi"]:
                 self.qdtk_files.append("psi")
+                if self.psi_hdf5:
+                    self.qdtk_files.append("psi.h5")
 
         self.qdtk_files += kwargs.get("extra_files", [])
 
@@ -222,6 +242,19 @@ class Propagate(Task):
 
             path_temp = self.path_name.resolve().with_name("." + self.path_name.name)
 
+            cache = get_default_cache() if self.use_cache else None
+            if cache is not None:
+                cache_key = self.get_cache_key()
+                cache_files = {
+                    fname: self.path_name / fname for fname in self.qdtk_files
+                }
+                cache_files[self.path_hdf5.name] = self.path_hdf5
+                if cache.lookup(cache_key, cache_files):
+                    self.logger.info("reuse cached result")
+                    if path_temp.exists():
+                        shutil.rmtree(path_temp)
+                    return
+
             if path_temp.exists():
                 path_temp_operator = path_temp / "hamiltonian"
                 if not path_temp_operator.exists():
@@ -289,41 +322,67 @@ class Propagate(Task):
                     env = os.environ.copy()
                     env["OMP_NUM_THREADS"] = env.get("OMP_NUM_THREADS", "1")
                     self.logger.info("command: %s", " ".join(cmd))
-                    result = subprocess.run(cmd, env=env)
-                    if result.returncode != 0:
-                        raise RuntimeError("Failed to run qdtk_propagate.x")
+
+                    # gpop, natpop and output are ingested into result.h5
+                    # while the propagation is running, a continuation run
+                    # resumes after the last ingested time
+                    if self.flags["exact_diag"]:
+                        tailers = []
+                    else:
+                        tailers = [
+                            GpopTailer("gpop"),
+                            NatpopTailer("natpop"),
+                            OutputTailer("output"),
+                        ]
+                    if not self.flags["cont"]:
+                        Path("result.h5").unlink(missing_ok=True)
+
+                    last_entry = (
+                        read_output_last_ascii("output")
+                        if Path("output").exists()
+                        else None
+                    )
+                    with open(RUN_START_FILE, "w") as fptr:
+                        json.dump(
+                            {
+                                "wall_time": time.time(),
+                                "time": last_entry[0] if last_entry else 0.0,
+                            },
+                            fptr,
+                        )
+
+                    with LiveIngestion("result.h5", tailers):
+                        result = run_process(cmd, env=env)
+                        if result.returncode != 0:
+                            raise RuntimeError("Failed to run qdtk_propagate.x")
 
                     if self.flags["exact_diag"]:
                         with h5py.File("result.h5", "w") as fptr:
                             add_eigenbasis_to_hdf5(fptr, *read_eigenbasis_ascii("."))
                     else:
                         shutil.move("restart", "final.wfn")
-                        with h5py.File("result.h5", "w") as fptr:
-                            add_gpop_to_hdf5(
-                                fptr.create_group("gpop"),
-                                *read_gpop_ascii("gpop"),
-                            )
-                            add_natpop_to_hdf5(
-                                fptr.create_group("natpop"),
-                                *read_natpop_ascii("natpop"),
-                            )
-                            add_output_to_hdf5(
-                                fptr.create_group("output"),
-                                *read_output_ascii("output"),
+                        if self.flags["psi"] and self.psi_hdf5:
+                            self.logger.info("convert psi to HDF5")
+                            convert_psi_ascii_to_hdf5(
+                                "psi",
+                                "psi.h5",
+                                **self.psi_hdf5_compression,
                             )
-
+                        with h5py.File("result.h5", "a") as fptr:
                             if "gauge" in self.flags:
                                 if self.flags["gauge"] != "standard":
-                                    time, error = numpy.loadtxt(
+                                    times, error = numpy.loadtxt(
                                         "constraint_error.txt",
                                         unpack=True,
                                     )
+                                    if "constraint_error" in fptr:
+                                        del fptr["constraint_error"]
                                     group = fptr.create_group("constraint_error")
                                     group.create_dataset(
                                         "time",
-                                        time.shape,
-                                        dtype=time.dtype,
-                                    )[:] = time
+                                        times.shape,
+                                        dtype=times.dtype,
+                                    )[:] = times
                                     group.create_dataset(
                                         "error",
                                         error.shape,
@@ -354,6 +413,9 @@ class Propagate(Task):
 
                     tmpdir.complete = True
 
+            if cache is not None:
+                cache.store(cache_key, "propagate", cache_files)
+
         deps = [self.path_pickle, self.path_wave_function, self.path_hamiltonian]
         if self.path_diag_gauge_oper:
             deps.append(self.path_diag_gauge_oper)
@@ -370,6 +432,30 @@ class Propagate(Task):
     def get_tasks_run(self) -> List[Callable[[], Dict[str, Any]]]:
         return [self.task_write_parameters, self.task_propagate]
 
+    def get_cache_key(self) -> str:
+        """Compute the key of this propagation in the artifact cache."""
+        files = [self.path_hamiltonian, self.path_wave_function]
+        if self.flags.get("gauge", "standard") == "diagonalization":
+            if not self.path_diag_gauge_oper:
+                raise ValueError("no operator specified for diagonalization gauge")
+            files.append(self.path_diag_gauge_oper)
+
+        flags = OrderedDict(
+            [(key, self.flags[key]) for key in sorted(self.flags.keys())],
+        )
+        flags.pop("cont", None)
+        flags.pop("diag_gauge_oper", None)
+        return compute_cache_key(
+            "propagate",
+            [path.resolve() for path in files],
+            [
+                flags,
+                self.qdtk_files,
+                self.psi_hdf5,
+                sorted(self.psi_hdf5_compression.items()),
+            ],
+        )
+
 
 class Relax(Propagate):
     def __init__(
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import pickle
 from os import PathLike
+from pathlib import Path
 from typing import Any, Mapping, Sequence
 
 import h5py
@@ -9,6 +10,7 @@ import numpy
 import scipy.linalg
 from numpy.typing import ArrayLike
 
+from mlxtk.cache import compute_cache_key, get_default_cache
 from mlxtk.doit_compat import DoitAction
 from mlxtk.dvr import DVRSpecification
 from mlxtk.hashing import inaccurate_hash
@@ -31,6 +33,8 @@ class ComputeReducedDensityMatrix(Task):
         store_eigenvectors: bool = False,
         diag_cleanup: bool = False,
         threads: int = 1,
+        engine: str = "auto",
+        cache: bool = True,
     ):
         self.name = name
         self.filename = name + ".h5"
@@ -43,27 +47,29 @@ class ComputeReducedDensityMatrix(Task):
         self.store_eigenvectors = store_eigenvectors
         self.diag_cleanup = diag_cleanup
         self.threads = threads
+        self.engine = engine
+        self.use_cache = cache
+
+    def get_parameters(self) -> list[Any]:
+        obj = [self.dvrs, self.dofs_A]
+        if self.basis_states is not None:
+            obj.append(
+                {
+                    dof: [inaccurate_hash(state) for state in self.basis_states[dof]]
+                    for dof in self.basis_states
+                },
+            )
+        else:
+            obj.append(None)
+        obj += [self.diagonalize, self.store_eigenvectors, self.diag_cleanup]
+        return obj
 
     def task_write_parameters(self) -> dict[str, Any]:
         @DoitAction
         def action_write_parameters(targets: list[str]):
             del targets
-            obj = [self.dvrs, self.dofs_A]
-            if self.basis_states is not None:
-                obj.append(
-                    {
-                        dof: [
-                            inaccurate_hash(state) for state in self.basis_states[dof]
-                        ]
-                        for dof in self.basis_states
-                    },
-                )
-            else:
-                obj.append(None)
-            obj += [self.diagonalize, self.store_eigenvectors, self.diag_cleanup]
-
             with open(self.picklename, "wb") as fptr:
-                pickle.dump(obj, fptr, protocol=3)
+                pickle.dump(self.get_parameters(), fptr, protocol=3)
 
         return {
             "name": f"reduced_density_matrix:{self.name}:write_parameters",
@@ -75,6 +81,18 @@ class ComputeReducedDensityMatrix(Task):
         @DoitAction
         def action_compute(targets: list[str]):
             del targets
+
+            cache = get_default_cache() if self.use_cache else None
+            if cache is not None:
+                cache_key = compute_cache_key(
+                    "reduced_density_matrix",
+                    [self.wave_function],
+                    self.get_parameters() + [self.engine],
+                )
+                if cache.lookup(cache_key, {"result.h5": self.filename}):
+                    return
+
+            Path(self.filename).unlink(missing_ok=True)
             compute_reduced_density_matrix(
                 self.wave_function,
                 self.filename,
@@ -82,52 +100,19 @@ class ComputeReducedDensityMatrix(Task):
                 self.dofs_A,
                 self.basis_states,
                 self.threads,
+                self.engine,
             )
 
-            if not self.diagonalize:
-                return
+            if self.diagonalize:
+                self._diagonalize()
 
-            with h5py.File(self.filename, "r+") as fptr:
-                time_steps, dim_A, _ = fptr["rho_A"].shape
-                dset_evals = fptr.create_dataset(
-                    "evals",
-                    shape=(time_steps, dim_A),
-                    dtype=numpy.float64,
-                )
-                dset_entropy = fptr.create_dataset(
-                    "entropy",
-                    shape=(time_steps,),
-                    dtype=numpy.float64,
+            if cache is not None:
+                cache.store(
+                    cache_key,
+                    "reduced_density_matrix",
+                    {"result.h5": self.filename},
                 )
 
-                if self.store_eigenvectors:
-                    dset_evecs = fptr.create_dataset(
-                        "evecs",
-                        shape=(time_steps, dim_A, dim_A),
-                        dtype=numpy.complex128,
-                    )
-
-                for i in range(time_steps):
-                    result = scipy.linalg.eigh(
-                        fptr["rho_A"][i, :, :],
-                        eigvals_only=not self.store_eigenvectors,
-                    )
-                    if self.store_eigenvectors:
-                        dset_evals[i] = result[0]
-                        dset_evecs[i] = result[1].T
-                        evals = result[0]
-                    else:
-                        dset_evals[i] = result
-                        evals = result
-
-                    evals = evals[evals > 1e-19]
-                    dset_entropy[i] = -numpy.sum(evals * numpy.log(evals))
-
-                if self.diag_cleanup:
-                    del fptr["rho_A"]
-                    for dof in self.dofs_A:
-                        del fptr[f"basis_states_{dof}"]
-
         return {
             "name": f"reduced_density_matrix:{self.name}:compute",
             "actions": [action_compute],
@@ -135,5 +120,47 @@ class ComputeReducedDensityMatrix(Task):
             "file_dep": [self.picklename],
         }
 
+    def _diagonalize(self):
+        with h5py.File(self.filename, "r+") as fptr:
+            time_steps, dim_A, _ = fptr["rho_A"].shape
+            dset_evals = fptr.create_dataset(
+                "evals",
+                shape=(time_steps, dim_A),
+                dtype=numpy.float64,
+            )
+            dset_entropy = fptr.create_dataset(
+                "entropy",
+                shape=(time_steps,),
+                dtype=numpy.float64,
+            )
+
+            if self.store_eigenvectors:
+                dset_evecs = fptr.create_dataset(
+                    "evecs",
+                    shape=(time_steps, dim_A, dim_A),
+                    dtype=numpy.complex128,
+                )
+
+            for i in range(time_steps):
+                result = scipy.linalg.eigh(
+                    fptr["rho_A"][i, :, :],
+                    eigvals_only=not self.store_eigenvectors,
+                )
+                if self.store_eigenvectors:
+                    dset_evals[i] = result[0]
+                    dset_evecs[i] = result[1].T
+                    evals = result[0]
+                else:
+                    dset_evals[i] = result
+                    evals = result
+
+                evals = evals[evals > 1e-19]
+                dset_entropy[i] = -numpy.sum(evals * numpy.log(evals))
+
+            if self.diag_cleanup:
+                del fptr["rho_A"]
+                for dof in self.dofs_A:
+                    del fptr[f"basis_states_{dof}"]
+
     def get_tasks_run(self):
         return [self.task_write_parameters, self.task_compute]
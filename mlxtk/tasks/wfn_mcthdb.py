@@ -1,6 +1,5 @@
 import os
 import pickle
-import subprocess
 import tempfile
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Union
@@ -11,7 +10,7 @@ from QDTK.Wavefunction import Wavefunction as WaveFunction
 from QDTK.Wavefunction import grab_lowest_eigenfct
 
 from mlxtk import cwd, inout
-from mlxtk.doit_compat import DoitAction
+from mlxtk.doit_compat import DoitAction, run_process
 from mlxtk.dvr import DVRSpecification
 from mlxtk.log import get_logger
 from mlxtk.tasks.task import Task
@@ -552,7 +551,7 @@ class MCTDHBOverlapStatic(Task):
                     self.logger.info("command: %s", " ".join(cmd))
                     env = os.environ.copy()
                     env["OMP_NUM_THREADS"] = env.get("OMP_NUM_THREADS", "1")
-                    subprocess.run(cmd, env=env)
+                    run_process(cmd, env=env)
 
                     _, real, imag = inout.read_fixed_ns_ascii("result")
                     self.logger.info(real.shape)
@@ -1,17 +1,49 @@
-import cmath
 from pathlib import Path
-from typing import Tuple, Union
+from typing import Iterator, Tuple, Union
 
 import h5py
 import numpy
 
-from mlxtk.inout.dmat import read_dmat_gridrep_ascii, write_dmat_gridrep_hdf5
-from mlxtk.inout.dmat2 import read_dmat2_gridrep_ascii
 from mlxtk.log import get_logger
 from mlxtk.util import make_path
 
 LOGGER = get_logger(__name__)
 
+DEFAULT_CHUNK_SIZE = 64
+
+
+def _get_diagonal(dmat: numpy.ndarray) -> numpy.ndarray:
+    return numpy.diagonal(dmat, axis1=1, axis2=2)
+
+
+def _g1_kernel(dmat: numpy.ndarray) -> numpy.ndarray:
+    diagonal = _get_diagonal(dmat).astype(numpy.complex128)
+    return dmat / numpy.sqrt(diagonal[:, :, None] * diagonal[:, None, :])
+
+
+def _g1_diff_kernel(dmat: numpy.ndarray) -> numpy.ndarray:
+    sqrt_diagonal = numpy.sqrt(_get_diagonal(dmat).astype(numpy.complex128))
+    return dmat - sqrt_diagonal[:, :, None] * sqrt_diagonal[:, None, :]
+
+
+def _g2_kernel(dmat: numpy.ndarray, dmat2: numpy.ndarray) -> numpy.ndarray:
+    diagonal = _get_diagonal(dmat)
+    return dmat2 / (diagonal[:, :, None] * diagonal[:, None, :])
+
+
+def _g2_diff_kernel(dmat: numpy.ndarray, dmat2: numpy.ndarray) -> numpy.ndarray:
+    diagonal = _get_diagonal(dmat)
+    return dmat2 - diagonal[:, :, None] * diagonal[:, None, :]
+
+
+def _check_grids(
+    data_dmat: Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray],
+    data_dmat2: Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray],
+):
+    for a, b in zip(data_dmat, data_dmat2):
+        assert a.shape == b.shape
+        assert numpy.allclose(a, b)
+
 
 def compute_g1(
     data_dmat: Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray],
@@ -19,13 +51,7 @@ def compute_g1(
     LOGGER.info("compute g1")
 
     time, x1, x2, dmat = data_dmat
-
-    g1 = numpy.zeros_like(dmat)
-    # TODO: improve this naive implementation (maybe numba can help)
-    for i in range(len(time)):
-        for j in range(len(x1)):
-            for k in range(len(x2)):
-                g1[i, j, k] = dmat[i, j, k] / cmath.sqrt(dmat[i, j, j] * dmat[i, k, k])
+    g1 = _g1_kernel(dmat).astype(dmat.dtype, copy=False)
     LOGGER.info("finished computing g1")
 
     return time, x1, x2, g1
@@ -38,15 +64,7 @@ def compute_g1_diff(
     LOGGER.info("compute g1")
 
     time, x1, x2, dmat = data_dmat
-
-    g1 = numpy.zeros_like(dmat)
-    # TODO: improve this naive implementation (maybe numba can help)
-    for i in range(len(time)):
-        for j in range(len(x1)):
-            for k in range(len(x2)):
-                g1[i, j, k] = dmat[i, j, k] - cmath.sqrt(dmat[i, j, j]) * cmath.sqrt(
-                    dmat[i, k, k],
-                )
+    g1 = _g1_diff_kernel(dmat).astype(dmat.dtype, copy=False)
 
     if normalize:
         g1 /= numpy.abs(dmat).max()
@@ -62,21 +80,9 @@ def compute_g2(
     LOGGER.info("compute g2")
 
     time, x1, x2, dmat = data_dmat
-    time_, x1_, x2_, dmat2 = data_dmat2
-
-    assert time.shape == time_.shape
-    assert x1.shape == x1_.shape
-    assert x2.shape == x2_.shape
-    assert numpy.allclose(time, time_)
-    assert numpy.allclose(x1, x1_)
-    assert numpy.allclose(x2, x2_)
-
-    g2 = numpy.zeros_like(dmat)
-    # TODO: improve this naive implementation (maybe numba can help)
-    for i in range(len(time)):
-        for j in range(len(x1)):
-            for k in range(len(x2)):
-                g2[i, j, k] = dmat2[i, j, k] / (dmat[i, j, j] * dmat[i, k, k])
+    _check_grids((time, x1, x2), data_dmat2[:3])
+
+    g2 = _g2_kernel(dmat, data_dmat2[3]).astype(dmat.dtype, copy=False)
     LOGGER.info("finished computing g2")
 
     return time, x1, x2, g2
@@ -90,24 +96,150 @@ def compute_g2_diff(
     LOGGER.info("compute g2")
 
     time, x1, x2, dmat = data_dmat
-    time_, x1_, x2_, dmat2 = data_dmat2
-
-    assert time.shape == time_.shape
-    assert x1.shape == x1_.shape
-    assert x2.shape == x2_.shape
-    assert numpy.allclose(time, time_)
-    assert numpy.allclose(x1, x1_)
-    assert numpy.allclose(x2, x2_)
-
-    g2 = numpy.zeros_like(dmat)
-    # TODO: improve this naive implementation (maybe numba can help)
-    for i in range(len(time)):
-        for j in range(len(x1)):
-            for k in range(len(x2)):
-                g2[i, j, k] = dmat2[i, j, k] - (dmat[i, j, j] * dmat[i, k, k])
+    _check_grids((time, x1, x2), data_dmat2[:3])
+
+    g2 = _g2_diff_kernel(dmat, data_dmat2[3]).astype(dmat.dtype, copy=False)
 
     if normalize:
-        g2 /= numpy.abs(dmat2).max()
+        g2 /= numpy.abs(data_dmat2[3]).max()
     LOGGER.info("finished computing g2")
 
     return time, x1, x2, g2
+
+
+def _iter_chunks(num_times: int, chunk_size: int) -> Iterator[slice]:
+    for start in range(0, num_times, chunk_size):
+        yield slice(start, min(start + chunk_size, num_times))
+
+
+def _read_dmat_chunk(group: h5py.Group, chunk: slice) -> numpy.ndarray:
+    return group["real"][chunk, :, :] + 1j * group["imag"][chunk, :, :]
+
+
+def _max_abs(group: h5py.Group, chunk_size: int, complex_data: bool) -> float:
+    result = 0.0
+    for chunk in _iter_chunks(group["time"].shape[0], chunk_size):
+        if complex_data:
+            values = _read_dmat_chunk(group, chunk)
+        else:
+            values = group["values"][chunk, :, :]
+        result = max(result, numpy.abs(values).max())
+    return result
+
+
+def _create_output_group(
+    fptr: h5py.File,
+    name: str,
+    group_dmat: h5py.Group,
+    chunk_size: int,
+) -> h5py.Group:
+    group = fptr.create_group(name)
+    for key in ("time", "x1", "x2"):
+        group.create_dataset(key, data=group_dmat[key][:], dtype=numpy.float64)
+
+    shape = group_dmat["real"].shape
+    chunks = (min(chunk_size, shape[0]),) + shape[1:] if shape[0] else None
+    for key in ("real", "imag"):
+        group.create_dataset(key, shape, dtype=numpy.float64, chunks=chunks)
+    return group
+
+
+def compute_g1_hdf5(
+    path_dmat: Union[str, Path],
+    path_output: Union[str, Path],
+    diff: bool = False,
+    normalize: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    interior_path_dmat: str = "dmat_gridrep",
+):
+    """Compute g1 from a dmat gridrep HDF5 file without loading it at once.
+
+    The dmat is processed in chunks of ``chunk_size`` time steps and the
+    result is written to the ``g1`` group of the output file.
+
+    Args:
+        path_dmat: path of the HDF5 file containing the dmat gridrep
+        path_output: path of the HDF5 output file
+        diff: compute the difference instead of the ratio
+        normalize: normalize the difference by the maximum of the dmat
+        chunk_size: number of time steps to process at once
+        interior_path_dmat: path of the dmat gridrep inside the HDF5 file
+    """
+    LOGGER.info("compute g1 (chunk size: %d)", chunk_size)
+
+    with h5py.File(make_path(path_dmat), "r") as fptr_dmat, h5py.File(
+        make_path(path_output),
+        "w",
+    ) as fptr:
+        group_dmat = fptr_dmat[interior_path_dmat]
+        scale = 1.0
+        if diff and normalize:
+            scale = 1.0 / _max_abs(group_dmat, chunk_size, True)
+
+        group = _create_output_group(fptr, "g1", group_dmat, chunk_size)
+        for chunk in _iter_chunks(group_dmat["time"].shape[0], chunk_size):
+            dmat = _read_dmat_chunk(group_dmat, chunk)
+            if diff:
+                g1 = _g1_diff_kernel(dmat) * scale
+            else:
+                g1 = _g1_kernel(dmat)
+            group["real"][chunk, :, :] = g1.real
+            group["imag"][chunk, :, :] = g1.imag
+
+    LOGGER.info("finished computing g1")
+
+
+def compute_g2_hdf5(
+    path_dmat: Union[str, Path],
+    path_dmat2: Union[str, Path],
+    path_output: Union[str, Path],
+    diff: bool = False,
+    normalize: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    interior_path_dmat: str = "dmat_gridrep",
+    interior_path_dmat2: str = "dmat2_gridrep",
+):
+    """Compute g2 from dmat/dmat2 gridrep HDF5 files without loading them at once.
+
+    Both inputs are processed in chunks of ``chunk_size`` time steps and the
+    result is written to the ``g2`` group of the output file.
+
+    Args:
+        path_dmat: path of the HDF5 file containing the dmat gridrep
+        path_dmat2: path of the HDF5 file containing the dmat2 gridrep
+        path_output: path of the HDF5 output file
+        diff: compute the difference instead of the ratio
+        normalize: normalize the difference by the maximum of the dmat2
+        chunk_size: number of time steps to process at once
+        interior_path_dmat: path of the dmat gridrep inside the HDF5 file
+        interior_path_dmat2: path of the dmat2 gridrep inside the HDF5 file
+    """
+    LOGGER.info("compute g2 (chunk size: %d)", chunk_size)
+
+    with h5py.File(make_path(path_dmat), "r") as fptr_dmat, h5py.File(
+        make_path(path_dmat2),
+        "r",
+    ) as fptr_dmat2, h5py.File(make_path(path_output), "w") as fptr:
+        group_dmat = fptr_dmat[interior_path_dmat]
+        group_dmat2 = fptr_dmat2[interior_path_dmat2]
+        _check_grids(
+            tuple(group_dmat[key][:] for key in ("time", "x1", "x2")),
+            tuple(group_dmat2[key][:] for key in ("time", "x1", "x2")),
+        )
+
+        scale = 1.0
+        if diff and normalize:
+            scale = 1.0 / _max_abs(group_dmat2, chunk_size, False)
+
+        group = _create_output_group(fptr, "g2", group_dmat, chunk_size)
+        for chunk in _iter_chunks(group_dmat["time"].shape[0], chunk_size):
+            dmat = _read_dmat_chunk(group_dmat, chunk)
+            dmat2 = group_dmat2["values"][chunk, :, :]
+            if diff:
+                g2 = _g2_diff_kernel(dmat, dmat2) * scale
+            else:
+                g2 = _g2_kernel(dmat, dmat2)
+            group["real"][chunk, :, :] = g2.real
+            group["imag"][chunk, :, :] = g2.imag
+
+    LOGGER.info("finished computing g2")
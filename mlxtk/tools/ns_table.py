@@ -1,5 +1,3 @@
-from typing import Any, Dict
-
 import numpy
 import scipy.special
 
@@ -11,117 +9,123 @@ def binom(n: int, k: int) -> int:
     return int(scipy.special.binom(n, k))
 
 
-# @jit
 def build_number_state_table_bosonic(N: int, m: int) -> numpy.ndarray:
-    number_of_states = binom(N + m - 1, m - 1)
-    number_states = numpy.zeros((number_of_states, m), numpy.int64)
-
-    number_states[0, 0] = N
-    for i in range(number_of_states - 1):
-        j = m - 2
-        stop = False
-
-        while j >= 0 and not stop:
-            if number_states[i, j] > 0:
-                summation = 0
-                for k in range(j):
-                    number_states[i + 1, k] = number_states[i, k]
-                    summation += number_states[i + 1, k]
-                number_states[i + 1, j] = number_states[i, j] - 1
-                summation += number_states[i + 1, j]
-                number_states[i + 1, j + 1] = N - summation
-                stop = True
-            j -= 1
-
-    return number_states
+    return NumberStateRankingBosonic(N, m).build_table()
 
 
 class NumberStateLookupTableBosonic:
     def __init__(self, N: int, m: int):
         self.N = N
         self.m = m
-        self.number_of_states = binom(N + m - 1, m - 1)
-        self.table = {}  # type: Dict[int, Any]
-
-        self._build()
-
-    def _build(self):
-        state_i = numpy.zeros(self.m, numpy.int64)
-        state_ip1 = numpy.zeros(self.m, numpy.int64)
-
-        state_i[0] = self.N
-        self.insert_state(state_i, 0)
-
-        for i in range(self.number_of_states - 1):
-            j = self.m - 2
-            stop = False
-
-            while j >= 0 and not stop:
-                if state_i[j] > 0:
-                    summation = 0
-                    for k in range(j):
-                        state_ip1[k] = state_i[k]
-                        summation += state_ip1[k]
-                    state_ip1[j] = state_i[j] - 1
-                    summation += state_ip1[j]
-                    state_ip1[j + 1] = self.N - summation
-                    stop = True
-                j -= 1
-
-            self.insert_state(state_ip1, i + 1)
-            state_i[:] = state_ip1[:]
-            state_ip1[:] = 0
-
-    def insert_state(self, state: numpy.ndarray, index: int):
-        self._insert_state_impl(state, index, 0, self.table)
-
-    def _insert_state_impl(
-        self,
-        state: numpy.ndarray,
-        index: int,
-        position: int,
-        current: Dict[int, Any],
-    ):
-        occupation = state[position]
-        if position == state.shape[0] - 1:
-            current[occupation] = index
-            return
-
-        if occupation not in current:
-            current[occupation] = {}
-
-        self._insert_state_impl(state, index, position + 1, current[occupation])
+        self.ranking = NumberStateRankingBosonic(N, m)
+        self.number_of_states = self.ranking.number_of_states
 
     def get_index(self, state: numpy.ndarray) -> int:
-        return self._get_index_impl(state, 0, self.table)
+        return int(self.ranking.rank(state))
+
+    def get_indices(self, states: numpy.ndarray) -> numpy.ndarray:
+        return self.ranking.rank(states)
+
+
+@memoize
+def get_binomial_table(n_max: int, k_max: int) -> numpy.ndarray:
+    """Table of the binomial coefficients ``C(n, k)`` for ``n <= n_max``, ``k <= k_max``.
+
+    Entries with ``k > n`` are zero.
+    """
+    table = numpy.zeros((n_max + 1, k_max + 1), dtype=numpy.int64)
+    table[:, 0] = 1
+    for n in range(1, n_max + 1):
+        table[n, 1:] = table[n - 1, 1:] + table[n - 1, :-1]
+    return table
+
+
+def get_number_state_indices_bosonic(states: numpy.ndarray) -> numpy.ndarray:
+    """Compute the positions of bosonic number states in the number state table.
 
-    def _get_index_impl(
-        self,
-        state: numpy.ndarray,
-        position: int,
-        current: Dict[int, Any],
-    ) -> int:
-        occupation = state[position]
-        if position == state.shape[0] - 1:
-            return current[occupation]
+    The positions refer to the (zero-based) ordering of
+    :func:`build_number_state_table_bosonic` for the respective particle number.
 
-        return self._get_index_impl(state, position + 1, current[occupation])
+    Args:
+        states: number states, either a single state of shape ``(m,)`` or a
+            stack of states of shape ``(..., m)``
+
+    Returns:
+        index of each state
+    """
+    states = numpy.asarray(states, dtype=numpy.int64)
+    m = states.shape[-1]
+    if m < 2:
+        return numpy.zeros(states.shape[:-1], dtype=numpy.int64)
+
+    totals = states.sum(axis=-1, keepdims=True)
+    table = get_binomial_table(int(totals.max(initial=0)) + m, m)
+
+    # number of particles remaining after each of the first m-1 modes
+    remaining = totals - numpy.cumsum(states[..., :-1], axis=-1)
+
+    # all states with the same occupations in modes 0, ..., i-1 but a larger
+    # occupation of mode i precede the state, there are
+    # C(remaining_i + m - i - 2, m - i - 1) of them
+    positions = numpy.arange(m - 1)
+    return table[remaining + m - positions - 2, m - positions - 1].sum(axis=-1)
+
+
+class NumberStateRankingBosonic:
+    """Array-backed ranking of the bosonic number states of N particles in m modes.
+
+    States are ordered like :func:`build_number_state_table_bosonic`. Ranking
+    and unranking are vectorized and only require a table of binomial
+    coefficients, the states themselves are never stored.
+    """
+
+    def __init__(self, N: int, m: int):
+        self.N = N
+        self.m = m
+        self.binomials = get_binomial_table(N + m, m)
+        self.number_of_states = int(self.binomials[N + m - 1, m - 1])
+
+    def __len__(self) -> int:
+        return self.number_of_states
+
+    def rank(self, states: numpy.ndarray) -> numpy.ndarray:
+        """Compute the indices of number states of shape ``(..., m)``."""
+        states = numpy.asarray(states, dtype=numpy.int64)
+        if states.shape[-1] != self.m:
+            raise ValueError(f"number states must have {self.m} modes")
+        if numpy.any(states.sum(axis=-1) != self.N):
+            raise ValueError(f"number states must contain {self.N} particles")
+        return get_number_state_indices_bosonic(states)
+
+    def unrank(self, indices: numpy.ndarray) -> numpy.ndarray:
+        """Compute the number states of shape ``(..., m)`` for the given indices."""
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        if numpy.any((indices < 0) | (indices >= self.number_of_states)):
+            raise IndexError("number state index out of range")
+
+        states = numpy.zeros(indices.shape + (self.m,), dtype=numpy.int64)
+        remaining = numpy.full(indices.shape, self.N, dtype=numpy.int64)
+        residual = indices.copy()
+        for i in range(self.m - 1):
+            # the number of states preceding all states with u particles left
+            # after mode i is C(u + k - 1, k) with k = m - i - 1, choose the
+            # largest u that does not exceed the residual index
+            k = self.m - i - 1
+            left = (
+                numpy.searchsorted(self.binomials[k - 1 :, k], residual, side="right")
+                - 1
+            )
+            residual -= self.binomials[left + k - 1, k]
+            states[..., i] = remaining - left
+            remaining = left
+        states[..., -1] = remaining
+        return states
+
+    def build_table(self) -> numpy.ndarray:
+        """Generate all number states at once."""
+        return self.unrank(numpy.arange(self.number_of_states, dtype=numpy.int64))
 
 
 def get_number_state_index_bosonic(state: numpy.ndarray) -> int:
-    index = 1
-    m = state.shape[0]
-    remaining = numpy.sum(state) - 1
-
-    i = 0
-    while i < m - 1:
-        remaining -= state[i]
-        i += 1
-
-        if remaining > 0:
-            j = 0
-            while j <= remaining:
-                index += binom(j + m - i - 1, m - i - 1)
-                j += 1
-
-    return index
+    """Compute the one-based position of a bosonic number state in the table."""
+    return int(get_number_state_indices_bosonic(state)) + 1
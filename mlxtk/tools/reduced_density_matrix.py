@@ -3,12 +3,13 @@ from __future__ import annotations
 import multiprocessing
 import os
 import subprocess
+import tempfile
 from functools import reduce
 from itertools import product
 from operator import mul
 from os import PathLike
 from pathlib import Path
-from typing import Mapping, Sequence
+from typing import Any, Mapping, Sequence
 
 import h5py
 import numpy
@@ -17,14 +18,21 @@ from numpy.typing import ArrayLike
 from mlxtk.cwd import WorkingDir
 from mlxtk.dvr import DVRSpecification
 from mlxtk.inout.expval import read_expval_ascii
-from mlxtk.inout.psi import read_psi_frame_ascii, write_psi_ascii
+from mlxtk.inout.psi import PsiFile
 from mlxtk.log import get_logger
-from mlxtk.tasks.operator import OperatorSpecification
+from mlxtk.tape import Node
 from mlxtk.temporary_dir import TemporaryDir
+from mlxtk.tools.wave_function import load_wave_function
 from mlxtk.util import copy_file
 
 LOGGER = get_logger(__name__)
 
+DEFAULT_FRAMES_PER_CHUNK = 16
+
+
+class UnsupportedWaveFunctionError(Exception):
+    """Wave function cannot be handled by the in-process engine."""
+
 
 # function to compute one element of the reduced density matrix
 def compute_reduced_density_matrix_element(
@@ -35,6 +43,9 @@ def compute_reduced_density_matrix_element(
     b: int,
     state_b: Sequence[ArrayLike],
 ) -> tuple[int, int, ArrayLike, ArrayLike]:
+    # imported here to avoid a circular import with mlxtk.tasks
+    from mlxtk.tasks.operator import OperatorSpecification
+
     # create projection operator |b><a| on the A system
     # unit operator acts on B for tracing it out
     operator_name = f"op_{a}_{b}.opr"
@@ -82,56 +93,292 @@ def compute_reduced_density_matrix_element(
     return a, b, time, values
 
 
-def compute_reduced_density_matrix(
+class _ReducedNode:
+    """Contraction plan for one node of the wave function tree.
+
+    The node functions are stored as ``dimension`` tensors over the indices of
+    the children (row-major). Their position in the psi vector is taken from
+    the tree that QDTK builds for the wave function: the functions of a node
+    start at ``_z0`` and are ``_phiLen`` coefficients apart (cf.
+    :func:`mlxtk.tools.wave_function.get_spfs`). The coefficients of the top
+    node precede all node functions.
+    """
+
+    def __init__(
+        self,
+        node: Node,
+        dofs_A: Sequence[int],
+        layout: Any,
+        offset: int | None = None,
+    ):
+        # pylint: disable=protected-access
+        self.node = node
+        self.dimension = node.dimension
+        self.child_dimensions = [child.dimension for child in node.children]
+        self.size = self.dimension * reduce(mul, self.child_dimensions, 1)
+        if offset is None:
+            if layout._dim != self.dimension or (
+                layout._dim * layout._phiLen != self.size
+            ):
+                raise UnsupportedWaveFunctionError(
+                    "QDTK tree does not match the tape of the wave function",
+                )
+            offset = layout._z0
+        self.offset = offset
+        self.end = offset + self.size
+        self.dofs_A: list[int] = []
+
+        # None: the index of the child is kept as a part of the (traced) B
+        # system, this is valid as the functions of a node are orthonormal
+        self.children: list[_ReducedNode | int | None] = []
+        for child, child_layout in zip(
+            node.children,
+            _get_child_layouts(node, layout),
+        ):
+            if child.is_primitive():
+                if child.attrs["dof"] in dofs_A:
+                    self.children.append(child.attrs["dof"])
+                    self.dofs_A.append(child.attrs["dof"])
+                else:
+                    self.children.append(None)
+                continue
+
+            child_dofs = [prim.attrs["dof"] for prim in child.get_primitive_nodes()]
+            reduced_child = _ReducedNode(child, dofs_A, child_layout)
+            self.end = max(self.end, reduced_child.end)
+            if any(dof in dofs_A for dof in child_dofs):
+                self.children.append(reduced_child)
+                self.dofs_A += reduced_child.dofs_A
+            else:
+                self.children.append(None)
+
+    def contract(
+        self,
+        psis: numpy.ndarray,
+        projections: Mapping[int, numpy.ndarray],
+    ) -> numpy.ndarray:
+        """Contract the subtree of this node.
+
+        Args:
+            psis: coefficients of multiple frames, time is the first axis
+            projections: projection matrix (grid point, basis state) for each
+                DoF of the A system
+
+        Returns:
+            tensor with the axes (time, node function, A basis states of each
+            DoF in tree order, flattened B indices)
+        """
+        steps = psis.shape[0]
+        result = psis[:, self.offset : self.offset + self.size].reshape(
+            (steps, self.dimension, *self.child_dimensions, 1),
+        )
+        a_shape: list[int] = []
+        b_size = 1
+
+        for child, child_dimension in zip(self.children, self.child_dimensions):
+            # axes: time, node function, current child, remaining children,
+            # A axes, B axis
+            rest = result.shape[3 : result.ndim - len(a_shape) - 1]
+            if child is None:
+                result = numpy.moveaxis(result, 2, -1).reshape(
+                    (steps, self.dimension, *rest, *a_shape, b_size * child_dimension),
+                )
+                b_size *= child_dimension
+                continue
+
+            if isinstance(child, _ReducedNode):
+                factor = child.contract(psis, projections)
+            else:
+                factor = numpy.broadcast_to(
+                    projections[child][None, :, :, None],
+                    (steps, *projections[child].shape, 1),
+                )
+
+            child_a_shape = list(factor.shape[2:-1])
+            child_b_size = factor.shape[-1]
+            contracted = numpy.einsum(
+                "tidm,tdab->timab",
+                result.reshape((steps, self.dimension, child_dimension, -1)),
+                factor.reshape(
+                    (steps, child_dimension, -1, child_b_size),
+                ),
+            ).reshape(
+                (
+                    steps,
+                    self.dimension,
+                    *rest,
+                    *a_shape,
+                    b_size,
+                    *child_a_shape,
+                    child_b_size,
+                ),
+            )
+            a_shape += child_a_shape
+            result = numpy.moveaxis(
+                contracted,
+                contracted.ndim - len(child_a_shape) - 2,
+                -2,
+            ).reshape(
+                (steps, self.dimension, *rest, *a_shape, b_size * child_b_size),
+            )
+            b_size *= child_b_size
+
+        return result
+
+
+def _get_child_layouts(node: Node, layout: Any) -> list[Any]:
+    """Assign the subnodes of a QDTK tree node to the children of a tape node.
+
+    Args:
+        node: node of the tape
+        layout: corresponding node of the QDTK tree
+
+    Returns:
+        QDTK node for each child, ``None`` for primitive children
+    """
+    # pylint: disable=protected-access
+    subnodes = list(layout._subnodes)
+    if len(subnodes) == len(node.children):
+        return [
+            None if child.is_primitive() else subnode
+            for child, subnode in zip(node.children, subnodes)
+        ]
+
+    if len(subnodes) != sum(not child.is_primitive() for child in node.children):
+        raise UnsupportedWaveFunctionError(
+            "QDTK tree does not match the tape of the wave function",
+        )
+    iterator = iter(subnodes)
+    return [None if child.is_primitive() else next(iterator) for child in node.children]
+
+
+def load_tree_layout(psi_file: PsiFile) -> Any:
+    """Load the QDTK tree of a wave function from the first frame of a psi file.
+
+    Args:
+        psi_file: opened psi file
+
+    Returns:
+        top node of the QDTK tree
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        restart = Path(tmpdir) / "restart"
+        psi_file.write_frames(restart, [0])
+        return load_wave_function(restart).tree
+
+
+def _create_plan(
+    psi_file: PsiFile,
+    dofs_A: Sequence[int],
+    layout: Any | None,
+) -> _ReducedNode:
+    tree = Node.from_tape([int(entry) for entry in psi_file.tape])
+    if any(node.is_indistinguishable() for node in tree.get_all_nodes()):
+        raise UnsupportedWaveFunctionError(
+            "in-process reduced density matrix requires distinguishable DoFs",
+        )
+    tree.compute_dof_numbers()
+    if layout is None:
+        layout = load_tree_layout(psi_file)
+    return _ReducedNode(tree, dofs_A, layout, 0)
+
+
+def supports_in_process(wave_function: PathLike, layout: Any | None = None) -> bool:
+    """Check whether the in-process engine can handle a wave function.
+
+    Args:
+        wave_function: path of the psi file
+        layout: QDTK tree of the wave function, loaded from the psi file if
+            omitted
+
+    Returns:
+        Whether the tree of the wave function has no indistinguishable nodes
+        and the QDTK tree matches the tape.
+    """
+    with PsiFile(wave_function) as psi_file:
+        try:
+            _create_plan(psi_file, [], layout)
+        except UnsupportedWaveFunctionError:
+            return False
+    return True
+
+
+def compute_reduced_density_matrix_in_process(
     wave_function: PathLike,
-    output_file: PathLike,
-    dvrs: Sequence[DVRSpecification],
     dofs_A: Sequence[int],
-    basis_states: Mapping[int, Sequence[ArrayLike]] | None = None,
-    threads: int = 1,
-):
-    # convert paths
-    wave_function = Path(wave_function).resolve()
-    output_file = Path(output_file).resolve()
+    basis_states: Mapping[int, Sequence[ArrayLike]],
+    frames_per_chunk: int = DEFAULT_FRAMES_PER_CHUNK,
+    layout: Any | None = None,
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Compute the reduced density matrix of the A system for all frames.
 
-    # function to generate basis states for DoF
-    def generate_basis_states(dof: int) -> list[ArrayLike]:
-        states: list[ArrayLike] = []
-        dim = dvrs[dof].get().npoints
-        for i in range(dim):
-            states.append(numpy.zeros((dim,)))
-            states[-1][i] = 1
-        return states
+    The frames of the psi file are read once and contracted with the basis
+    states of the A system. The B system is traced out using the
+    orthonormality of the node functions.
 
-    # check/prepare basis states for each DoF
-    if basis_states is None:
-        # generate basis_states from DVR
-        basis_states: dict[int, list[ArrayLike]] = {}
-        for dof in dofs_A:
-            basis_states[dof] = generate_basis_states(dof)
+    Only wave functions without indistinguishable (bosonic/fermionic) nodes
+    are supported.
 
-    else:
-        # check that basis_states are consitent with DVR
-        for dof in dofs_A:
-            # no basis states for DoF -> generate them
-            if dof not in basis_states:
-                basis_states[dof] = generate_basis_states(dof)
+    Args:
+        wave_function: path of the psi file
+        dofs_A: DoFs of the A system (zero-based)
+        basis_states: basis states for each DoF of the A system
+        frames_per_chunk: number of frames to contract at once
+        layout: QDTK tree of the wave function, loaded from the psi file if
+            omitted
 
-            dim = dvrs[dof].get().npoints
+    Returns:
+        times and reduced density matrix with time as the first axis
+    """
+    with PsiFile(wave_function) as psi_file:
+        plan = _create_plan(psi_file, dofs_A, layout)
 
-            if len(basis_states[dof]) != dim:
+        projections = {
+            dof: numpy.array(basis_states[dof], dtype=numpy.complex128).T
+            for dof in dofs_A
+        }
+
+        # order of the A axes in the contraction and the requested order
+        permutation = [plan.dofs_A.index(dof) for dof in dofs_A]
+        dim_A = reduce(mul, (len(basis_states[dof]) for dof in dofs_A), 1)
+
+        num_frames = len(psi_file)
+        rho = numpy.zeros((num_frames, dim_A, dim_A), dtype=numpy.complex128)
+        for start in range(0, num_frames, frames_per_chunk):
+            stop = min(start + frames_per_chunk, num_frames)
+            psis = psi_file.read_frames(range(start, stop))
+            if psis.shape[1] < plan.end:
                 raise ValueError(
-                    f"basis for DoF {dof} is overcomplete or incomplete (got {len(basis_states[dof])} states, expected {dim})",
+                    f"psi has {psis.shape[1]} coefficients, tree requires {plan.end}",
                 )
 
-            for i, state in enumerate(basis_states[dof]):
-                if len(state) != dim:
-                    raise ValueError(
-                        f"basis state {i} of DoF {dof} has wrong size (got {len(state)}, expected {dim})",
-                    )
+            # amplitudes with the axes (time, A basis state, B index)
+            amplitudes = plan.contract(psis, projections)[:, 0]
+            amplitudes = numpy.moveaxis(
+                amplitudes,
+                [1 + i for i in permutation],
+                list(range(1, len(permutation) + 1)),
+            ).reshape((stop - start, dim_A, -1))
+            rho[start:stop] = numpy.einsum(
+                "tab,tcb->tac",
+                amplitudes,
+                numpy.conjugate(amplitudes),
+            )
+            LOGGER.info(f"computed reduced density matrix for frames {start}-{stop}")
 
+        return psi_file.times.copy(), rho
+
+
+def compute_reduced_density_matrix_qdtk(
+    wave_function: Path,
+    output_file: Path,
+    dvrs: Sequence[DVRSpecification],
+    dofs_A: Sequence[int],
+    basis_states: Mapping[int, Sequence[ArrayLike]],
+    threads: int = 1,
+) -> tuple[numpy.ndarray, numpy.ndarray]:
     # compute dimension of reduced density operator
-    dim_A = reduce(mul, (len(basis_states[dof]) for dof in basis_states))
+    dim_A = reduce(mul, (len(basis_states[dof]) for dof in dofs_A))
 
     # create storage for results
     results: dict[tuple[int, int], complex] = {}
@@ -144,8 +391,8 @@ def compute_reduced_density_matrix(
             copy_file(Path(wave_function), Path.cwd() / "psi")
 
             # generate a restart file
-            tape, times, psi = read_psi_frame_ascii("psi", 0)
-            write_psi_ascii("restart", [tape, [times], psi[numpy.newaxis, :]])
+            with PsiFile("psi") as psi_file:
+                psi_file.write_frames("restart", [0])
 
             # generate the tasks for the multiprocessing pool
             tasks = (
@@ -179,6 +426,101 @@ def compute_reduced_density_matrix(
         for b in range(a + 1, dim_A):
             results_arr[:, a, b] = numpy.conjugate(results[(b, a)])
 
+    return time, results_arr
+
+
+def compute_reduced_density_matrix(
+    wave_function: PathLike,
+    output_file: PathLike,
+    dvrs: Sequence[DVRSpecification],
+    dofs_A: Sequence[int],
+    basis_states: Mapping[int, Sequence[ArrayLike]] | None = None,
+    threads: int = 1,
+    engine: str = "auto",
+):
+    """Compute the reduced density matrix of the A system and store it as HDF5.
+
+    Args:
+        wave_function: path of the psi file
+        output_file: path of the HDF5 output file
+        dvrs: DVRs of all DoFs
+        dofs_A: DoFs of the A system (zero-based)
+        basis_states: basis states for (some of) the DoFs of the A system,
+            defaults to the DVR grid points
+        threads: number of ``qdtk_expect.x`` processes (``qdtk`` engine)
+        engine: ``qdtk`` computes each element with ``qdtk_expect.x``,
+            ``numpy`` contracts the psi frames in-process, ``auto`` uses
+            ``numpy`` whenever the wave function has no indistinguishable
+            nodes and its QDTK tree matches the tape (see
+            :func:`supports_in_process`)
+    """
+    if engine not in ("auto", "numpy", "qdtk"):
+        raise ValueError(f'unknown engine "{engine}"')
+
+    # convert paths
+    wave_function = Path(wave_function).resolve()
+    output_file = Path(output_file).resolve()
+
+    # function to generate basis states for DoF
+    def generate_basis_states(dof: int) -> list[ArrayLike]:
+        states: list[ArrayLike] = []
+        dim = dvrs[dof].get().npoints
+        for i in range(dim):
+            states.append(numpy.zeros((dim,)))
+            states[-1][i] = 1
+        return states
+
+    # check/prepare basis states for each DoF
+    if basis_states is None:
+        # generate basis_states from DVR
+        basis_states: dict[int, list[ArrayLike]] = {}
+        for dof in dofs_A:
+            basis_states[dof] = generate_basis_states(dof)
+
+    else:
+        # check that basis_states are consitent with DVR
+        for dof in dofs_A:
+            # no basis states for DoF -> generate them
+            if dof not in basis_states:
+                basis_states[dof] = generate_basis_states(dof)
+
+            dim = dvrs[dof].get().npoints
+
+            if len(basis_states[dof]) != dim:
+                raise ValueError(
+                    f"basis for DoF {dof} is overcomplete or incomplete (got {len(basis_states[dof])} states, expected {dim})",
+                )
+
+            for i, state in enumerate(basis_states[dof]):
+                if len(state) != dim:
+                    raise ValueError(
+                        f"basis state {i} of DoF {dof} has wrong size (got {len(state)}, expected {dim})",
+                    )
+
+    if engine == "auto":
+        if supports_in_process(wave_function):
+            engine = "numpy"
+        else:
+            LOGGER.info("use qdtk_expect.x for reduced density matrix")
+            engine = "qdtk"
+
+    if engine == "numpy":
+        time, results_arr = compute_reduced_density_matrix_in_process(
+            wave_function,
+            dofs_A,
+            basis_states,
+        )
+
+    if engine == "qdtk":
+        time, results_arr = compute_reduced_density_matrix_qdtk(
+            wave_function,
+            output_file,
+            dvrs,
+            dofs_A,
+            basis_states,
+            threads,
+        )
+
     # create parent directory of output file
     Path(output_file).parent.mkdir(exist_ok=True, parents=True)
 
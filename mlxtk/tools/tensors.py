@@ -1,10 +1,12 @@
-from typing import Callable
+from typing import Callable, Tuple
 
 import numpy
 
 from mlxtk.dvr import DVRSpecification
 from mlxtk.tools import ns_table
 
+DEFAULT_STATE_CHUNK = 1 << 14
+
 
 def get_delta_interaction_dvr(dvr: DVRSpecification, g: float = 1.0) -> numpy.ndarray:
     n = dvr.args[0]
@@ -22,19 +24,21 @@ def get_kinetic_spf(
     spfs: numpy.ndarray,
     prefactor: float = -0.5,
 ) -> numpy.ndarray:
-    m = spfs.shape[0]
-    n = spfs.shape[1]
-    spfs_c = numpy.conjugate(spfs)
-    T_dvr = prefactor * dvr.get_d2()
-    T = numpy.zeros((m, m), dtype=numpy.complex128)
+    """Compute the kinetic energy matrix elements in the SPF basis.
 
-    for a in range(m):
-        for b in range(m):
-            for i in range(n):
-                for j in range(n):
-                    T[a, b] += T_dvr[i, j] * spfs_c[a, i] * spfs[b, j]
+    Args:
+        dvr: DVR the SPFs are represented in
+        spfs: SPFs of shape ``(m, n)`` or a stack of SPF sets of shape
+            ``(..., m, n)`` (e.g. one set per time step)
+        prefactor: prefactor of the second derivative
 
-    return T
+    Returns:
+        matrix elements of shape ``(..., m, m)``
+    """
+    T_dvr = prefactor * dvr.get_d2()
+    return (
+        numpy.conjugate(spfs) @ T_dvr @ numpy.swapaxes(spfs, -1, -2)
+    ).astype(numpy.complex128, copy=False)
 
 
 def get_potential_spf(
@@ -43,16 +47,22 @@ def get_potential_spf(
     potential: Callable[[numpy.ndarray], numpy.ndarray],
     prefactor: float = 1.0,
 ) -> numpy.ndarray:
-    m = spfs.shape[0]
-    spfs_c = numpy.conjugate(spfs)
+    """Compute the matrix elements of a potential in the SPF basis.
+
+    Args:
+        dvr: DVR the SPFs are represented in
+        spfs: SPFs of shape ``(m, n)`` or a stack of SPF sets of shape
+            ``(..., m, n)`` (e.g. one set per time step)
+        potential: potential evaluated on the DVR grid
+        prefactor: prefactor of the potential
+
+    Returns:
+        matrix elements of shape ``(..., m, m)``
+    """
     V_dvr = prefactor * potential(dvr.get_x())
-    V = numpy.zeros((m, m), dtype=numpy.complex128)
-
-    for a in range(m):
-        for b in range(m):
-            V[a, b] = numpy.sum(V_dvr * spfs_c[a] * spfs[b])
-
-    return V
+    return (
+        (numpy.conjugate(spfs) * V_dvr) @ numpy.swapaxes(spfs, -1, -2)
+    ).astype(numpy.complex128, copy=False)
 
 
 def get_delta_interaction_spf(
@@ -60,20 +70,27 @@ def get_delta_interaction_spf(
     spfs: numpy.ndarray,
     g: float = 1.0,
 ) -> numpy.ndarray:
-    m = spfs.shape[0]
-    spfs_c = numpy.conjugate(spfs)
-    V = numpy.zeros((m, m, m, m), dtype=numpy.complex128)
+    """Compute the matrix elements of a contact interaction in the SPF basis.
+
+    Args:
+        dvr: DVR the SPFs are represented in
+        spfs: SPFs of shape ``(m, n)`` or a stack of SPF sets of shape
+            ``(..., m, n)`` (e.g. one set per time step)
+        g: interaction strength
+
+    Returns:
+        matrix elements of shape ``(..., m, m, m, m)``
+    """
+    m, n = spfs.shape[-2:]
+    batch = spfs.shape[:-2]
     w = dvr.get_weights()
 
-    for a in range(m):
-        for b in range(m):
-            for c in range(m):
-                for d in range(m):
-                    V[a, b, c, d] = g * numpy.sum(
-                        (1 / w) * spfs_c[a] * spfs_c[b] * spfs[c] * spfs[d],
-                    )
-
-    return V
+    # weighted products of the SPF pairs on the grid, shape (..., m * m, n)
+    pairs = (spfs[..., :, None, :] * spfs[..., None, :, :]).reshape(
+        batch + (m * m, n),
+    )
+    V = (numpy.conjugate(pairs) * (g / w)) @ numpy.swapaxes(pairs, -1, -2)
+    return V.reshape(batch + (m, m, m, m)).astype(numpy.complex128, copy=False)
 
 
 def get_dmat_spf_naive(
@@ -114,37 +131,119 @@ def get_dmat_spf_naive(
     return rho_1
 
 
+def get_creation_map_bosonic(
+    states_lower: numpy.ndarray,
+    states: numpy.ndarray,
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Map the states with N-1 particles to the states with N particles.
+
+    Args:
+        states_lower: number states with N-1 particles
+        states: number states with N particles
+
+    Returns:
+        position of ``n + e_i`` in ``states`` and the prefactor ``sqrt(n_i + 1)``
+        for each mode ``i`` and state ``n`` of ``states_lower``, both of shape
+        ``(m, len(states_lower))``
+    """
+    m = states_lower.shape[1]
+    positions = _get_table_positions(states)
+    indices = numpy.zeros((m, len(states_lower)), dtype=numpy.int64)
+    raised = numpy.array(states_lower, dtype=numpy.int64)
+    for i in range(m):
+        raised[:, i] += 1
+        indices[i] = positions[ns_table.get_number_state_indices_bosonic(raised)]
+        raised[:, i] -= 1
+    return indices, numpy.sqrt(states_lower.T + 1.0)
+
+
+def get_pair_creation_map_bosonic(
+    states_lower: numpy.ndarray,
+    states: numpy.ndarray,
+) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """Map the states with N-2 particles to the states with N particles.
+
+    As ``a_i^dagger a_j^dagger`` is symmetric in ``i`` and ``j`` only the
+    pairs with ``i <= j`` are stored. The map is built pair by pair so that no
+    intermediate array is larger than the map itself.
+
+    Args:
+        states_lower: number states with N-2 particles
+        states: number states with N particles
+
+    Returns:
+        The mode pairs ``(i, j)`` with ``i <= j`` of shape ``(P, 2)`` with
+        ``P = m * (m + 1) / 2``, the position of ``n + e_i + e_j`` in ``states``
+        and the prefactor ``sqrt((n_i + 1) * (n_j + 1 + delta_ij))`` for each
+        pair and state ``n`` of ``states_lower``, both of shape
+        ``(P, len(states_lower))``
+    """
+    m = states_lower.shape[1]
+    positions = _get_table_positions(states)
+    pairs = numpy.array(
+        [(i, j) for i in range(m) for j in range(i, m)],
+        dtype=numpy.int64,
+    ).reshape(-1, 2)
+
+    indices = numpy.zeros((len(pairs), len(states_lower)), dtype=numpy.int64)
+    factors = numpy.zeros((len(pairs), len(states_lower)), dtype=numpy.float64)
+    raised = numpy.array(states_lower, dtype=numpy.int64)
+    for p, (i, j) in enumerate(pairs):
+        raised[:, i] += 1
+        raised[:, j] += 1
+        indices[p] = positions[ns_table.get_number_state_indices_bosonic(raised)]
+        factors[p] = numpy.sqrt(
+            (states_lower[:, i] + 1.0) * (states_lower[:, j] + 1.0 + (i == j)),
+        )
+        raised[:, i] -= 1
+        raised[:, j] -= 1
+    return pairs, indices, factors
+
+
+def _get_table_positions(states: numpy.ndarray) -> numpy.ndarray:
+    # position of each canonical number state index in the (possibly
+    # reordered) table
+    ranks = ns_table.get_number_state_indices_bosonic(states)
+    positions = numpy.full(len(states), -1, dtype=numpy.int64)
+    if numpy.any(ranks >= len(states)):
+        raise KeyError("number state table is incomplete")
+    positions[ranks] = numpy.arange(len(states))
+    if numpy.any(positions < 0):
+        raise KeyError("number state table is incomplete")
+    return positions
+
+
 def get_dmat_spf(
     coefficients: numpy.ndarray,
     states_Nm1: numpy.ndarray,
     states: numpy.ndarray,
     normalize: bool = True,
+    chunk_size: int = DEFAULT_STATE_CHUNK,
 ) -> numpy.ndarray:
-    m = len(states_Nm1[0])
+    """Compute the one-body density matrix in the SPF basis.
+
+    Args:
+        coefficients: coefficients of the number states, either a single
+            vector or a time series of shape ``(times, len(states))``
+        states_Nm1: number states with N-1 particles
+        states: number states with N particles
+        normalize: divide by the number of particles
+        chunk_size: number of states with N-1 particles processed at once
+
+    Returns:
+        one-body density matrix of shape ``(m, m)`` or ``(times, m, m)``
+    """
     N = numpy.sum(states[0])
-    rho_1 = numpy.zeros((m, m), dtype=numpy.complex128)
-    state_a = states_Nm1[0].copy()
-    state_b = states_Nm1[0].copy()
-
-    def get_index(ns: numpy.ndarray):
-        for i, entry in enumerate(states):
-            if numpy.array_equal(entry, ns):
-                return i
-
-        raise KeyError(f'ns "{ns}" not contained in number state table!')
+    indices, factors = get_creation_map_bosonic(states_Nm1, states)
+    coefficients = numpy.asarray(coefficients)
+    m = indices.shape[0]
 
-    for i in range(m):
-        for j in range(m):
-            for state in states_Nm1:
-                state_a[:] = state
-                state_b[:] = state
-                state_a[i] += 1
-                state_b[j] += 1
-                rho_1[i, j] += (
-                    numpy.sqrt((state[i] + 1) * (state[j] + 1))
-                    * numpy.conjugate(coefficients[get_index(state_a)])
-                    * coefficients[get_index(state_b)]
-                )
+    rho_1 = numpy.zeros(coefficients.shape[:-1] + (m, m), dtype=numpy.complex128)
+    for start in range(0, indices.shape[1], chunk_size):
+        chunk = slice(start, start + chunk_size)
+        # amplitudes[..., i, n] = <n| a_i |Psi>
+        amplitudes = factors[:, chunk] * coefficients[..., indices[:, chunk]]
+        rho_1 += numpy.conjugate(amplitudes) @ numpy.swapaxes(amplitudes, -1, -2)
 
     if normalize:
         return rho_1 / N
@@ -211,46 +310,46 @@ def get_dmat2_spf(
     states_Nm2: numpy.ndarray,
     states: numpy.ndarray,
     normalize: bool = True,
+    chunk_size: int = DEFAULT_STATE_CHUNK,
 ) -> numpy.ndarray:
-    m = len(states_Nm2[0])
+    """Compute the two-body density matrix in the SPF basis.
+
+    Args:
+        coefficients: coefficients of the number states, either a single
+            vector or a time series of shape ``(times, len(states))``
+        states_Nm2: number states with N-2 particles
+        states: number states with N particles
+        normalize: divide by N(N-1)
+        chunk_size: number of states with N-2 particles processed at once
+
+    Returns:
+        two-body density matrix of shape ``(m, m, m, m)`` or
+        ``(times, m, m, m, m)``
+    """
     N = numpy.sum(states[0])
-    rho_2 = numpy.zeros((m, m, m, m), dtype=numpy.complex128)
-    state_a = states_Nm2[0].copy()
-    state_b = states_Nm2[0].copy()
-
-    def get_index(ns: numpy.ndarray):
-        for i, entry in enumerate(states):
-            if numpy.array_equal(entry, ns):
-                return i
-
-        raise KeyError(f'ns "{ns}" not contained in number state table!')
-
-    for i in range(m):
-        for j in range(m):
-            for k in range(m):
-                for l in range(m):
-                    for state in states_Nm2:
-                        state_a[:] = state
-                        state_b[:] = state
-                        delta_a = 1 if i == j else 0
-                        delta_b = 1 if k == l else 0
-                        factor_a = state[j] + 1 - delta_a
-                        if factor_a <= 0:
-                            continue
-                        factor_b = state[l] + 1 - delta_b
-                        if factor_b <= 0:
-                            continue
-                        state_a[i] += 1
-                        state_a[j] += 1
-                        state_b[k] += 1
-                        state_b[l] += 1
-                        rho_2[i, j, k, l] += (
-                            numpy.sqrt(
-                                (state[i] + 1) * factor_a * (state[j] + 1) * factor_b,
-                            )
-                            * numpy.conjugate(coefficients[get_index(state_a)])
-                            * coefficients[get_index(state_b)]
-                        )
+    pairs, indices, factors = get_pair_creation_map_bosonic(states_Nm2, states)
+    coefficients = numpy.asarray(coefficients)
+    m = states.shape[1]
+
+    rho_pairs = numpy.zeros(
+        coefficients.shape[:-1] + (len(pairs), len(pairs)),
+        dtype=numpy.complex128,
+    )
+    for start in range(0, indices.shape[1], chunk_size):
+        chunk = slice(start, start + chunk_size)
+        # amplitudes[..., p, n] = <n| a_j a_i |Psi> for the pair p = (i, j)
+        amplitudes = factors[:, chunk] * coefficients[..., indices[:, chunk]]
+        rho_pairs += numpy.conjugate(amplitudes) @ numpy.swapaxes(amplitudes, -1, -2)
+
+    # expand the pairs i <= j to all combinations of modes
+    pair_index = numpy.zeros((m, m), dtype=numpy.int64)
+    pair_index[pairs[:, 0], pairs[:, 1]] = numpy.arange(len(pairs))
+    pair_index[pairs[:, 1], pairs[:, 0]] = numpy.arange(len(pairs))
+    rho_2 = rho_pairs[
+        ...,
+        pair_index[:, :, None, None],
+        pair_index[None, None, :, :],
+    ]
 
     if normalize:
         return rho_2 / (N * (N - 1))
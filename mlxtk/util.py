@@ -119,6 +119,31 @@ def get_folder_size(path: Union[str, Path]) -> int:
     return int(m.group(1))
 
 
+RE_SIZE = re.compile(r"^\s*(\d+(?:\.\d*)?)\s*([kKmMgGtT]?)i?[bB]?\s*$")
+SIZE_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+
+
+def parse_size(size: Union[str, int]) -> int:
+    """Parse a size in bytes with an optional unit suffix (e.g. ``"10G"``)."""
+    if isinstance(size, int):
+        return size
+
+    m = RE_SIZE.match(size)
+    if not m:
+        raise ValueError(f'invalid size "{size}"')
+
+    return int(float(m.group(1)) * SIZE_UNITS[m.group(2).lower()])
+
+
+def format_size(size: int) -> str:
+    value = float(size)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(value) < 1024.0:
+            return f"{value:.1f} {unit}"
+        value /= 1024.0
+    return f"{value:.1f} TiB"
+
+
 def compress_folder(path: Union[str, Path], compression: int = 9, jobs: int = 1):
     path = make_path(path)
     folder = path.name
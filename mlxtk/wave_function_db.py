@@ -1,22 +1,24 @@
 import argparse
+import contextlib
 import copy
 import importlib.util
 import pickle
 import shutil
+import sqlite3
 import subprocess
 import sys
-import time
 from functools import partial
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
 from prompt_toolkit.shortcuts import checkboxlist_dialog, radiolist_dialog
 
 from mlxtk import cwd, doit_compat
 from mlxtk.hashing import hash_string
+from mlxtk.lock import FileLock, FileLockTimeoutError
 from mlxtk.log import get_logger
 from mlxtk.parameter_scan import ParameterScan
-from mlxtk.parameters import Parameters
+from mlxtk.parameters import Parameters, get_parameters_key
 from mlxtk.simulation import Simulation
 from mlxtk.util import get_main_path
 
@@ -36,28 +38,46 @@ class WaveFunctionDBLockError(Exception):
         super().__init__("Could not lock wave function db: " + str(path))
 
 
-class WaveFunctionDBLock:
-    def __init__(self, path: Path):
-        self.path = path
+DEFAULT_LOCK_TIMEOUT = 1024.0
 
-    def __enter__(self):
-        for _ in range(1024):
-            try:
-                self.path.touch(exist_ok=False)
-                return
-            except FileExistsError:
-                time.sleep(1)
-                continue
-        raise WaveFunctionDBLockError(self.path)
 
-    def __exit__(self, _type, value, traceback):
-        del _type
-        del value
-        del traceback
-        self.path.unlink()
+class WaveFunctionDBLock(FileLock):
+    """Lock of a wave function db.
+
+    Processes that modify the db should acquire an exclusive lock, processes
+    that only look up existing entries can use a shared lock.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        shared: bool = False,
+        timeout: Optional[float] = DEFAULT_LOCK_TIMEOUT,
+    ):
+        super().__init__(path, shared, timeout)
+
+    def acquire(self):
+        try:
+            super().acquire()
+        except FileLockTimeoutError:
+            raise WaveFunctionDBLockError(self.path)
+
+
+WAVE_FUNCTION_DB_INDEX = "wave_function_db.sqlite"
+
+STATE_MISSING = 0
+STATE_STORED = 1
 
 
 class WaveFunctionDB(ParameterScan):
+    """Database of wave functions computed for different parameters.
+
+    The stored and missing wave functions are kept in an SQLite index inside the
+    working directory. Entries are identified by a canonical key of their
+    parameters which is indexed, so that looking up a wave function does not
+    require to compare with all stored entries.
+    """
+
     def __init__(
         self,
         name: str,
@@ -65,9 +85,11 @@ class WaveFunctionDB(ParameterScan):
         prototype: Parameters,
         func: Callable[[Parameters], Simulation],
         working_dir: str = None,
+        lock_timeout: Optional[float] = DEFAULT_LOCK_TIMEOUT,
     ):
         self.logger = get_logger(__name__ + ".WaveFunctionDB")
         self.prototype = prototype
+        self.lock_timeout = lock_timeout
         self.stored_wave_functions = []  # type: List[Parameters]
         self.missing_wave_functions = []  # type: List[Parameters]
         self.wfn_path = wfn_path
@@ -83,132 +105,211 @@ class WaveFunctionDB(ParameterScan):
 
         self.load_missing_wave_functions()
         self.load_stored_wave_functions()
-        self.combinations = self.stored_wave_functions + self.missing_wave_functions
-
-        # TODO: it would be better to collect missing wave functions and remove them in one go
-        # this would require some additional methods
-        for parameter in self.stored_wave_functions:
-            path = self.get_path(parameter)
-            if not path:
-                self.store_missing_wave_function(parameter)
-                self.remove_wave_function(parameter)
-                continue
 
-            if not path.exists():
-                self.store_missing_wave_function(parameter)
-                self.remove_wave_function(parameter)
+        # check all stored wave functions at once and mark the ones that do not
+        # exist anymore as missing in a single transaction
+        vanished = []
+        with self.transaction() as connection:
+            for key, sim_hash in connection.execute(
+                "SELECT key, hash FROM wave_functions WHERE state = ?",
+                (STATE_STORED,),
+            ):
+                path = self.working_dir.resolve() / "sim" / sim_hash / self.wfn_path
+                if not path.exists():
+                    vanished.append(key)
+
+            if vanished:
+                self.logger.info(
+                    "%d stored wave function(s) do not exist anymore",
+                    len(vanished),
+                )
+                connection.executemany(
+                    "UPDATE wave_functions SET state = ? WHERE key = ?",
+                    [(STATE_MISSING, key) for key in vanished],
+                )
 
-    def load_missing_wave_functions(self):
-        self.create_working_dir()
+        if vanished:
+            self.load_missing_wave_functions()
+            self.load_stored_wave_functions()
 
-        p = Path("missing_wave_functions.pickle")
-        with cwd.WorkingDir(self.working_dir):
-            if not p.exists():
-                return
+        self.combinations = self.stored_wave_functions + self.missing_wave_functions
 
-            with open("missing_wave_functions.pickle", "rb") as fptr:
-                self.missing_wave_functions = pickle.load(fptr)
+    def lock(self, shared: bool = False) -> WaveFunctionDBLock:
+        """Create a lock for this db.
 
-    def load_stored_wave_functions(self):
+        Args:
+            shared: only acquire a shared lock for looking up entries
+        """
         self.create_working_dir()
+        return WaveFunctionDBLock(
+            self.working_dir / "wave_function_db.lock",
+            shared,
+            self.lock_timeout,
+        )
 
-        p = Path("stored_wave_functions.pickle")
-        with cwd.WorkingDir(self.working_dir):
-            if not p.exists():
-                return
-
-            with open("stored_wave_functions.pickle", "rb") as fptr:
-                self.stored_wave_functions = pickle.load(fptr)
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Open the index of the database and run a transaction on it.
 
-    def store_missing_wave_function(self, parameters: Parameters):
+        The index is created if necessary and pickle files of older versions
+        are imported once.
+        """
         self.create_working_dir()
-
-        p = Path("missing_wave_functions.pickle")
-        with cwd.WorkingDir(self.working_dir):
-            entries = []  # type: List[Parameters]
-            if p.exists():
-                with open(p, "rb") as fptr:
+        path = self.working_dir / WAVE_FUNCTION_DB_INDEX
+        exists = path.exists()
+
+        connection = sqlite3.connect(str(path), timeout=60.0)
+        try:
+            if not exists:
+                connection.execute("PRAGMA journal_mode=WAL")
+                with connection:
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS wave_functions ("
+                        "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                        "key TEXT NOT NULL UNIQUE, "
+                        "state INTEGER NOT NULL, "
+                        "hash TEXT NOT NULL, "
+                        "parameters BLOB NOT NULL)",
+                    )
+                self._import_pickles(connection)
+
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _import_pickles(self, connection: sqlite3.Connection):
+        for state, name in (
+            (STATE_STORED, "stored_wave_functions.pickle"),
+            (STATE_MISSING, "missing_wave_functions.pickle"),
+        ):
+            path = self.working_dir / name
+            try:
+                with open(path, "rb") as fptr:
                     entries = pickle.load(fptr)
+            except FileNotFoundError:
+                continue
 
-            if parameters in entries:
-                return
-
-            entries.append(parameters)
+            self.logger.info("import %d entries from %s", len(entries), name)
+            with connection:
+                for parameters in entries:
+                    self._insert(connection, parameters, state)
+            with contextlib.suppress(FileNotFoundError):
+                path.rename(path.with_name(path.name + ".bak"))
 
-            with open(p, "wb") as fptr:
-                pickle.dump(entries, fptr, protocol=3)
+    def _insert(
+        self,
+        connection: sqlite3.Connection,
+        parameters: Parameters,
+        state: int,
+    ):
+        connection.execute(
+            "INSERT INTO wave_functions (key, state, hash, parameters) "
+            "VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET state = excluded.state",
+            (
+                get_parameters_key(parameters, parameters.names),
+                state,
+                hash_string(repr(parameters)),
+                pickle.dumps(parameters, protocol=3),
+            ),
+        )
 
-            self.missing_wave_functions.append(parameters)
+    def _load(self, state: int) -> List[Parameters]:
+        with self.transaction() as connection:
+            return [
+                pickle.loads(row[0])
+                for row in connection.execute(
+                    "SELECT parameters FROM wave_functions WHERE state = ? "
+                    "ORDER BY id",
+                    (state,),
+                )
+            ]
 
-    def remove_missing_wave_function(self, parameters: Parameters):
-        self.create_working_dir()
+    def _get_state(self, parameters: Parameters) -> Optional[int]:
+        with self.transaction() as connection:
+            row = connection.execute(
+                "SELECT state FROM wave_functions WHERE key = ?",
+                (get_parameters_key(parameters, parameters.names),),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def _set_state(self, parameters: Parameters, state: int):
+        with self.transaction() as connection:
+            self._insert(connection, parameters, state)
+
+    def _remove(self, parameters: Parameters, state: int) -> bool:
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                "DELETE FROM wave_functions WHERE key = ? AND state = ?",
+                (get_parameters_key(parameters, parameters.names), state),
+            )
+            return cursor.rowcount > 0
 
-        p = Path("missing_wave_functions.pickle")
-        with cwd.WorkingDir(self.working_dir):
-            if not p.exists():
-                return
+    def load_missing_wave_functions(self):
+        self.missing_wave_functions = self._load(STATE_MISSING)
 
-            with open(p, "rb") as fptr:
-                entries = pickle.load(fptr)
+    def load_stored_wave_functions(self):
+        self.stored_wave_functions = self._load(STATE_STORED)
 
-            if parameters not in entries:
-                return
+    def store_missing_wave_function(self, parameters: Parameters):
+        if self._get_state(parameters) == STATE_MISSING:
+            return
 
-            entries.remove(parameters)
+        self._set_state(parameters, STATE_MISSING)
+        if parameters in self.stored_wave_functions:
+            self.stored_wave_functions.remove(parameters)
+        self.missing_wave_functions.append(parameters)
 
-            with open(p, "wb") as fptr:
-                pickle.dump(entries, fptr, protocol=3)
+    def remove_missing_wave_function(self, parameters: Parameters):
+        if not self._remove(parameters, STATE_MISSING):
+            return
 
+        if parameters in self.missing_wave_functions:
             self.missing_wave_functions.remove(parameters)
 
     def store_wave_function(self, parameters: Parameters):
-        self.create_working_dir()
-
-        p = Path("stored_wave_functions.pickle")
-        with cwd.WorkingDir(self.working_dir):
-            entries = []  # type: List[Parameters]
-            if p.exists():
-                with open(p, "rb") as fptr:
-                    entries = pickle.load(fptr)
-
-            if parameters in entries:
-                return
-
-            entries.append(parameters)
-
-            with open(p, "wb") as fptr:
-                pickle.dump(entries, fptr, protocol=3)
+        if self._get_state(parameters) == STATE_STORED:
+            return
 
-            self.stored_wave_functions.append(parameters)
+        self._set_state(parameters, STATE_STORED)
+        if parameters in self.missing_wave_functions:
+            self.missing_wave_functions.remove(parameters)
+        self.stored_wave_functions.append(parameters)
 
     def remove_wave_function(self, parameters: Parameters):
-        self.create_working_dir()
-
-        p = Path("stored_wave_functions.pickle")
-        with cwd.WorkingDir(self.working_dir):
-            if not p.exists():
-                return
-
-            with open(p, "rb") as fptr:
-                entries = pickle.load(fptr)
-
-            if parameters not in entries:
-                return
-
-            entries.remove(parameters)
-
-            with open(p, "wb") as fptr:
-                pickle.dump(entries, fptr, protocol=3)
+        if not self._remove(parameters, STATE_STORED):
+            return
 
+        if parameters in self.stored_wave_functions:
             self.stored_wave_functions.remove(parameters)
 
     def get_simulation_path(self, parameters: Parameters) -> Optional[Path]:
         common_parameter_names = parameters.get_common_parameter_names(self.prototype)
 
-        for p in self.stored_wave_functions:
-            if p.has_same_common_parameters(parameters, common_parameter_names):
-                path = self.working_dir.resolve() / "sim" / hash_string(repr(p))
-                return path
+        with self.transaction() as connection:
+            if set(common_parameter_names) == set(self.prototype.names):
+                row = connection.execute(
+                    "SELECT hash FROM wave_functions WHERE key = ? AND state = ?",
+                    (
+                        get_parameters_key(parameters, common_parameter_names),
+                        STATE_STORED,
+                    ),
+                ).fetchone()
+                if row is not None:
+                    return self.working_dir.resolve() / "sim" / row[0]
+                return None
+
+            # only a subset of the parameters is specified, compare with all
+            # stored wave functions
+            for sim_hash, blob in connection.execute(
+                "SELECT hash, parameters FROM wave_functions WHERE state = ? "
+                "ORDER BY id",
+                (STATE_STORED,),
+            ):
+                p = pickle.loads(blob)
+                if p.has_same_common_parameters(parameters, common_parameter_names):
+                    return self.working_dir.resolve() / "sim" / sim_hash
 
         return None
 
@@ -227,7 +328,8 @@ class WaveFunctionDB(ParameterScan):
                 self.prototype,
             )
 
-            path = self.get_path(parameters)
+            with self.lock(shared=True):
+                path = self.get_path(parameters)
             if path:
                 self.logger.info("wave function is present")
                 return path
@@ -238,8 +340,9 @@ class WaveFunctionDB(ParameterScan):
             for name in common_parameter_names:
                 p[name] = parameters[name]
 
-            if p not in self.missing_wave_functions:
-                self.store_missing_wave_function(p)
+            if self._get_state(p) != STATE_MISSING:
+                with self.lock():
+                    self.store_missing_wave_function(p)
                 self.combinations = (
                     self.stored_wave_functions + self.missing_wave_functions
                 )
@@ -255,21 +358,20 @@ class WaveFunctionDB(ParameterScan):
         self.logger.info("computing wave function for parameters %s", repr(parameters))
         self.run_by_param(parameters)
 
-        with WaveFunctionDBLock(self.working_dir / "wave_function_db.lock"):
+        with self.lock():
             self.remove_missing_wave_function(parameters)
             self.store_wave_function(parameters)
 
     def cmd_run_index(self, args: argparse.Namespace):
         super().cmd_run_index(args)
         parameters = self.combinations[args.index]
-        with WaveFunctionDBLock(self.working_dir / "wave_function_db.lock"):
+        with self.lock():
             self.remove_missing_wave_function(parameters)
             self.store_wave_function(parameters)
 
     def cmd_run(self, args: argparse.Namespace):
         self.logger.info("running wave function db")
 
-        self.unlink_simulations()
         self.store_parameters()
         self.link_simulations()
 
@@ -300,7 +402,6 @@ class WaveFunctionDB(ParameterScan):
         self.logger.info("remove wave_functions with indices: %s", str(indices))
 
         selected_parameters = [self.combinations[index] for index in indices]
-        self.unlink_simulations()
         for parameters in selected_parameters:
             if (self.get_simulation_path(parameters) is not None) and (
                 self.get_simulation_path(parameters).exists()
@@ -0,0 +1,131 @@
+import os
+import pickle
+
+import h5py
+import numpy
+
+from mlxtk.doit_analyses import aggregate
+from mlxtk.parameters import Parameters
+from mlxtk.scan_index import ScanIndex
+
+
+def write_result(path, energy):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with h5py.File(path, "w") as fptr:
+        group = fptr.create_group("output")
+        group.create_dataset("time", data=numpy.arange(len(energy), dtype=float))
+        group.create_dataset("energy", data=energy)
+
+
+def create_scan(path):
+    combinations = []
+    for N in [3, 2]:
+        for g in [0.1, 0.2, 0.3]:
+            combinations.append(Parameters([("N", N, ""), ("g", g, "")]))
+
+    path.mkdir()
+    ScanIndex(path).update(
+        [
+            (i, str(i), str(i), pickle.dumps(p, protocol=3))
+            for i, p in enumerate(combinations)
+        ],
+        len(combinations),
+    )
+    for i, p in enumerate(combinations):
+        if i == 4:
+            continue
+        write_result(
+            path / "by_index" / str(i) / "propagate" / "propagate.h5",
+            numpy.full(3, 10 * p.N + p.g),
+        )
+    return combinations
+
+
+def test_aggregate_hdf5(tmp_path):
+    scan_dir = tmp_path / "scan"
+    create_scan(scan_dir)
+    output_file = tmp_path / "aggregate.h5"
+
+    assert (
+        aggregate.aggregate_hdf5(
+            scan_dir,
+            "propagate/propagate.h5",
+            ["output"],
+            output_file,
+            processes=2,
+        )
+        == 5
+    )
+
+    with h5py.File(output_file, "r") as fptr:
+        assert fptr["axes/N"][()].tolist() == [2, 3]
+        assert fptr["axes/g"][()].tolist() == [0.1, 0.2, 0.3]
+        assert fptr["index"][()].tolist() == [[3, 4, 5], [0, 1, 2]]
+        energy = fptr["data/output/energy"][()]
+        assert energy.shape == (2, 3, 3)
+        assert energy[1, 2].tolist() == [30.3] * 3
+        assert numpy.isnan(energy[0, 1]).all()
+        assert fptr["data/output/time"][0, 0].tolist() == [0.0, 1.0, 2.0]
+
+    # nothing changed
+    assert (
+        aggregate.aggregate_hdf5(
+            scan_dir,
+            "propagate/propagate.h5",
+            ["output"],
+            output_file,
+            processes=1,
+        )
+        == 0
+    )
+
+    # a longer time series for one point extends the time axis
+    path = scan_dir / "by_index" / "4" / "propagate" / "propagate.h5"
+    write_result(path, numpy.arange(5.0))
+    os.utime(path, ns=(1, 1))
+    assert (
+        aggregate.aggregate_hdf5(
+            scan_dir,
+            "propagate/propagate.h5",
+            ["output/energy"],
+            output_file,
+            processes=1,
+        )
+        == 6
+    )
+    assert (
+        aggregate.aggregate_hdf5(
+            scan_dir,
+            "propagate/propagate.h5",
+            ["output/energy"],
+            output_file,
+            processes=1,
+        )
+        == 0
+    )
+
+    with h5py.File(output_file, "r") as fptr:
+        assert "time" not in fptr["data/output"]
+        energy = fptr["data/output/energy"][()]
+        assert energy.shape == (2, 3, 5)
+        assert energy[0, 1].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+        assert energy[1, 0, :3].tolist() == [30.1] * 3
+        assert numpy.isnan(energy[1, 0, 3:]).all()
+
+    # the point of a removed input file is reset
+    path.unlink()
+    assert (
+        aggregate.aggregate_hdf5(
+            scan_dir,
+            "propagate/propagate.h5",
+            ["output/energy"],
+            output_file,
+            processes=2,
+        )
+        == 1
+    )
+    with h5py.File(output_file, "r") as fptr:
+        energy = fptr["data/output/energy"][()]
+        assert numpy.isnan(energy[0, 1]).all()
+        assert energy[1, 0, :3].tolist() == [30.1] * 3
+        assert fptr["sources"][4].tolist() == [0, 0]
@@ -0,0 +1,107 @@
+import h5py
+import numpy
+import pytest
+
+from mlxtk.inout import dmat, dmat2
+
+
+def create_table(path, indices, values, blank_lines: bool = False):
+    with open(path, "w") as fptr:
+        for row in numpy.c_[indices, values]:
+            fptr.write("\t".join(repr(float(x)) for x in row) + "\n")
+            if blank_lines and row[-len(values[0]) - 1] == indices[-1, -1]:
+                fptr.write("\n")
+
+
+def create_grid_data(num_steps: int = 7, num_x: int = 5):
+    rng = numpy.random.default_rng(42)
+    time = numpy.linspace(0.0, 1.0, num_steps)
+    x = numpy.linspace(-1.0, 1.0, num_x)
+    values = rng.uniform(size=(num_steps, num_x, num_x)) + 1j * rng.uniform(
+        size=(num_steps, num_x, num_x),
+    )
+    return time, x, x.copy(), values
+
+
+def test_dmat_gridrep(tmp_path):
+    data = create_grid_data()
+    dmat.write_dmat_gridrep_ascii(tmp_path / "dmat", data)
+
+    result = dmat.read_dmat_gridrep_ascii(tmp_path / "dmat")
+    for expected, value in zip(data, result):
+        assert numpy.array_equal(expected, value)
+
+    with h5py.File(tmp_path / "dmat.h5", "w") as fptr:
+        dmat.add_dmat_gridrep_ascii_to_hdf5(fptr, tmp_path / "dmat")
+    result = dmat.read_dmat_gridrep_hdf5(tmp_path / "dmat.h5", "dmat_gridrep")
+    for expected, value in zip(data, result):
+        assert numpy.array_equal(expected, value)
+
+
+def test_dmat_spfrep_streaming(tmp_path, monkeypatch):
+    time, _, _, values = create_grid_data(11, 3)
+    i, j = numpy.meshgrid(numpy.arange(3), numpy.arange(3), indexing="ij")
+    indices = numpy.c_[
+        numpy.repeat(time, 9),
+        numpy.tile(i.flatten(), len(time)),
+        numpy.tile(j.flatten(), len(time)),
+    ]
+    create_table(
+        tmp_path / "dmat",
+        indices,
+        numpy.c_[values.real.flatten(), values.imag.flatten()],
+        blank_lines=True,
+    )
+
+    # parse only a few lines at once
+    with h5py.File(tmp_path / "dmat.h5", "w") as fptr:
+        group = fptr.create_group("dmat_spfrep")
+        dmat.tools.add_ascii_steps_to_hdf5(
+            group,
+            tmp_path / "dmat",
+            [None, None],
+            ["real", "imag"],
+            chunk_bytes=200,
+        )
+    time_, values_ = dmat.read_dmat_spfrep_hdf5(tmp_path / "dmat.h5", "dmat_spfrep")
+    assert numpy.array_equal(time, time_)
+    assert numpy.array_equal(values, values_)
+
+    time_, values_ = dmat.read_dmat_spfrep_ascii(tmp_path / "dmat")
+    assert numpy.array_equal(time, time_)
+    assert numpy.array_equal(values, values_)
+
+
+def test_dmat2_gridrep(tmp_path):
+    time, x1, x2, values = create_grid_data(4, 6)
+    values = values.real
+    indices = numpy.c_[
+        numpy.repeat(time, 36),
+        numpy.tile(numpy.repeat(x1, 6), len(time)),
+        numpy.tile(x2, len(time) * 6),
+    ]
+    create_table(tmp_path / "dmat2", indices, values.reshape((-1, 1)))
+
+    with h5py.File(tmp_path / "dmat2.h5", "w") as fptr:
+        dmat2.add_dmat2_gridrep_ascii_to_hdf5(fptr, tmp_path / "dmat2")
+    for result in (
+        dmat2.read_dmat2_gridrep_ascii(tmp_path / "dmat2"),
+        dmat2.read_dmat2_gridrep_hdf5(tmp_path / "dmat2.h5", "dmat2_gridrep"),
+    ):
+        for expected, value in zip((time, x1, x2, values), result):
+            assert numpy.array_equal(expected, value)
+
+
+def test_dmat_gridrep_empty(tmp_path):
+    (tmp_path / "dmat").touch()
+    with pytest.raises(RuntimeError, match="No data in"):
+        dmat.read_dmat_gridrep_ascii(tmp_path / "dmat")
+
+    with h5py.File(tmp_path / "dmat.h5", "w") as fptr:
+        with pytest.raises(RuntimeError, match="No data in"):
+            dmat.tools.add_ascii_steps_to_hdf5(
+                fptr,
+                tmp_path / "dmat",
+                ["x1", "x2"],
+                ["real", "imag"],
+            )
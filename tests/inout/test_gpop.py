@@ -0,0 +1,53 @@
+import numpy
+
+from mlxtk.inout import gpop
+
+
+def create_gpop_file(path, num_steps: int = 5, trailing_newline: bool = True):
+    rng = numpy.random.default_rng(42)
+    times = numpy.linspace(0.0, 2.0, num_steps)
+    grids = {1: numpy.linspace(-5.0, 5.0, 11), 2: numpy.linspace(-1.0, 1.0, 4)}
+    densities = {
+        dof: rng.uniform(size=(num_steps, len(grid))) for dof, grid in grids.items()
+    }
+
+    lines = []
+    for step, time in enumerate(times):
+        lines.append(f"#    {float(time)!r}   [au]")
+        for dof, grid in grids.items():
+            lines.append(f"{dof}  {len(grid)}")
+            for x, y in zip(grid, densities[dof][step]):
+                lines.append(f"  {float(x)!r}  {float(y)!r}")
+            lines.append("")
+
+    text = "\n".join(lines)
+    if trailing_newline:
+        text += "\n"
+    with open(path, "w") as fptr:
+        fptr.write(text)
+
+    return times, grids, densities
+
+
+def test_read_gpop_ascii(tmp_path):
+    times, grids, densities = create_gpop_file(tmp_path / "gpop")
+
+    times_, grids_, densities_ = gpop.read_gpop_ascii(tmp_path / "gpop")
+    assert numpy.array_equal(times, times_)
+    assert sorted(grids_.keys()) == [1, 2]
+    for dof in grids:
+        assert numpy.array_equal(grids[dof], grids_[dof])
+        assert numpy.array_equal(densities[dof], densities_[dof])
+
+    times_, grid_, density_ = gpop.read_gpop_ascii(tmp_path / "gpop", dof=2)
+    assert numpy.array_equal(times, times_)
+    assert numpy.array_equal(grids[2], grid_)
+    assert numpy.array_equal(densities[2], density_)
+
+
+def test_read_gpop_ascii_without_trailing_newline(tmp_path):
+    times, _, densities = create_gpop_file(tmp_path / "gpop", trailing_newline=False)
+
+    times_, _, densities_ = gpop.read_gpop_ascii(tmp_path / "gpop")
+    assert numpy.array_equal(times, times_)
+    assert numpy.array_equal(densities[1], densities_[1])
@@ -0,0 +1,66 @@
+import numpy
+
+from mlxtk.inout import natpop
+
+
+def create_natpop_file(path, num_steps: int = 6):
+    rng = numpy.random.default_rng(42)
+    times = numpy.linspace(0.0, 1.0, num_steps)
+    # node -> dof -> natural populations (times, m)
+    natpops = {
+        1: {1: rng.uniform(size=(num_steps, 2))},
+        2: {1: rng.uniform(size=(num_steps, 7)), 2: rng.uniform(size=(num_steps, 3))},
+    }
+
+    lines = []
+    for step, time in enumerate(times):
+        lines.append(f"#time:    {float(time)!r} [au]")
+        lines.append("Natural weights *1000 and orbitals")
+        for node, dofs in natpops.items():
+            lines.append(f"node: {node}   layer: {node}")
+            for dof, values in dofs.items():
+                tokens = [repr(float(value) * 1000.0) for value in values[step]]
+                # split long rows over multiple lines
+                lines.append(f"m{dof}:  " + "  ".join(tokens[:4]))
+                if tokens[4:]:
+                    lines.append("     " + "  ".join(tokens[4:]))
+        lines.append("")
+
+    with open(path, "w") as fptr:
+        fptr.write("\n".join(lines) + "\n")
+
+    return times, natpops
+
+
+def test_read_natpop_ascii(tmp_path):
+    times, natpops = create_natpop_file(tmp_path / "natpop")
+
+    times_, natpops_ = natpop.read_natpop_ascii(tmp_path / "natpop")
+    assert numpy.array_equal(times, times_)
+    assert sorted(natpops_.keys()) == [1, 2]
+    for node, dofs in natpops.items():
+        assert sorted(natpops_[node].keys()) == sorted(dofs.keys())
+        for dof, values in dofs.items():
+            assert natpops_[node][dof].shape == values.shape
+            assert numpy.allclose(values, natpops_[node][dof])
+
+
+def test_read_natpop_ascii_single_node(tmp_path):
+    times, natpops = create_natpop_file(tmp_path / "natpop")
+
+    times_, dofs = natpop.read_natpop_ascii(tmp_path / "natpop", node=2)
+    assert numpy.array_equal(times, times_)
+    assert sorted(dofs.keys()) == [1, 2]
+
+    times_, values = natpop.read_natpop_ascii(tmp_path / "natpop", node=2, dof=1)
+    assert numpy.array_equal(times, times_)
+    assert numpy.allclose(natpops[2][1], values)
+
+
+def test_read_natpop_ascii_grow(tmp_path, monkeypatch):
+    monkeypatch.setattr(natpop, "NATPOP_INITIAL_CAPACITY", 2)
+    times, natpops = create_natpop_file(tmp_path / "natpop", num_steps=9)
+
+    times_, values = natpop.read_natpop_ascii(tmp_path / "natpop", node=1, dof=1)
+    assert numpy.array_equal(times, times_)
+    assert numpy.allclose(natpops[1][1], values)
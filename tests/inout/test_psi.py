@@ -0,0 +1,154 @@
+import numpy
+import pytest
+
+from mlxtk.inout import psi
+
+
+def create_psi_file(path, num_frames: int = 7, num_coefficients: int = 13):
+    rng = numpy.random.default_rng(42)
+    tape = numpy.array([-10, 2, 0, 3, -1, 1, 1, 0, 64, -2], dtype=numpy.int64)
+    times = numpy.linspace(0.0, 3.0, num_frames)
+    psis = rng.normal(size=(num_frames, num_coefficients)) + 1j * rng.normal(
+        size=(num_frames, num_coefficients),
+    )
+    psi.write_psi_ascii(path, (tape, times, psis))
+    return tape, times, psis
+
+
+def test_read_psi_ascii(tmp_path):
+    tape, times, psis = create_psi_file(tmp_path / "psi")
+
+    tape_, times_, psis_ = psi.read_psi_ascii(tmp_path / "psi")
+    assert numpy.array_equal(tape, tape_)
+    assert numpy.array_equal(times, times_)
+    assert numpy.array_equal(psis, psis_)
+    assert psi.get_psi_index_path(tmp_path / "psi").exists()
+
+    # second read uses the stored index
+    assert numpy.array_equal(psis, psi.read_psi_ascii(tmp_path / "psi")[2])
+
+
+def test_psi_file_frames(tmp_path):
+    _, times, psis = create_psi_file(tmp_path / "psi")
+
+    with psi.PsiFile(tmp_path / "psi") as psi_file:
+        assert len(psi_file) == len(times)
+        assert numpy.array_equal(psi_file.read_frame(3), psis[3])
+        assert numpy.array_equal(psi_file.read_frame(-1), psis[-1])
+        for i, (time, frame) in enumerate(psi_file.iter_frames(1, None, 2)):
+            assert time == times[1 + 2 * i]
+            assert numpy.array_equal(frame, psis[1 + 2 * i])
+
+        psi_file.write_frames(tmp_path / "thin", [0, 4])
+
+    _, times_, psis_ = psi.read_psi_ascii(tmp_path / "thin")
+    assert numpy.array_equal(times_, times[[0, 4]])
+    assert numpy.array_equal(psis_, psis[[0, 4]])
+
+
+def test_psi_file_growing(tmp_path):
+    _, times, psis = create_psi_file(tmp_path / "psi")
+    with psi.PsiFile(tmp_path / "psi") as psi_file:
+        assert len(psi_file) == len(times)
+
+    with open(tmp_path / "psi", "a") as fptr:
+        fptr.write("\n$time\n\t4.0  [au]\n$psi\n")
+        fptr.writelines(f" ({e.real},{e.imag})\n" for e in psis[0])
+
+    with psi.PsiFile(tmp_path / "psi") as psi_file:
+        assert len(psi_file) == len(times) + 1
+        assert psi_file.get_time(-1) == 4.0
+        assert numpy.array_equal(psi_file.read_frame(-1), psis[0])
+
+
+def test_convert_psi_ascii_to_hdf5(tmp_path):
+    tape, times, psis = create_psi_file(tmp_path / "psi")
+
+    psi.convert_psi_ascii_to_hdf5(tmp_path / "psi", tmp_path / "psi.h5", "lzf")
+    tape_, times_, psis_ = psi.read_psi_hdf5(tmp_path / "psi.h5")
+    assert numpy.array_equal(tape, tape_)
+    assert numpy.array_equal(times, times_)
+    assert numpy.array_equal(psis, psis_)
+
+    # only new frames are appended
+    with open(tmp_path / "psi", "a") as fptr:
+        fptr.write("\n$time\n\t4.0  [au]\n$psi\n")
+        fptr.writelines(f" ({e.real},{e.imag})\n" for e in psis[0])
+    psi.convert_psi_ascii_to_hdf5(tmp_path / "psi", tmp_path / "psi.h5")
+
+    _, time, frame = psi.read_psi_frame_hdf5(tmp_path / "psi.h5", -1)
+    assert time == 4.0
+    assert numpy.array_equal(frame, psis[0])
+
+    _, times_, psis_ = psi.read_psi_hdf5_time_range(tmp_path / "psi.h5", 1.0, 2.0)
+    mask = (times >= 1.0) & (times <= 2.0)
+    assert numpy.array_equal(times_, times[mask])
+    assert numpy.array_equal(psis_, psis[mask])
+
+
+def test_psi_file_rewritten(tmp_path):
+    create_psi_file(tmp_path / "psi", num_frames=5)
+    psi.read_psi_ascii(tmp_path / "psi")
+
+    # a rerun writes a longer file with different frames
+    rng = numpy.random.default_rng(7)
+    tape = numpy.array([-10, 2, 0, 3, -1, 1, 1, 0, 64, -2], dtype=numpy.int64)
+    times = numpy.linspace(0.0, 7.0, 8)
+    psis = rng.normal(size=(8, 13)) + 1j * rng.normal(size=(8, 13))
+    psi.write_psi_ascii(tmp_path / "psi", (tape, times, psis))
+
+    _, times_, psis_ = psi.read_psi_ascii(tmp_path / "psi")
+    assert numpy.array_equal(times_, times)
+    assert numpy.array_equal(psis_, psis)
+
+
+def test_convert_psi_ascii_to_hdf5_rewritten(tmp_path):
+    create_psi_file(tmp_path / "psi", num_frames=5)
+    psi.convert_psi_ascii_to_hdf5(tmp_path / "psi", tmp_path / "psi.h5")
+
+    # frames of an earlier run must not be mixed with the new ones
+    tape, times, psis = create_psi_file(tmp_path / "psi", num_frames=8)
+    psi.convert_psi_ascii_to_hdf5(tmp_path / "psi", tmp_path / "psi.h5")
+
+    tape_, times_, psis_ = psi.read_psi_hdf5(tmp_path / "psi.h5")
+    assert numpy.array_equal(tape, tape_)
+    assert numpy.array_equal(times, times_)
+    assert numpy.array_equal(psis, psis_)
+
+
+def test_psi_file_truncated(tmp_path):
+    _, times, psis = create_psi_file(tmp_path / "psi", num_coefficients=6)
+    with open(tmp_path / "psi", "rb") as fptr:
+        data = fptr.read()
+    last_frame = data.rindex(b"$psi\n") + len(b"$psi\n")
+
+    for cut in (last_frame, last_frame + 7, last_frame + 30, len(data) - 3):
+        with open(tmp_path / "psi", "wb") as fptr:
+            fptr.write(data[:cut])
+
+        with psi.PsiFile(tmp_path / "psi") as psi_file:
+            assert len(psi_file) == len(times) - 1
+            assert numpy.array_equal(psi_file.read_frame(-1), psis[-2])
+
+        # the frame is indexed once it is complete
+        with open(tmp_path / "psi", "ab") as fptr:
+            fptr.write(data[cut:])
+        with psi.PsiFile(tmp_path / "psi") as psi_file:
+            assert len(psi_file) == len(times)
+            assert numpy.array_equal(psi_file.read_frame(-1), psis[-1])
+
+
+def test_psi_file_malformed_frame(tmp_path):
+    create_psi_file(tmp_path / "psi", num_frames=3, num_coefficients=6)
+    with open(tmp_path / "psi") as fptr:
+        lines = fptr.readlines()
+    # remove a coefficient of the second frame
+    del lines[lines.index("$psi\n", lines.index("$psi\n") + 1) + 1]
+    with open(tmp_path / "psi", "w") as fptr:
+        fptr.writelines(lines)
+
+    with psi.PsiFile(tmp_path / "psi") as psi_file:
+        assert len(psi_file) == 3
+        psi_file.read_frame(2)
+        with pytest.raises(RuntimeError, match="Frame 1 .* expected 6"):
+            psi_file.read_frame(1)
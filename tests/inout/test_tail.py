@@ -0,0 +1,140 @@
+import time
+
+import h5py
+import numpy
+import pytest
+
+from mlxtk.inout import gpop, natpop, output
+from mlxtk.inout.tail import (
+    AsciiTailer,
+    GpopTailer,
+    LiveIngestion,
+    NatpopTailer,
+    OutputTailer,
+)
+
+from .test_gpop import create_gpop_file
+from .test_natpop import create_natpop_file
+
+
+def split_file(path, fraction: float):
+    with open(path, "rb") as fptr:
+        data = fptr.read()
+    position = int(len(data) * fraction)
+    with open(path, "wb") as fptr:
+        fptr.write(data[:position])
+    return data[position:]
+
+
+def append_file(path, data: bytes):
+    with open(path, "ab") as fptr:
+        fptr.write(data)
+
+
+def create_output_file(path, num_steps: int = 9):
+    rng = numpy.random.default_rng(42)
+    data = numpy.c_[
+        numpy.linspace(0.0, 1.0, num_steps),
+        rng.uniform(size=(num_steps, 3)),
+    ]
+    with open(path, "w") as fptr:
+        for row in data:
+            fptr.write("  ".join(repr(float(x)) for x in row) + "\n")
+    return data
+
+
+def test_live_ingestion(tmp_path):
+    times, grids, densities = create_gpop_file(tmp_path / "gpop", 8)
+    times_natpop, natpops = create_natpop_file(tmp_path / "natpop", 8)
+    data_output = create_output_file(tmp_path / "output", 8)
+
+    rest = {
+        name: split_file(tmp_path / name, 0.6) for name in ("gpop", "natpop", "output")
+    }
+
+    ingestion = LiveIngestion(
+        tmp_path / "result.h5",
+        [
+            GpopTailer(tmp_path / "gpop"),
+            NatpopTailer(tmp_path / "natpop"),
+            OutputTailer(tmp_path / "output"),
+        ],
+        interval=1000.0,
+    )
+    with ingestion:
+        assert ingestion.update() > 0
+        with h5py.File(tmp_path / "result.h5", "r") as fptr:
+            num_gpop = fptr["gpop/time"].shape[0]
+            assert 0 < num_gpop < 8
+            assert fptr["natpop/time"].shape[0] < 8
+            assert fptr["output/time"].shape[0] < 8
+
+        # incomplete records are kept until they are complete
+        assert ingestion.update() == 0
+
+        for name, data in rest.items():
+            append_file(tmp_path / name, data)
+
+    with h5py.File(tmp_path / "result.h5", "r") as fptr:
+        result = gpop.read_gpop_hdf5(tmp_path / "result.h5", "gpop")
+        assert numpy.array_equal(result[0], times)
+        for dof in grids:
+            assert numpy.array_equal(result[1][dof], grids[dof])
+            assert numpy.array_equal(result[2][dof], densities[dof])
+
+        assert numpy.array_equal(fptr["natpop/time"][()], times_natpop)
+        for node in natpops:
+            for dof in natpops[node]:
+                assert numpy.allclose(
+                    fptr[f"natpop/node_{node}/dof_{dof}"][()],
+                    natpops[node][dof],
+                )
+
+    result = output.read_output_hdf5(tmp_path / "result.h5", "output")
+    for i in range(4):
+        assert numpy.array_equal(result[i], data_output[:, i])
+
+    # continuation run that restarts from an earlier time
+    _, natpops = create_natpop_file(tmp_path / "natpop", 8)
+    with open(tmp_path / "natpop", "rb") as fptr:
+        data = fptr.read()
+    with open(tmp_path / "natpop", "wb") as fptr:
+        fptr.write(data[len(data) // 2 :][data[len(data) // 2 :].index(b"#") :])
+    append_file(tmp_path / "output", b"  2.0  1.0  -3.0  0.5\n")
+
+    assert ingestion.update(final=True) == 1
+    result = output.read_output_hdf5(tmp_path / "result.h5", "output")
+    assert result[0].tolist() == data_output[:, 0].tolist() + [2.0]
+    _, natpops_ = natpop.read_natpop_hdf5(tmp_path / "result.h5", "natpop", 1, 1)
+    assert natpops_.shape == (8, 2)
+
+
+class FlakyOutputTailer(OutputTailer):
+    def __init__(self, path):
+        super().__init__(path)
+        self.failures = 1
+
+    def ingest(self, group, data: bytes) -> int:
+        if self.failures:
+            self.failures -= 1
+            raise ValueError("could not convert string to float")
+        return super().ingest(group, data)
+
+
+def test_live_ingestion_keeps_going(tmp_path):
+    with pytest.raises(TypeError):
+        AsciiTailer(tmp_path / "output", "output")
+
+    data_output = create_output_file(tmp_path / "output", 4)
+    tailer = FlakyOutputTailer(tmp_path / "output")
+    with LiveIngestion(tmp_path / "result.h5", [tailer], interval=0.01) as ingestion:
+        for _ in range(500):
+            if not tailer.failures:
+                break
+            time.sleep(0.01)
+        time.sleep(0.1)
+        assert not tailer.failures
+        assert ingestion.thread.is_alive()
+
+    result = output.read_output_hdf5(tmp_path / "result.h5", "output")
+    assert numpy.array_equal(result[0], data_output[:, 0])
@@ -0,0 +1,119 @@
+import os
+import stat
+
+import h5py
+import numpy
+import pytest
+
+from mlxtk import cache, hashing
+from mlxtk.cwd import WorkingDir
+from mlxtk.tasks.expval import ComputeExpectationValues
+
+# fake qdtk_expect.x writing the value stored in the operator file for 3 times
+QDTK_EXPECT = """#!/bin/sh
+echo "$2" >> "{log}"
+value=$(cat "$2")
+printf "0.0 %s 0.0\\n1.0 %s 0.0\\n2.0 %s 0.0\\n" "$value" "$value" "$value" > "${{8}}"
+"""
+
+
+@pytest.fixture
+def qdtk_expect(tmp_path, monkeypatch):
+    path_bin = tmp_path / "bin"
+    path_bin.mkdir()
+    path_log = tmp_path / "calls.log"
+    path_exe = path_bin / "qdtk_expect.x"
+    with open(path_exe, "w") as fptr:
+        fptr.write(QDTK_EXPECT.format(log=path_log))
+    path_exe.chmod(path_exe.stat().st_mode | stat.S_IXUSR)
+
+    monkeypatch.setenv("PATH", str(path_bin) + os.pathsep + os.environ["PATH"])
+    monkeypatch.delenv(cache.ENV_CACHE_PATH, raising=False)
+    monkeypatch.setattr(hashing, "_FILE_HASH_CACHE", hashing.FileHashCache(None))
+
+    def count_calls() -> int:
+        if not path_log.exists():
+            return 0
+        with open(path_log) as fptr:
+            return len(fptr.readlines())
+
+    return count_calls
+
+
+def write_file(path, contents: str):
+    with open(path, "w") as fptr:
+        fptr.write(contents)
+
+
+def create_inputs(path):
+    path.mkdir()
+    write_file(path / "psi", "psi")
+    write_file(path / "final.wfn", "wfn")
+    for i in range(3):
+        write_file(path / f"op{i}.opr", f"{i + 1}.5")
+
+
+def touch_later(path):
+    mtime = path.stat().st_mtime + 10.0
+    os.utime(path, (mtime, mtime))
+
+
+def test_compute_expectation_values(tmp_path, qdtk_expect):
+    sim = tmp_path / "sim"
+    create_inputs(sim)
+
+    with WorkingDir(sim):
+        task = ComputeExpectationValues(
+            "psi",
+            [f"op{i}.opr" for i in range(3)],
+            workers=2,
+        )
+        assert task.expvals[1].name == "op1.exp.h5"
+        spec = task.task_compute()
+        assert "final.wfn" in spec["file_dep"]
+        action = spec["actions"][0]
+
+        action([])
+        assert qdtk_expect() == 3
+
+        with h5py.File("expvals.h5", "r") as fptr:
+            assert sorted(fptr.keys()) == ["op0", "op1", "op2"]
+            for i in range(3):
+                assert numpy.allclose(fptr[f"op{i}"]["time"][:], [0.0, 1.0, 2.0])
+                assert numpy.allclose(fptr[f"op{i}"]["real"][:], i + 1.5)
+                assert numpy.allclose(fptr[f"op{i}"]["imag"][:], 0.0)
+
+        # nothing changed
+        action([])
+        assert qdtk_expect() == 3
+
+        # only the changed operator is recomputed
+        write_file("op1.opr", "7.0")
+        touch_later(sim / "op1.opr")
+        action([])
+        assert qdtk_expect() == 4
+        with h5py.File("expvals.h5", "r") as fptr:
+            assert numpy.allclose(fptr["op0"]["real"][:], 1.5)
+            assert numpy.allclose(fptr["op1"]["real"][:], 7.0)
+
+        # a new wave function invalidates all results
+        touch_later(sim / "final.wfn")
+        assert all(task.is_outdated(i) for i in range(3))
+        action([])
+        assert qdtk_expect() == 7
+
+
+def test_compute_expectation_values_cache(tmp_path, qdtk_expect, monkeypatch):
+    monkeypatch.setenv(cache.ENV_CACHE_PATH, str(tmp_path / "cache"))
+
+    for name in ("sim1", "sim2"):
+        sim = tmp_path / name
+        create_inputs(sim)
+        with WorkingDir(sim):
+            task = ComputeExpectationValues("psi", [f"op{i}.opr" for i in range(3)])
+            task.task_compute()["actions"][0]([])
+            with h5py.File("expvals.h5", "r") as fptr:
+                assert numpy.allclose(fptr["op2"]["real"][:], 3.5)
+
+    # the second simulation uses the cached results
+    assert qdtk_expect() == 3
@@ -0,0 +1,111 @@
+import os
+import stat
+
+import pytest
+
+from mlxtk import cache, hashing
+
+
+@pytest.fixture(autouse=True)
+def file_hash_cache(monkeypatch):
+    monkeypatch.setattr(hashing, "_FILE_HASH_CACHE", hashing.FileHashCache(None))
+
+
+def write_file(path, contents: str):
+    with open(path, "w") as fptr:
+        fptr.write(contents)
+
+
+def test_compute_cache_key(tmp_path):
+    write_file(tmp_path / "a", "operator")
+    write_file(tmp_path / "b", "operator")
+    write_file(tmp_path / "c", "wave function")
+
+    key = cache.compute_cache_key("propagate", [tmp_path / "a"], {"dt": 0.1})
+    assert key == cache.compute_cache_key("propagate", [tmp_path / "b"], {"dt": 0.1})
+    assert key != cache.compute_cache_key("propagate", [tmp_path / "c"], {"dt": 0.1})
+    assert key != cache.compute_cache_key("propagate", [tmp_path / "a"], {"dt": 0.2})
+    assert key != cache.compute_cache_key("expval", [tmp_path / "a"], {"dt": 0.1})
+
+
+def test_lookup_store(tmp_path):
+    store = cache.ArtifactCache(tmp_path / "cache")
+    write_file(tmp_path / "final.wfn", "wfn")
+    write_file(tmp_path / "propagate.h5", "h5")
+    files = {"final.wfn": tmp_path / "final.wfn", "propagate.h5": tmp_path / "propagate.h5"}
+
+    assert not store.lookup("abc", files)
+    store.store("abc", "propagate", files)
+
+    destination = tmp_path / "other"
+    assert store.lookup(
+        "abc",
+        {
+            "final.wfn": destination / "final.wfn",
+            "propagate.h5": destination / "propagate.h5",
+        },
+    )
+    with open(destination / "final.wfn") as fptr:
+        assert fptr.read() == "wfn"
+    with open(destination / "propagate.h5") as fptr:
+        assert fptr.read() == "h5"
+    entry = store.get_entry_path("abc") / "final.wfn"
+    assert not os.path.samefile(destination / "final.wfn", entry)
+    assert os.stat(destination / "final.wfn").st_mode & stat.S_IWUSR
+
+    with open(destination / "final.wfn", "w") as fptr:
+        fptr.write("modified")
+    with open(entry) as fptr:
+        assert fptr.read() == "wfn"
+
+    stats = store.stats()
+    assert stats["entries"] == 1
+    assert stats["size"] == 5
+    assert stats["hits"] == 1
+    assert stats["kinds"] == {"propagate": (1, 5)}
+
+
+def test_store_keeps_outputs_writable(tmp_path):
+    store = cache.ArtifactCache(tmp_path / "cache")
+    write_file(tmp_path / "final.wfn", "wfn")
+    os.chmod(tmp_path / "final.wfn", 0o644)
+    store.store("abc", "propagate", {"final.wfn": tmp_path / "final.wfn"})
+
+    entry = store.get_entry_path("abc") / "final.wfn"
+    assert not os.path.samefile(tmp_path / "final.wfn", entry)
+    assert stat.S_IMODE(os.stat(tmp_path / "final.wfn").st_mode) == 0o644
+    assert not os.stat(entry).st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+
+    with open(tmp_path / "final.wfn", "w") as fptr:
+        fptr.write("modified")
+    with open(entry) as fptr:
+        assert fptr.read() == "wfn"
+
+
+def test_gc(tmp_path):
+    store = cache.ArtifactCache(tmp_path / "cache")
+    for i in range(4):
+        write_file(tmp_path / f"file{i}", 10 * "x")
+        store.store(f"key{i}", "test", {"result": tmp_path / f"file{i}"})
+
+    # mark the oldest entry as recently used
+    assert store.lookup("key0", {"result": tmp_path / "result"})
+
+    assert store.gc(25) == 2
+    assert store.stats()["entries"] == 2
+    assert store.lookup("key0", {"result": tmp_path / "result"})
+    assert not store.lookup("key1", {"result": tmp_path / "result"})
+    assert not store.lookup("key2", {"result": tmp_path / "result"})
+    assert store.lookup("key3", {"result": tmp_path / "result"})
+
+    store.clear()
+    assert store.stats()["entries"] == 0
+
+
+def test_store_max_size(tmp_path):
+    store = cache.ArtifactCache(tmp_path / "cache", max_size=15)
+    for i in range(3):
+        write_file(tmp_path / f"file{i}", 10 * "x")
+        store.store(f"key{i}", "test", {"result": tmp_path / f"file{i}"})
+    assert store.stats()["entries"] == 1
+    assert store.lookup("key2", {"result": tmp_path / "result"})
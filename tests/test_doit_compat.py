@@ -0,0 +1,126 @@
+import json
+import sqlite3
+import subprocess
+import sys
+
+import numpy
+import pytest
+
+from mlxtk.doit_compat import (
+    DoitAction,
+    format_doit_profile,
+    load_doit_profile,
+    load_doit_resources,
+    load_doit_timings,
+    run_process,
+)
+
+CHILD = """
+import sys
+import time
+data = bytearray(64 << 20)
+with open(sys.argv[1], "wb") as fptr:
+    fptr.write(data[: 4 << 20])
+# give the parent the chance to sample the peak memory
+time.sleep(0.5)
+"""
+
+
+def test_run_process(tmp_path):
+    result = run_process([sys.executable, "-c", "import sys; sys.exit(3)"])
+    assert result.returncode == 3
+
+    with pytest.raises(subprocess.CalledProcessError):
+        run_process([sys.executable, "-c", "import sys; sys.exit(1)"], check=True)
+
+    assert run_process(["true"], cwd=tmp_path).returncode == 0
+
+
+def test_action_resources(tmp_path):
+    def action_child(targets):
+        run_process([sys.executable, "-c", CHILD, targets[0]], check=True)
+
+    values = DoitAction(action_child)([str(tmp_path / "out.bin")])["action_child"]
+    assert values["children"] == 1
+    assert values["children_user_time"] + values["children_system_time"] > 0.0
+    assert values["children_max_rss"] >= 64 << 20
+    if sys.platform.startswith("linux"):
+        assert values["children_write_chars"] >= 4 << 20
+        assert values["children_max_vm"] >= values["children_max_rss"]
+
+    def action_false(targets):
+        del targets
+        return False
+
+    assert DoitAction(action_false)([]) is False
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"),
+    reason="requires /proc",
+)
+def test_action_resources_large_parent():
+    # the peak memory of the parent must not be attributed to the child
+    data = numpy.ones(100 << 20)
+
+    def action_true(targets):
+        del targets
+        run_process(["true"], check=True)
+
+    values = DoitAction(action_true)([])["action_true"]
+    assert data.sum() == 100 << 20
+    assert values["children"] == 1
+    assert (values["children_max_rss"] is None) or (
+        values["children_max_rss"] < 100 << 20
+    )
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite3"])
+def test_load_profile(tmp_path, backend):
+    values = {
+        "monotonic_time": 2.0,
+        "perf_time": 2.0,
+        "process_time": 0.1,
+        "children": 1,
+        "children_user_time": 1.5,
+        "children_system_time": 0.25,
+        "children_max_rss": 3 << 20,
+        "children_read_bytes": 1024,
+        "children_write_bytes": 0,
+    }
+    data = {
+        "propagate": {"_values_:": {"action_run": values}},
+        "old": {"_values_:": {"action_old": {"monotonic_time": 1.0}}},
+        "plain": {"_values_:": {"checksum": "abc"}},
+    }
+
+    path = tmp_path / "doit.db"
+    if backend == "json":
+        with open(path, "w") as fptr:
+            json.dump(data, fptr)
+    else:
+        db = sqlite3.connect(path)
+        db.execute("CREATE TABLE doit (task_id TEXT PRIMARY KEY, task_data TEXT)")
+        for name, task_data in data.items():
+            db.execute("INSERT INTO doit VALUES (?, ?)", (name, json.dumps(task_data)))
+        db.commit()
+        db.close()
+
+    assert load_doit_profile(path)["propagate"]["action_run"] == values
+    timings = load_doit_timings(path)
+    assert timings == {
+        "propagate": {"action_run": 2.0},
+        "old": {"action_old": 1.0},
+        "plain": {},
+    }
+
+    resources = load_doit_resources(path)
+    assert resources["old"]["action_old"]["children_max_rss"] is None
+
+    table = format_doit_profile(timings, tablefmt="plain", resources=resources)
+    lines = table.splitlines()
+    assert "Peak RSS" in lines[0]
+    assert lines[1].split()[:4] == ["propagate", "action_run", "2", "1.75"]
+    assert "3.0 MiB" in lines[1]
+    assert "-" in lines[2].split()
+    assert "Peak RSS" not in format_doit_profile(timings)
@@ -0,0 +1,118 @@
+import os
+
+import h5py
+import numpy
+
+from mlxtk import executor
+from mlxtk.executor import AnalysisExecutor, close_hdf5_files, open_hdf5
+from mlxtk.parameter_selection import ParameterSelection
+from mlxtk.parameters import Parameters
+
+
+def test_map_reuses_pool():
+    with AnalysisExecutor(2, chunksize=3) as pool:
+        assert pool.map(lambda x: x ** 2, range(20), progress=False) == [
+            x ** 2 for x in range(20)
+        ]
+        first = pool.pool
+        pids = pool.map(lambda _: os.getpid(), range(20), progress=False)
+        assert pool.pool is first
+        assert os.getpid() not in pids
+
+        results = dict(pool.imap_unordered(lambda x: -x, range(10)))
+        assert results == {i: -i for i in range(10)}
+
+    assert pool.pool is None
+
+
+def test_serial():
+    with AnalysisExecutor(1) as pool:
+        assert pool.map(lambda _: os.getpid(), range(3), progress=False) == [
+            os.getpid()
+        ] * 3
+        assert pool.pool is None
+
+
+def test_open_hdf5(tmp_path, monkeypatch):
+    monkeypatch.setattr(executor, "_MAX_OPEN_FILES", 2)
+    paths = []
+    for i in range(3):
+        paths.append(tmp_path / f"{i}.h5")
+        with h5py.File(paths[-1], "w") as fptr:
+            fptr.create_dataset("x", data=numpy.arange(i + 1))
+
+    try:
+        fptr = open_hdf5(paths[0])
+        assert open_hdf5(paths[0]) is fptr
+        assert fptr["x"][()].tolist() == [0]
+
+        # least recently used file is closed
+        open_hdf5(paths[1])
+        open_hdf5(paths[2])
+        assert not fptr.id.valid
+        assert len(executor._HDF5_FILES) == 2
+
+        # modified files are reopened
+        fptr = open_hdf5(paths[2])
+        fptr.close()
+        with h5py.File(paths[2], "w") as fptr:
+            fptr.create_dataset("x", data=numpy.arange(10))
+        assert open_hdf5(paths[2])["x"].shape == (10,)
+    finally:
+        close_hdf5_files()
+
+    assert not executor._HDF5_FILES
+
+
+def test_shutdown_closes_worker_files(tmp_path, monkeypatch):
+    path = tmp_path / "data.h5"
+    with h5py.File(path, "w") as fptr:
+        fptr.create_dataset("x", data=numpy.arange(3))
+
+    close = executor.close_hdf5_files
+
+    def record_close():
+        with open(tmp_path / f"closed_{os.getpid()}", "w") as fptr:
+            fptr.write(str(len(executor._HDF5_FILES)))
+        close()
+
+    # the workers are forked and inherit the patched function
+    monkeypatch.setattr(executor, "close_hdf5_files", record_close)
+
+    def read(_):
+        return os.getpid(), open_hdf5(path)["x"][()].sum()
+
+    with AnalysisExecutor(2, chunksize=1) as pool:
+        results = pool.map(read, range(8), progress=False)
+        assert all(value == 3 for _, value in results)
+
+    for pid in {pid for pid, _ in results}:
+        with open(tmp_path / f"closed_{pid}") as fptr:
+            assert fptr.read() == "1"
+
+
+def test_foreach(tmp_path):
+    selection = ParameterSelection(
+        [Parameters([("x", x, "")]) for x in range(6)],
+        tmp_path,
+    ).select_parameter("x", [1, 3, 5])
+
+    def func(index, path, parameters):
+        return index, os.path.basename(path), parameters.x * 2, os.getcwd()
+
+    with AnalysisExecutor(2) as pool:
+        results = selection.foreach(func, executor=pool)
+        assert [result[:3] for result in results] == [
+            (1, "1", 2),
+            (3, "3", 6),
+            (5, "5", 10),
+        ]
+        assert all(result[3] == os.getcwd() for result in results)
+
+        assert dict(selection.iforeach(lambda i, path, p: p.x, executor=pool)) == {
+            1: 1,
+            3: 3,
+            5: 5,
+        }
+
+    assert selection.foreach(func, parallel=False) == results
@@ -0,0 +1,80 @@
+import shutil
+import subprocess
+
+import numpy
+import pytest
+
+from mlxtk import hashing
+
+
+@pytest.fixture
+def file_hash_cache(tmp_path, monkeypatch):
+    cache = hashing.FileHashCache(tmp_path / "hashes.sqlite")
+    monkeypatch.setattr(hashing, "_FILE_HASH_CACHE", cache)
+    return cache
+
+
+@pytest.mark.parametrize("program", ["sha1sum", "sha256sum", "md5sum"])
+def test_hash_string(program):
+    if shutil.which(program) is None:
+        pytest.skip(f"{program} not available")
+
+    data = repr({"N": 4, "g": 0.1, "m": 5})
+    expected = (
+        subprocess.check_output([program], input=data.encode()).decode().split()[0]
+    )
+    assert hashing.hash_string(data, program) == expected
+
+
+@pytest.mark.parametrize("program", ["sha1sum", "sha256sum"])
+def test_hash_file(tmp_path, file_hash_cache, program):
+    if shutil.which(program) is None:
+        pytest.skip(f"{program} not available")
+    del file_hash_cache
+
+    path = tmp_path / "restart"
+    path.write_bytes(numpy.random.default_rng(1).bytes(3 * 1024 * 1024 + 17))
+    expected = subprocess.check_output([program, str(path)]).decode().split()[0]
+    assert hashing.hash_file(path, program) == expected
+
+
+def test_inaccurate_hash():
+    if shutil.which("sha256sum") is None:
+        pytest.skip("sha256sum not available")
+
+    x = numpy.linspace(0.0, 1.0, 11)
+    expected = (
+        subprocess.check_output(["sha256sum"], input=x.round(10).tobytes("C"))
+        .decode()
+        .split()[0]
+    )
+    assert hashing.inaccurate_hash(x) == expected
+    assert hashing.inaccurate_hash(x + 1e-13) == expected
+
+
+def test_hash_file_memo(tmp_path, file_hash_cache, monkeypatch):
+    path = tmp_path / "psi"
+    path.write_text("first")
+    digest = hashing.hash_file(path)
+
+    calls = []
+
+    def hash_contents(path, program):
+        calls.append(path)
+        return "memo-miss"
+
+    monkeypatch.setattr(hashing, "_hash_file_contents", hash_contents)
+    assert hashing.hash_file(path) == digest
+
+    # the persistent database is used by a new process
+    monkeypatch.setattr(
+        hashing,
+        "_FILE_HASH_CACHE",
+        hashing.FileHashCache(file_hash_cache.path),
+    )
+    assert hashing.hash_file(path) == digest
+    assert not calls
+
+    path.write_text("second")
+    assert hashing.hash_file(path) == "memo-miss"
+    assert len(calls) == 1
@@ -0,0 +1,100 @@
+import fcntl
+import json
+import os
+import platform
+import signal
+import subprocess
+import threading
+
+import pytest
+
+from mlxtk.lock import FileLock, FileLockTimeoutError
+
+
+def test_exclusive(tmp_path):
+    path = tmp_path / "test.lock"
+    with FileLock(path):
+        with open(path) as fptr:
+            assert json.load(fptr) == {"host": platform.node(), "pid": os.getpid()}
+
+        with pytest.raises(FileLockTimeoutError):
+            FileLock(path, timeout=0.1).acquire()
+        with pytest.raises(FileLockTimeoutError):
+            FileLock(path, shared=True, timeout=0.1).acquire()
+
+    assert path.read_text() == ""
+    with FileLock(path, timeout=0.1):
+        pass
+
+
+def test_shared(tmp_path):
+    path = tmp_path / "test.lock"
+    with FileLock(path, shared=True), FileLock(path, shared=True, timeout=0.1):
+        with pytest.raises(FileLockTimeoutError):
+            FileLock(path, timeout=0.1).acquire()
+
+
+def test_wait_in_thread(tmp_path):
+    path = tmp_path / "test.lock"
+    lock = FileLock(path)
+    lock.acquire()
+
+    acquired = threading.Event()
+
+    def wait():
+        with FileLock(path, timeout=10.0):
+            acquired.set()
+
+    thread = threading.Thread(target=wait)
+    thread.start()
+    assert not acquired.wait(0.2)
+    lock.release()
+    thread.join()
+    assert acquired.is_set()
+
+
+def test_dead_holder(tmp_path, caplog):
+    path = tmp_path / "test.lock"
+
+    # simulate a lock that is still held through a file descriptor inherited
+    # from a process that does not exist anymore
+    dead = subprocess.Popen(["true"])
+    dead.wait()
+
+    fd = os.open(path, os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    os.write(fd, json.dumps({"host": platform.node(), "pid": dead.pid}).encode())
+
+    try:
+        with pytest.raises(FileLockTimeoutError):
+            FileLock(path, timeout=0.5, check_interval=0.1).acquire()
+        assert path.exists()
+        assert f"process {dead.pid} which is not running" in caplog.text
+    finally:
+        os.close(fd)
+
+
+def test_restore_timer(tmp_path):
+    path = tmp_path / "test.lock"
+    fired = threading.Event()
+    previous_handler = signal.signal(signal.SIGALRM, lambda *_: fired.set())
+    signal.setitimer(signal.ITIMER_REAL, 10.0)
+
+    try:
+        with FileLock(path):
+            with pytest.raises(FileLockTimeoutError):
+                FileLock(path, timeout=0.2).acquire()
+
+        delay, _ = signal.getitimer(signal.ITIMER_REAL)
+        assert 9.0 < delay < 10.0
+        assert not fired.is_set()
+
+        # a timer that expires while waiting interrupts the wait and still fires
+        signal.setitimer(signal.ITIMER_REAL, 0.1)
+        with FileLock(path):
+            with pytest.raises(FileLockTimeoutError):
+                FileLock(path, timeout=0.5, check_interval=0.5).acquire()
+        assert fired.is_set()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0.0)
+        signal.signal(signal.SIGALRM, previous_handler)
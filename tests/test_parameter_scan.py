@@ -0,0 +1,129 @@
+import json
+import os
+import pickle
+import shutil
+
+from mlxtk.parameter_scan import ParameterScan
+from mlxtk.parameter_selection import load_scan
+from mlxtk.parameters import Parameters
+from mlxtk.scan_index import ScanIndex
+from mlxtk.simulation import Simulation
+
+
+def create_combinations(values):
+    combinations = []
+    for value in values:
+        parameters = Parameters([("N", 2, "number of particles"), ("g", value, "")])
+        combinations.append(parameters)
+    return combinations
+
+
+def create_scan(tmp_path, values) -> ParameterScan:
+    return ParameterScan(
+        "scan",
+        lambda p: Simulation("test"),
+        create_combinations(values),
+        tmp_path / "scan",
+    )
+
+
+def create_working_dirs(scan: ParameterScan):
+    for combination in scan.combinations:
+        scan.compute_working_dir(combination).mkdir(parents=True, exist_ok=True)
+
+
+def test_link_simulations(tmp_path, monkeypatch):
+    scan = create_scan(tmp_path, [0.1, 0.2, 0.3])
+    create_working_dirs(scan)
+    scan.link_simulations()
+
+    for index, combination in enumerate(scan.combinations):
+        expected = scan.compute_working_dir(combination).resolve()
+        assert (scan.working_dir / "by_index" / str(index)).resolve() == expected
+        assert (
+            scan.working_dir / "by_param" / f"g={combination.g}"
+        ).resolve() == expected
+        assert not os.path.isabs(
+            os.readlink(scan.working_dir / "by_index" / str(index)),
+        )
+
+    # unchanged scans are skipped using the manifest
+    def fail(*args, **kwargs):
+        raise AssertionError("unexpected symlink")
+
+    monkeypatch.setattr(os, "symlink", fail)
+    scan.link_simulations()
+    monkeypatch.undo()
+
+    # only changed links are updated
+    scan = create_scan(tmp_path, [0.1, 0.4])
+    create_working_dirs(scan)
+    created = []
+    symlink = os.symlink
+
+    def record(src, dst):
+        created.append(dst)
+        symlink(src, dst)
+
+    monkeypatch.setattr(os, "symlink", record)
+    scan.link_simulations()
+    assert sorted(os.path.basename(path) for path in created) == ["1", "g=0.4"]
+    assert sorted(os.listdir(scan.working_dir / "by_index")) == ["0", "1"]
+    assert sorted(os.listdir(scan.working_dir / "by_param")) == ["g=0.1", "g=0.4"]
+    assert (scan.working_dir / "by_index" / "1").resolve() == scan.compute_working_dir(
+        scan.combinations[1],
+    ).resolve()
+
+
+def test_unlink_simulations(tmp_path):
+    scan = create_scan(tmp_path, [0.1, 0.2])
+    create_working_dirs(scan)
+    scan.link_simulations()
+    scan.unlink_simulations()
+    assert not os.listdir(scan.working_dir / "by_index")
+    assert not os.listdir(scan.working_dir / "by_param")
+
+    scan.link_simulations()
+    assert sorted(os.listdir(scan.working_dir / "by_index")) == ["0", "1"]
+
+
+def test_store_parameters(tmp_path, monkeypatch):
+    written = []
+
+    def record(self):
+        written.append(repr(self))
+        return json.dumps({"values": {name: self[name] for name in self.names}})
+
+    monkeypatch.setattr(Parameters, "to_json", record)
+
+    scan = create_scan(tmp_path, [0.1, 0.2, 0.3])
+    scan.store_parameters()
+    assert len(written) == 3
+    for combination in scan.combinations:
+        path = scan.compute_working_dir(combination) / "parameters.pickle"
+        with open(path, "rb") as fptr:
+            assert pickle.load(fptr) == combination
+
+    selection = load_scan(scan.working_dir)
+    assert selection.get_parameters() == scan.combinations
+    with open(scan.working_dir / "scan.pickle", "rb") as fptr:
+        assert pickle.load(fptr) == scan.combinations
+
+    # nothing changed
+    written.clear()
+    scan.store_parameters()
+    assert not written
+
+    # only new parameters are written, removed ones are dropped from the index
+    scan = create_scan(tmp_path, [0.1, 0.4])
+    scan.store_parameters()
+    assert written == [repr(scan.combinations[1])]
+    assert load_scan(scan.working_dir).get_parameters() == scan.combinations
+    assert len(ScanIndex(scan.working_dir)) == 2
+    assert ScanIndex(scan.working_dir)[1] == scan.combinations[1]
+
+    # directories that were deleted are recreated
+    written.clear()
+    shutil.rmtree(scan.compute_working_dir(scan.combinations[0]))
+    scan.store_parameters()
+    assert written == [repr(scan.combinations[0])]
@@ -0,0 +1,89 @@
+import itertools
+
+import numpy
+import pytest
+
+from mlxtk.parameter_selection import ParameterSelection
+from mlxtk.parameters import Parameters
+
+
+def create_selection() -> ParameterSelection:
+    combinations = []
+    for N, g, name in itertools.product([2, 3], [0.1, 0.2, 0.3], ["a", "b"]):
+        combinations.append(
+            Parameters([("N", N, ""), ("g", g, ""), ("name", name, "")]),
+        )
+    return ParameterSelection(combinations, "/scan")
+
+
+def test_columns():
+    selection = create_selection()
+    assert selection.get_column("N").dtype == numpy.int64
+    assert selection.get_column("g").dtype == numpy.float64
+    assert selection.get_column("name").dtype == object
+    assert sorted(selection.get_values("g")) == [0.1, 0.2, 0.3]
+    assert sorted(selection.get_values("name")) == ["a", "b"]
+
+    variables, values = selection.get_variable_values()
+    assert variables == ["N", "g", "name"]
+    assert values["g"].tolist() == [0.1, 0.1, 0.2, 0.2, 0.3, 0.3] * 2
+
+
+def test_fix_and_select():
+    selection = create_selection()
+
+    fixed = selection.fix_parameter("g", 0.2)
+    assert [i for i, _ in fixed.parameters] == [2, 3, 8, 9]
+    assert all(p.g == 0.2 for _, p in fixed.parameters)
+
+    fixed = fixed.fix_parameter("name", "b")
+    assert [i for i, _ in fixed.parameters] == [3, 9]
+    assert fixed.get_paths()[1] == selection.path / "by_index" / "9"
+
+    assert not selection.fix_parameter("name", 1.0).parameters
+    assert not selection.fix_parameter("N", "a").parameters
+
+    selected = selection.select_parameter("g", [0.1, 0.3])
+    assert [i for i, _ in selected.parameters] == [0, 1, 4, 5, 6, 7, 10, 11]
+
+    selected = selection.select_parameters(["N", "name"], [[3], ["a"]])
+    assert [i for i, _ in selected.parameters] == [6, 8, 10]
+
+
+def test_group_and_partition():
+    selection = create_selection()
+
+    groups = selection.group_by("N")
+    assert sorted(groups) == [2, 3]
+    assert [i for i, _ in groups[3].parameters] == list(range(6, 12))
+
+    partitions = selection.partition("name")
+    assert [i for i, _ in partitions["a"].parameters] == [0, 2, 4, 6, 8, 10]
+    assert partitions["a"].parameters[0][1].names == ["N", "g"]
+    assert selection.parameters[0][1].names == ["N", "g", "name"]
+
+
+def test_get_path():
+    selection = create_selection()
+
+    parameters = Parameters([("N", 3, ""), ("g", 0.2, ""), ("name", "b", "")])
+    assert selection.get_path(parameters) == selection.path / "by_index" / "9"
+
+    parameters.g = numpy.float64(0.2)
+    parameters.N = numpy.int64(3)
+    assert selection.get_path(parameters) == selection.path / "by_index" / "9"
+
+    # additional parameters are ignored
+    parameters.add_parameter("tfinal", 10.0)
+    assert selection.get_path(parameters) == selection.path / "by_index" / "9"
+
+    # a subset of the parameters selects the first match
+    parameters = Parameters([("g", 0.3, "")])
+    assert selection.get_path(parameters) == selection.path / "by_index" / "4"
+
+    subset = selection.fix_parameter("N", 3)
+    assert subset.get_path(parameters) == selection.path / "by_index" / "10"
+
+    parameters.g = 0.4
+    with pytest.raises(RuntimeError):
+        selection.get_path(parameters)
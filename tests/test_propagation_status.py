@@ -0,0 +1,127 @@
+import json
+import os
+import pickle
+import platform
+import time
+
+import pytest
+
+from mlxtk.inout.output import read_output_last_ascii
+from mlxtk.simulation import Simulation
+from mlxtk.simulation_set.cmd_propagation_status import summarize_propagation_status
+
+
+def create_propagation(
+    path,
+    times,
+    tfinal: float,
+    wall_start: float,
+    wall_end: float,
+    pid: int = os.getpid(),
+):
+    path.mkdir(parents=True)
+    with open(path / "propagate.prop_pickle", "wb") as fptr:
+        pickle.dump(
+            ["propagate", "initial", "hamiltonian", {"tfinal": tfinal, "dt": 1.0}],
+            fptr,
+        )
+    if pid is not None:
+        with open(path / "run.lock", "w") as fptr:
+            json.dump({"host": platform.node(), "pid": pid}, fptr)
+
+    work_dir = path / ".propagate"
+    work_dir.mkdir()
+    with open(work_dir / "output", "w") as fptr:
+        for time in times:
+            fptr.write(f"  {time}  1.0  -2.5  0.99\n")
+        # incomplete line that is still being written
+        fptr.write("  100.0  1.0")
+    os.utime(work_dir / "output", (wall_end, wall_end))
+    with open(work_dir / "run_start.json", "w") as fptr:
+        json.dump({"wall_time": wall_start, "time": times[0]}, fptr)
+
+
+def test_read_output_last_ascii(tmp_path):
+    with open(tmp_path / "output", "w") as fptr:
+        for i in range(2000):
+            fptr.write(f"{i * 0.1}  1.0  {-i}  0.5\n")
+        fptr.write("\n\n")
+    assert read_output_last_ascii(tmp_path / "output") == (
+        pytest.approx(199.9),
+        1.0,
+        -1999.0,
+        0.5,
+    )
+
+    with open(tmp_path / "empty", "w") as fptr:
+        fptr.write("0.0 1.0")
+    assert read_output_last_ascii(tmp_path / "empty") is None
+
+
+def find_dead_pid() -> int:
+    pid = 2**22 - 1
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return pid
+        except PermissionError:
+            pass
+        pid -= 1
+
+
+def test_propagation_status(tmp_path):
+    now = time.time()
+    create_propagation(tmp_path / "a", [0.0, 1.0, 2.0], 10.0, now - 4.0, now)
+    (tmp_path / "b" / "propagate").mkdir(parents=True)
+    (tmp_path / "b" / "propagate" / "propagate.h5").touch()
+    (tmp_path / "c").mkdir()
+    # no update for much longer than the throughput implies
+    create_propagation(
+        tmp_path / "d",
+        [0.0, 1.0],
+        10.0,
+        now - 3600.0 - 4.0,
+        now - 3600.0,
+    )
+    # no process owns the simulation
+    create_propagation(tmp_path / "e", [0.0, 1.0], 10.0, now - 4.0, now, pid=None)
+    create_propagation(
+        tmp_path / "f",
+        [0.0, 1.0],
+        10.0,
+        now - 4.0,
+        now,
+        pid=find_dead_pid(),
+    )
+
+    statuses = [
+        Simulation(name, tmp_path / name).get_propagation_status("propagate")
+        for name in ("a", "b", "c", "d", "e", "f")
+    ]
+
+    assert statuses[0]["state"] == "running"
+    assert statuses[0]["progress"] == pytest.approx(0.2)
+    assert statuses[0]["throughput"] == pytest.approx(0.5)
+    assert statuses[0]["eta"] == pytest.approx(16.0)
+    assert statuses[1]["state"] == "finished"
+    assert statuses[1]["progress"] == 1.0
+    assert statuses[2]["state"] == "not started"
+    for status in statuses[3:]:
+        assert status["state"] == "stalled"
+        assert status["throughput"] == pytest.approx(0.25)
+        assert status["eta"] is None
+
+    summary = summarize_propagation_status(statuses[:3])
+    assert summary["states"] == {"running": 1, "finished": 1, "not started": 1}
+    assert summary["remaining"] == pytest.approx(18.0)
+    assert summary["eta"] == pytest.approx(36.0)
+    assert summary["max_eta"] == pytest.approx(16.0)
+    json.dumps(summary)
+
+    # stalled simulations do not contribute to the throughput
+    summary = summarize_propagation_status(statuses)
+    assert summary["states"]["stalled"] == 3
+    assert summary["throughput"] == pytest.approx(0.5)
+    assert summary["remaining"] == pytest.approx(18.0 + 3 * 9.0)
+    assert summary["max_eta"] == pytest.approx(16.0)
@@ -0,0 +1,162 @@
+import json
+
+import numpy
+import pytest
+
+from mlxtk.parameter_scan import ParameterScan
+from mlxtk.parameters import Parameters
+from mlxtk.resource_model import (
+    ResourceModel,
+    format_indices,
+    format_memory,
+    format_time,
+    group_resource_classes,
+    parse_time,
+    plan_allocation,
+    round_memory,
+    round_time,
+)
+from mlxtk.simulation import Simulation
+from mlxtk.util import parse_size
+
+
+def test_format():
+    assert parse_time("00:10:00") == 600
+    assert parse_time("1:02:03") == 3723
+    assert parse_time("90") == 90
+    with pytest.raises(ValueError):
+        parse_time("10m")
+    assert format_time(3723) == "01:02:03"
+    assert format_time(50 * 3600) == "50:00:00"
+
+    assert format_memory(2 << 30) == "2G"
+    assert format_memory(768 << 20) == "768M"
+    assert round_memory(1) == 512 << 20
+    assert round_memory((1 << 30) + 1) == (1 << 30) + (256 << 20)
+    assert round_time(1) == 600
+    assert round_time(3601) == 2 * 3600
+    assert round_time(25 * 3600) == 48 * 3600
+
+    assert format_indices([7, 0, 1, 2, 3, 9, 10]) == "0-3,7,9-10"
+    assert format_indices([]) == ""
+
+
+def create_parameters():
+    return [
+        Parameters([("N", n, ""), ("g", g, ""), ("label", "a", "")])
+        for n in (2, 4, 8)
+        for g in (0.1, 0.5)
+    ]
+
+
+def test_resource_model():
+    parameters = create_parameters()
+    costs = numpy.array([10.0 * p.N**2 for p in parameters])
+
+    model = ResourceModel(["N", "g"])
+    assert model.fit(costs, parameters)
+    assert model.variables == ["N", "g"]
+    assert model.sigma == pytest.approx(0.0, abs=1e-8)
+    assert model.predict(Parameters([("N", 16, ""), ("g", 0.1, "")])) == pytest.approx(
+        2560.0,
+    )
+
+    # too few points for a fit, the largest cost is predicted
+    model = ResourceModel(["N", "g"])
+    costs[2:] = numpy.nan
+    assert model.fit(costs, parameters)
+    assert model.predict(parameters[5]) == pytest.approx(40.0)
+
+    assert not ResourceModel(["N"]).fit(numpy.full(6, numpy.nan), parameters)
+    assert ResourceModel(["N"]).predict(parameters[0]) is None
+
+
+def test_group_resource_classes():
+    gib = 1 << 30
+    allocations = [(gib, 600)] * 10 + [(2 * gib, 600), (gib, 3600), (8 * gib, 86400)]
+    classes = group_resource_classes(allocations, 4)
+    assert len(classes) == 4
+    assert classes[0] == (gib, 600, list(range(10)))
+
+    classes = group_resource_classes(allocations, 2)
+    assert len(classes) == 2
+    assert classes[-1] == (8 * gib, 86400, [12])
+    assert sorted(classes[0][2]) == list(range(12))
+    assert classes[0][:2] == (2 * gib, 3600)
+
+
+def test_plan_allocation():
+    parameters = create_parameters()
+    profiles = [
+        {"total": {"time": 60.0 * p.N**2, "cpu_time": None, "max_vm": None}}
+        for p in parameters
+    ]
+    profiles[0] = {}
+
+    classes = plan_allocation(profiles, parameters, "3G", "00:10:00", 1.0, 10)
+    assert all(memory == 3 << 30 for memory, _, _ in classes)
+    times = {index: time for _, time, indices in classes for index in indices}
+    assert times[0] >= 240
+    assert times[5] == 2 * 3600
+
+    classes = plan_allocation([{}] * 3, None, "2G", "00:10:00")
+    assert classes == [(2 << 30, 600, [0, 1, 2])]
+
+    # the predicted memory is divided between the CPUs, the default is not
+    profiles = [{"total": {"time": 60.0, "max_vm": 3 << 30}}]
+    memory = plan_allocation(profiles, None, "2G", "00:10:00", 1.0)[0][0]
+    classes = plan_allocation(profiles, None, "2G", "00:10:00", 1.0, cpus=4)
+    assert classes[0][0] == memory // 4
+    classes = plan_allocation([{}], None, "2G", "00:10:00", 1.0, cpus=4)
+    assert classes[0][0] == 2 << 30
+
+    # the peak resident set size does not bound h_vmem
+    profiles = [{"total": {"time": 60.0, "max_rss": 3 << 30, "max_vm": None}}]
+    classes = plan_allocation(profiles, None, "2G", "00:10:00", 1.0)
+    assert classes[0][0] == 2 << 30
+
+
+def test_qsub_dry_run(tmp_path, capsys):
+    parameters = create_parameters()
+    scan = ParameterScan(
+        "scan",
+        lambda p: Simulation("test"),
+        parameters,
+        tmp_path / "scan",
+    )
+    for p in parameters:
+        working_dir = scan.compute_working_dir(p)
+        working_dir.mkdir(parents=True)
+        values = {
+            "monotonic_time": 30.0 * p.N**3,
+            "children_user_time": 30.0 * p.N**3,
+            "children_system_time": 0.0,
+            "children_max_rss": (64 << 20) * p.N,
+            "children_max_vm": (256 << 20) * p.N,
+        }
+        with open(working_dir / "doit.json", "w") as fptr:
+            json.dump({"propagate:gs:run": {"_values_:": {"action_run": values}}}, fptr)
+
+    scan.main(["qsub", "--predict", "--dry-run", "--max-classes", "2"])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["Class", "Tasks", "h_vmem", "h_cpu", "Indices"]
+    assert len(lines) == 4
+    assert lines[2].split()[:2] == ["0", "4"]
+    assert lines[3].split()[:2] == ["1", "2"]
+    assert lines[3].split()[-1] == "4-5"
+    assert not (tmp_path / "scan" / "by_index").exists()
+
+    scan.main(["qsub", "--dry-run"])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[2].split() == ["0", "6", "2G", "00:10:00", "0-5"]
+
+    # --memory is the h_vmem per slot, predictions are divided between the CPUs
+    scan.main(["qsub", "--dry-run", "-c", "4"])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[2].split() == ["0", "6", "2G", "00:10:00", "0-5"]
+
+    scan.main(["qsub", "--predict", "--dry-run", "--max-classes", "1"])
+    memory = capsys.readouterr().out.splitlines()[2].split()[2]
+    scan.main(["qsub", "--predict", "--dry-run", "--max-classes", "1", "-c", "4"])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[2].split()[2] == format_memory(-(-parse_size(memory) // 4))
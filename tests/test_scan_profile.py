@@ -0,0 +1,114 @@
+import json
+
+import numpy
+import pytest
+
+from mlxtk.parameter_scan import ParameterScan
+from mlxtk.parameters import Parameters
+from mlxtk.scan_profile import (
+    TOTAL,
+    find_outliers,
+    load_simulation_profile,
+    summarize_task_types,
+)
+from mlxtk.simulation import Simulation
+
+
+def write_doit_db(path, propagate_time, expval_time, max_rss=None):
+    propagate = {"monotonic_time": propagate_time}
+    if max_rss is not None:
+        propagate.update(
+            {
+                "children_user_time": propagate_time,
+                "children_system_time": 0.0,
+                "children_max_rss": max_rss,
+                "children_max_vm": 4 * max_rss,
+            },
+        )
+    data = {
+        "propagate:gs:write_parameters": {
+            "_values_:": {"action_write_parameters": {"monotonic_time": 0.5}},
+        },
+        "propagate:gs:run": {"_values_:": {"action_run": propagate}},
+        "expval:gs/x:compute": {
+            "_values_:": {"action_compute": {"monotonic_time": expval_time}},
+        },
+        "plain": {"_values_:": {}},
+    }
+    path.mkdir(parents=True, exist_ok=True)
+    with open(path / "doit.json", "w") as fptr:
+        json.dump(data, fptr)
+
+
+def test_load_simulation_profile(tmp_path):
+    assert load_simulation_profile(tmp_path) == {}
+
+    write_doit_db(tmp_path, 10.0, 2.0, max_rss=1 << 20)
+    profile = load_simulation_profile(tmp_path)
+    assert sorted(profile.keys()) == ["expval", "propagate", TOTAL]
+    assert profile["propagate"]["tasks"] == 2
+    assert profile["propagate"]["time"] == 10.5
+    assert profile["propagate"]["cpu_time"] == 10.0
+    assert profile["propagate"]["max_rss"] == 1 << 20
+    assert profile["propagate"]["max_vm"] == 4 << 20
+    assert profile["expval"]["cpu_time"] is None
+    assert profile[TOTAL]["tasks"] == 3
+    assert profile[TOTAL]["time"] == 12.5
+
+    summary = summarize_task_types([profile, {}, profile])
+    assert summary["propagate"]["simulations"] == 2
+    assert summary["propagate"]["total"] == 21.0
+    assert summary["propagate"]["cpu_time"] == 20.0
+    assert summary["expval"]["max_rss"] is None
+    assert summary[TOTAL]["max_vm"] == 4 << 20
+    assert list(summary.keys())[-1] == TOTAL
+
+
+def test_find_outliers():
+    costs = numpy.array([1.0, 1.1, 0.9, 1.05, numpy.nan, 50.0, 0.95])
+    outliers = find_outliers(costs)
+    assert list(outliers.keys()) == [5]
+    assert outliers[5] > 0.0
+
+    assert find_outliers(numpy.ones(5)) == {}
+    assert find_outliers(numpy.array([1.0, 100.0])) == {}
+
+
+def test_profile_scan(tmp_path, capsys):
+    combinations = [
+        Parameters([("N", n, "number of particles"), ("g", g, "")])
+        for n in (2, 4, 8, 16)
+        for g in (0.1, 0.2)
+    ]
+    scan = ParameterScan(
+        "scan",
+        lambda p: Simulation("test"),
+        combinations,
+        tmp_path / "scan",
+    )
+    for i, combination in enumerate(combinations):
+        time = float(combination.N**2) * (1.0 + 0.01 * i)
+        if i == 3:
+            time *= 1000.0
+        write_doit_db(scan.compute_working_dir(combination), time, 1.0)
+
+    scan.main(["profile", "--json", "-k", "time"])
+    report = json.loads(capsys.readouterr().out)
+
+    assert report["simulations"] == len(combinations)
+    assert report["summary"]["propagate"]["simulations"] == len(combinations)
+
+    correlations = report["correlations"]["propagate"]
+    assert sorted(correlations.keys()) == ["N", "g"]
+    assert correlations["N"]["correlation"] > 0.5
+    assert abs(correlations["g"]["correlation"]) < correlations["N"]["correlation"]
+    assert correlations["N"]["exponent"] == pytest.approx(2.0, abs=1.5)
+
+    outliers = [o for o in report["outliers"] if o["task_type"] == "propagate"]
+    assert [outlier["index"] for outlier in outliers] == [3]
+    assert outliers[0]["name"] == scan.compute_simulation_name(combinations[3])
+
+    scan.main(["profile"])
+    output = capsys.readouterr().out
+    assert "propagate" in output
+    assert "Spearman" in output
@@ -0,0 +1,19 @@
+import pytest
+
+from mlxtk import util
+
+
+def test_parse_size():
+    assert util.parse_size(123) == 123
+    assert util.parse_size("123") == 123
+    assert util.parse_size("2k") == 2048
+    assert util.parse_size("1.5G") == 3 * (1 << 29)
+    assert util.parse_size("10MiB") == 10 * (1 << 20)
+    with pytest.raises(ValueError):
+        util.parse_size("ten")
+
+
+def test_format_size():
+    assert util.format_size(512) == "512.0 B"
+    assert util.format_size(3 * (1 << 29)) == "1.5 GiB"
+    assert util.format_size(2 * (1 << 40)) == "2.0 TiB"
@@ -0,0 +1,135 @@
+import pickle
+
+import numpy
+
+from mlxtk import wave_function_db
+from mlxtk.parameters import Parameters
+from mlxtk.simulation import Simulation
+
+
+def create_prototype() -> Parameters:
+    return Parameters([("N", 2, "number of particles"), ("g", 0.1, "coupling")])
+
+
+def create_simulation(parameters: Parameters) -> Simulation:
+    return Simulation("test")
+
+
+def create_db(tmp_path) -> wave_function_db.WaveFunctionDB:
+    return wave_function_db.WaveFunctionDB(
+        "db",
+        "gs_relax/final.wfn",
+        create_prototype(),
+        create_simulation,
+        tmp_path / "db",
+    )
+
+
+def create_wave_function(db: wave_function_db.WaveFunctionDB, parameters: Parameters):
+    path = db.working_dir / "sim" / wave_function_db.hash_string(repr(parameters))
+    (path / "gs_relax").mkdir(parents=True)
+    (path / "gs_relax" / "final.wfn").touch()
+
+
+def test_get_parameters_key():
+    a = create_prototype()
+    b = create_prototype()
+    b.N = numpy.int64(2)
+    b.g = numpy.float64(0.1)
+    assert wave_function_db.get_parameters_key(
+        a,
+        a.names,
+    ) == wave_function_db.get_parameters_key(b, ["g", "N"])
+
+    b.g = 0.2
+    assert wave_function_db.get_parameters_key(
+        a,
+        a.names,
+    ) != wave_function_db.get_parameters_key(b, b.names)
+
+
+def test_store_and_lookup(tmp_path):
+    db = create_db(tmp_path)
+    parameters = create_prototype()
+    assert db.get_simulation_path(parameters) is None
+
+    db.store_missing_wave_function(parameters)
+    assert db.missing_wave_functions == [parameters]
+    assert db.get_simulation_path(parameters) is None
+
+    create_wave_function(db, parameters)
+    db.remove_missing_wave_function(parameters)
+    db.store_wave_function(parameters)
+    db.store_wave_function(parameters)
+    assert db.stored_wave_functions == [parameters]
+    assert not db.missing_wave_functions
+
+    expected = (
+        db.working_dir.resolve() / "sim" / wave_function_db.hash_string(repr(parameters))
+    )
+    assert db.get_simulation_path(parameters) == expected
+
+    # parameters that are not part of the prototype are ignored
+    request = create_prototype().add_parameter("tfinal", 10.0)
+    assert db.get_simulation_path(request) == expected
+
+    # a subset of the parameters falls back to a comparison of all entries
+    request = Parameters([("g", 0.1)])
+    assert db.get_simulation_path(request) == expected
+    request.g = 0.3
+    assert db.get_simulation_path(request) is None
+
+    # the index is persistent
+    db = create_db(tmp_path)
+    assert db.stored_wave_functions == [parameters]
+    assert db.combinations == [parameters]
+
+    db.remove_wave_function(parameters)
+    assert db.get_simulation_path(parameters) is None
+    assert not create_db(tmp_path).combinations
+
+
+def test_vanished_wave_functions(tmp_path):
+    db = create_db(tmp_path)
+    parameters = [create_prototype() for _ in range(3)]
+    for i, p in enumerate(parameters):
+        p.N = i + 1
+        create_wave_function(db, p)
+        db.store_wave_function(p)
+
+    (
+        db.working_dir
+        / "sim"
+        / wave_function_db.hash_string(repr(parameters[1]))
+        / "gs_relax"
+        / "final.wfn"
+    ).unlink()
+
+    db = create_db(tmp_path)
+    assert db.stored_wave_functions == [parameters[0], parameters[2]]
+    assert db.missing_wave_functions == [parameters[1]]
+    assert db.combinations == [parameters[0], parameters[2], parameters[1]]
+
+
+def test_import_pickles(tmp_path):
+    stored = create_prototype()
+    missing = create_prototype()
+    missing.g = 0.5
+
+    working_dir = tmp_path / "db"
+    working_dir.mkdir()
+    with open(working_dir / "stored_wave_functions.pickle", "wb") as fptr:
+        pickle.dump([stored], fptr, protocol=3)
+    with open(working_dir / "missing_wave_functions.pickle", "wb") as fptr:
+        pickle.dump([missing], fptr, protocol=3)
+
+    db = wave_function_db.WaveFunctionDB(
+        "db",
+        "gs_relax/final.wfn",
+        create_prototype(),
+        create_simulation,
+        working_dir,
+    )
+    assert not (working_dir / "stored_wave_functions.pickle").exists()
+    assert db.missing_wave_functions == [stored, missing]
+    assert not db.stored_wave_functions
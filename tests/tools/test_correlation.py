@@ -0,0 +1,88 @@
+import cmath
+
+import h5py
+import numpy
+import pytest
+
+from mlxtk.inout import dmat, dmat2, g1, g2
+from mlxtk.tools import correlation
+
+
+def create_data(num_times: int = 5, num_points: int = 6):
+    rng = numpy.random.default_rng(42)
+    time = numpy.linspace(0.0, 1.0, num_times)
+    x = numpy.linspace(-1.0, 1.0, num_points)
+    values = rng.normal(size=(num_times, num_points, num_points)) + 1j * rng.normal(
+        size=(num_times, num_points, num_points),
+    )
+    values2 = rng.uniform(size=(num_times, num_points, num_points))
+    return (time, x, x, values), (time, x, x, values2)
+
+
+def test_compute_g1():
+    data_dmat, _ = create_data()
+    values = data_dmat[3]
+
+    g1_ = correlation.compute_g1(data_dmat)[3]
+    g1_diff = correlation.compute_g1_diff(data_dmat, normalize=False)[3]
+    for i, j, k in numpy.ndindex(values.shape):
+        assert g1_[i, j, k] == pytest.approx(
+            values[i, j, k] / cmath.sqrt(values[i, j, j] * values[i, k, k]),
+        )
+        assert g1_diff[i, j, k] == pytest.approx(
+            values[i, j, k]
+            - cmath.sqrt(values[i, j, j]) * cmath.sqrt(values[i, k, k]),
+        )
+
+
+def test_compute_g2():
+    data_dmat, data_dmat2 = create_data()
+    values, values2 = data_dmat[3], data_dmat2[3]
+
+    g2_ = correlation.compute_g2(data_dmat, data_dmat2)[3]
+    g2_diff = correlation.compute_g2_diff(data_dmat, data_dmat2, normalize=False)[3]
+    for i, j, k in numpy.ndindex(values.shape):
+        assert g2_[i, j, k] == pytest.approx(
+            values2[i, j, k] / (values[i, j, j] * values[i, k, k]),
+        )
+        assert g2_diff[i, j, k] == pytest.approx(
+            values2[i, j, k] - values[i, j, j] * values[i, k, k],
+        )
+
+
+@pytest.mark.parametrize("diff", [False, True])
+def test_compute_hdf5(tmp_path, diff: bool):
+    data_dmat, data_dmat2 = create_data(num_times=7)
+    dmat.write_dmat_gridrep_hdf5(tmp_path / "dmat.h5", data_dmat)
+    with h5py.File(tmp_path / "dmat2.h5", "w") as fptr:
+        dmat2.add_dmat2_gridrep_to_hdf5(fptr, data_dmat2)
+
+    correlation.compute_g1_hdf5(
+        tmp_path / "dmat.h5",
+        tmp_path / "g1.h5",
+        diff=diff,
+        normalize=diff,
+        chunk_size=3,
+    )
+    correlation.compute_g2_hdf5(
+        tmp_path / "dmat.h5",
+        tmp_path / "dmat2.h5",
+        tmp_path / "g2.h5",
+        diff=diff,
+        normalize=diff,
+        chunk_size=3,
+    )
+
+    if diff:
+        expected_g1 = correlation.compute_g1_diff(data_dmat)
+        expected_g2 = correlation.compute_g2_diff(data_dmat, data_dmat2)
+    else:
+        expected_g1 = correlation.compute_g1(data_dmat)
+        expected_g2 = correlation.compute_g2(data_dmat, data_dmat2)
+
+    for expected, actual in (
+        (expected_g1, g1.read_g1_hdf5(tmp_path / "g1.h5")),
+        (expected_g2, g2.read_g2_hdf5(tmp_path / "g2.h5")),
+    ):
+        for a, b in zip(expected, actual):
+            assert numpy.allclose(a, b)
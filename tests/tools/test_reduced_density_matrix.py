@@ -0,0 +1,140 @@
+import shutil
+from types import SimpleNamespace
+
+import h5py
+import numpy
+import pytest
+
+from mlxtk import dvr
+from mlxtk.inout import psi
+from mlxtk.tape import BosonicNode, NormalNode, PrimitiveNode
+from mlxtk.tools import reduced_density_matrix
+
+
+def random_orthonormal(rng, m: int, n: int) -> numpy.ndarray:
+    matrix = rng.normal(size=(n, m)) + 1j * rng.normal(size=(n, m))
+    return numpy.linalg.qr(matrix)[0].T
+
+
+def create_mctdh_psi(path, grid_points, orbitals, num_frames: int = 3):
+    rng = numpy.random.default_rng(42)
+
+    tree = NormalNode()
+    for n, m in zip(grid_points, orbitals):
+        node = NormalNode(m)
+        node += PrimitiveNode(n)
+        tree += node
+    tape = numpy.array(tree.get_tape(), dtype=numpy.int64)
+
+    psis = []
+    full = []
+    for _ in range(num_frames):
+        coefficients = rng.normal(size=orbitals) + 1j * rng.normal(size=orbitals)
+        coefficients /= numpy.linalg.norm(coefficients)
+        spfs = [random_orthonormal(rng, m, n) for n, m in zip(grid_points, orbitals)]
+        psis.append(
+            numpy.concatenate([coefficients.flatten()] + [s.flatten() for s in spfs]),
+        )
+        full.append(numpy.einsum("ijk,ix,jy,kz->xyz", coefficients, *spfs))
+
+    times = numpy.linspace(0.0, 1.0, num_frames)
+    psi.write_psi_ascii(path, (tape, times, numpy.array(psis)))
+    return times, numpy.array(full)
+
+
+def create_layout(grid_points, orbitals):
+    # tree as QDTK builds it for the psi written by create_mctdh_psi
+    offset = int(numpy.prod(orbitals))
+    subnodes = []
+    for n, m in zip(grid_points, orbitals):
+        subnodes.append(SimpleNamespace(_z0=offset, _dim=m, _phiLen=n, _subnodes=[]))
+        offset += m * n
+    return SimpleNamespace(_z0=0, _dim=1, _phiLen=offset, _subnodes=subnodes)
+
+
+@pytest.mark.parametrize("dofs_A", [[0], [1, 2], [2, 0]])
+def test_reduced_density_matrix_in_process(tmp_path, dofs_A):
+    grid_points = [3, 4, 5]
+    times, full = create_mctdh_psi(tmp_path / "psi", grid_points, [2, 3, 2])
+    rng = numpy.random.default_rng(0)
+    basis_states = {
+        dof: random_orthonormal(rng, grid_points[dof], grid_points[dof])
+        for dof in dofs_A
+    }
+
+    times_, rho = reduced_density_matrix.compute_reduced_density_matrix_in_process(
+        tmp_path / "psi",
+        dofs_A,
+        basis_states,
+        frames_per_chunk=2,
+        layout=create_layout(grid_points, [2, 3, 2]),
+    )
+    assert numpy.allclose(times, times_)
+
+    dofs_B = [dof for dof in range(3) if dof not in dofs_A]
+    for step, psi_full in enumerate(full):
+        # project the A DoFs onto the basis states and trace out B
+        amplitudes = numpy.transpose(psi_full, dofs_A + dofs_B)
+        for dof in dofs_A:
+            amplitudes = numpy.tensordot(basis_states[dof], amplitudes, ([1], [0]))
+            amplitudes = numpy.moveaxis(amplitudes, 0, len(dofs_A) - 1)
+        amplitudes = amplitudes.reshape((rho.shape[1], -1))
+        expected = amplitudes @ numpy.conjugate(amplitudes.T)
+        assert numpy.allclose(rho[step], expected)
+        assert numpy.trace(rho[step]) == pytest.approx(1.0)
+
+
+def test_reduced_density_matrix_indistinguishable(tmp_path):
+    tree = BosonicNode(2)
+    spfs = NormalNode(2)
+    spfs += PrimitiveNode(4)
+    tree += spfs
+    tape = numpy.array(tree.get_tape(), dtype=numpy.int64)
+    psi.write_psi_ascii(
+        tmp_path / "psi",
+        (tape, numpy.array([0.0]), numpy.zeros((1, 11), dtype=numpy.complex128)),
+    )
+
+    assert not reduced_density_matrix.supports_in_process(tmp_path / "psi")
+    with pytest.raises(reduced_density_matrix.UnsupportedWaveFunctionError):
+        reduced_density_matrix.compute_reduced_density_matrix_in_process(
+            tmp_path / "psi",
+            [0],
+            {0: numpy.eye(4)},
+        )
+
+
+def test_supports_in_process(tmp_path):
+    create_mctdh_psi(tmp_path / "psi", [3, 4, 5], [2, 3, 2])
+    layout = create_layout([3, 4, 5], [2, 3, 2])
+    assert reduced_density_matrix.supports_in_process(tmp_path / "psi", layout)
+
+    layout._subnodes[1]._phiLen = 5
+    assert not reduced_density_matrix.supports_in_process(tmp_path / "psi", layout)
+
+
+@pytest.mark.skipif(
+    shutil.which("qdtk_expect.x") is None,
+    reason="requires QDTK",
+)
+def test_reduced_density_matrix_engines(tmp_path):
+    # the qdtk engine evaluates the projectors with qdtk_expect.x, compare the
+    # in-process contraction using the layout of QDTK's tree against it
+    grid_points = [3, 4, 5]
+    create_mctdh_psi(tmp_path / "psi", grid_points, [2, 3, 2])
+    dvrs = [dvr.add_harmdvr(n, 0.0, 1.0) for n in grid_points]
+    assert reduced_density_matrix.supports_in_process(tmp_path / "psi")
+
+    results = []
+    for engine in ("qdtk", "numpy"):
+        reduced_density_matrix.compute_reduced_density_matrix(
+            tmp_path / "psi",
+            tmp_path / f"{engine}.h5",
+            dvrs,
+            [2, 0],
+            engine=engine,
+        )
+        with h5py.File(tmp_path / f"{engine}.h5", "r") as fptr:
+            results.append(fptr["rho_A"][:])
+
+    assert numpy.allclose(results[0], results[1])
@@ -2,7 +2,7 @@ import numpy
 import pytest
 
 from mlxtk import dvr
-from mlxtk.tools import tensors
+from mlxtk.tools import ns_table, tensors
 
 
 @pytest.mark.parametrize(
@@ -24,3 +24,107 @@ def test_delta_interaction_dvr(dvr: dvr.DVRSpecification):
 
     assert numpy.allclose(diagonal, 1 / dvr.get_weights())
     assert numpy.allclose(diagonal, dvr.get_delta())
+
+
+@pytest.mark.parametrize("N,m", [(3, 3), (4, 2), (2, 4)])
+def test_number_state_indices_bosonic(N: int, m: int):
+    states = ns_table.build_number_state_table_bosonic(N, m)
+    assert numpy.array_equal(
+        ns_table.get_number_state_indices_bosonic(states),
+        numpy.arange(len(states)),
+    )
+    assert ns_table.get_number_state_index_bosonic(states[-1]) == len(states)
+
+
+@pytest.mark.parametrize("N,m", [(3, 3), (4, 2), (2, 4)])
+def test_dmat_spf(N: int, m: int):
+    rng = numpy.random.default_rng(42)
+    states = ns_table.build_number_state_table_bosonic(N, m)
+    states_Nm1 = ns_table.build_number_state_table_bosonic(N - 1, m)
+    states_Nm2 = ns_table.build_number_state_table_bosonic(N - 2, m)
+    coefficients = rng.normal(size=(3, len(states))) + 1j * rng.normal(
+        size=(3, len(states)),
+    )
+
+    rho_1 = tensors.get_dmat_spf(coefficients, states_Nm1, states)
+    rho_2 = tensors.get_dmat2_spf(coefficients, states_Nm2, states)
+    assert numpy.allclose(
+        tensors.get_dmat_spf(coefficients, states_Nm1, states, chunk_size=2),
+        rho_1,
+    )
+    assert numpy.allclose(
+        tensors.get_dmat2_spf(coefficients, states_Nm2, states, chunk_size=2),
+        rho_2,
+    )
+
+    pairs, indices, factors = tensors.get_pair_creation_map_bosonic(
+        states_Nm2,
+        states,
+    )
+    assert pairs.shape == (m * (m + 1) // 2, 2)
+    assert indices.shape == factors.shape == (len(pairs), len(states_Nm2))
+    for i, coefficient in enumerate(coefficients):
+        assert numpy.allclose(
+            rho_1[i],
+            tensors.get_dmat_spf_naive(coefficient, states),
+        )
+        assert numpy.allclose(
+            tensors.get_dmat_spf(coefficient, states_Nm1, states),
+            rho_1[i],
+        )
+        assert numpy.allclose(
+            rho_2[i],
+            tensors.get_dmat2_spf_naive(coefficient, states),
+        )
+
+
+@pytest.mark.parametrize("N,m", [(0, 3), (5, 1), (3, 3), (6, 4)])
+def test_number_state_ranking_bosonic(N: int, m: int):
+    ranking = ns_table.NumberStateRankingBosonic(N, m)
+    states = ranking.build_table()
+    assert states.shape == (len(ranking), m)
+    assert numpy.all(states.sum(axis=1) == N)
+    assert len(numpy.unique(states, axis=0)) == len(states)
+    # reverse lexicographic order
+    for a, b in zip(states[:-1], states[1:]):
+        assert tuple(a) > tuple(b)
+
+    indices = numpy.arange(len(states))
+    assert numpy.array_equal(ranking.rank(states), indices)
+    assert numpy.array_equal(ranking.unrank(indices[::-1]), states[::-1])
+    assert numpy.array_equal(
+        ranking.unrank(indices.reshape((1, -1))),
+        states.reshape((1, -1, m)),
+    )
+
+
+@pytest.mark.parametrize(
+    "dvr",
+    [dvr.add_harmdvr(21, 0.5, 1.1), dvr.add_sinedvr(17, -3.0, 5.1)],
+)
+def test_operators_spf(dvr: dvr.DVRSpecification):
+    rng = numpy.random.default_rng(42)
+    n = len(dvr.get_weights())
+    spfs = rng.normal(size=(4, 3, n)) + 1j * rng.normal(size=(4, 3, n))
+    x = dvr.get_x()
+    w = dvr.get_weights()
+
+    T = tensors.get_kinetic_spf(dvr, spfs)
+    V = tensors.get_potential_spf(dvr, spfs, lambda x: x**2)
+    V_int = tensors.get_delta_interaction_spf(dvr, spfs, 0.7)
+    assert T.shape == (4, 3, 3)
+    assert V.shape == (4, 3, 3)
+    assert V_int.shape == (4, 3, 3, 3, 3)
+
+    for t, phi in enumerate(spfs):
+        phi_c = numpy.conjugate(phi)
+        assert numpy.allclose(T[t], tensors.get_kinetic_spf(dvr, phi))
+        for a, b in numpy.ndindex(3, 3):
+            assert T[t, a, b] == pytest.approx(
+                -0.5 * phi_c[a] @ dvr.get_d2() @ phi[b],
+            )
+            assert V[t, a, b] == pytest.approx(numpy.sum(x**2 * phi_c[a] * phi[b]))
+        for a, b, c, d in numpy.ndindex(3, 3, 3, 3):
+            assert V_int[t, a, b, c, d] == pytest.approx(
+                0.7 * numpy.sum(phi_c[a] * phi_c[b] * phi[c] * phi[d] / w),
+            )